@@ -1,44 +1,189 @@
 import time
 import traceback
-from typing import List, Tuple, Dict
+from typing import Callable, List, Tuple, Dict, Optional, Sequence, Set
 import bittensor as bt
-from subnet_performance import SubnetPerformance
+from subnet_performance import SubnetPerformance, predict_next_prices
 from swap_logic import SwapLogic
-from utils import load_performances, save_performances
+from chain_snapshot import SnapshotCache
+from metrics import COUNT_BOUNDS, InstrumentedProxy, Metrics, Profiler
+from scheduler import Backoff, BlockScheduler, StageTimeout
+from submitter import ExtrinsicSubmitter
+from training import BackgroundTrainer
+from utils import load_checkpoint, load_performances_from_store, open_history_store, restore_checkpoint, save_checkpoint
 
 class ArbitrageBot:
-    def __init__(self, config: bt.config):
-        self.wallet = bt.wallet(config=config)
-        self.subtensor = bt.subtensor(config=config)
-        self.performances = load_performances('subnet_performances.json')
+    def __init__(self, config: Optional[bt.config], subtensor=None, wallet=None, history_file: Optional[str] = 'subnet_history.bin',
+                 performance_factory: Callable[[], SubnetPerformance] = SubnetPerformance, metrics: Optional[Metrics] = None,
+                 profiler: Optional[Profiler] = None, wallets: Optional[Sequence] = None, trainer: Optional[BackgroundTrainer] = None,
+                 checkpoint_file: Optional[str] = None, checkpoint_interval: int = 300, trade_sizing: bool = True, split_destinations: int = 1):
+        local = subtensor is not None
+        self.metrics = metrics or Metrics()
+        self.profiler = profiler
+        self.wallets = list(wallets) if wallets else [wallet or bt.wallet(config=config)]
+        self.wallet = self.wallets[0]
+        self.subtensor = InstrumentedProxy(subtensor or bt.subtensor(config=config), self.metrics)
+        self.store = open_history_store(history_file, 'subnet_performances.json') if history_file else None
+        self.performances = load_performances_from_store(self.store, performance_factory) if self.store is not None else {}
+        self.performance_factory = performance_factory
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_block: Optional[int] = None
+        checkpoint = load_checkpoint(checkpoint_file) if checkpoint_file else None
+        if checkpoint is not None:
+            self.checkpoint_block = checkpoint['block']
+            bt.logging.info(f"Restored {restore_checkpoint(self.performances, checkpoint, performance_factory)} fitted models from {checkpoint_file}")
+        self.trainer = trainer
+        for performance in self.performances.values():
+            performance.trainer = trainer
         self.profit_threshold = 0.001
         self.volatility_threshold = 0.05
-        self.swap_logic = SwapLogic(self.subtensor, self.wallet)
+        self.snapshots = SnapshotCache(self.subtensor, [coldkey_wallet.coldkeypub.ss58_address for coldkey_wallet in self.wallets], "Enter SS58")
+        self.swap_logics: List[SwapLogic] = []
+        for coldkey_wallet in self.wallets:
+            submitter = None if local else ExtrinsicSubmitter(InstrumentedProxy(bt.subtensor(config=config), self.metrics).substrate, coldkey_wallet.coldkey)
+            swap_logic = SwapLogic(self.subtensor, coldkey_wallet, self.snapshots, submitter)
+            swap_logic.trade_sizing, swap_logic.split_destinations = trade_sizing or split_destinations > 1, split_destinations
+            self.swap_logics.append(swap_logic)
+        self.swap_logic = self.swap_logics[0]
+        self.submitter = self.swap_logic.submitter
+        if local:
+            self.scheduler = BlockScheduler(self.subtensor.get_current_block, metrics=self.metrics)
+        else:
+            self.scheduler = BlockScheduler.for_subtensor(self.subtensor, bt.subtensor(config=config),
+                                                          stage_deadlines={'snapshot': 4.0, 'performances': 4.0, 'decision': 2.0},
+                                                          metrics=self.metrics)
+        self.backoff = Backoff()
 
     def run(self):
+        block = None
         while True:
             try:
-                registered_subnets = self.swap_logic.check_subnet_registrations()
-                current_global_tao = self.swap_logic.global_dynamic()
-                bt.logging.info(f'Current Global TAO: {current_global_tao}')
-                subnets = self.subtensor.get_all_subnet_dynamic_info()
-                for subnet in subnets:
-                    self.performances.setdefault(subnet.netuid, SubnetPerformance()).update(subnet)
-                substakes = self.subtensor.get_stake_info_for_coldkeys(coldkey_ss58_list=[self.wallet.coldkeypub.ss58_address])[self.wallet.coldkeypub.ss58_address]
-                staked_subnets = [substake.netuid for substake in substakes if float(substake.stake) > 0 and substake.netuid != 0]
-                origin, dest, improvement, allows_negative = self.swap_logic.find_best_swap(registered_subnets, staked_subnets, self.performances)
-
-                if improvement > self.profit_threshold or (allows_negative and improvement < 0):
-                    self.swap_logic.swap(origin, dest)
-                    new_global_tao = self.swap_logic.global_dynamic()
-                    bt.logging.info(f'New Global TAO: {new_global_tao}, Improvement: {new_global_tao - current_global_tao}')
-                else:
-                    bt.logging.info(f'No profitable swap found. Best improvement: {improvement}')
-                save_performances('subnet_performances.json', self.performances)
-                #max_volatility = max(perf.volatility for perf in self.performances.values())
+                block = self.scheduler.wait_for_block(block)
+                self.run_cycle(block)
+                self.backoff.reset()
             except KeyboardInterrupt:
                 break
+            except StageTimeout as e:
+                # the fingerprint was recorded before the cycle gave up, an unchanged next block still needs a decision
+                self.scheduler.reset_fingerprint()
+                bt.logging.warning(f"Dropped block {block}: {e}")
             except Exception as e:
+                self.scheduler.reset_fingerprint()
                 bt.logging.error(f"An error occurred: {str(e)}")
                 bt.logging.error(f"Full traceback: {traceback.format_exc()}")
-                time.sleep(60)
+                time.sleep(self.backoff.failure())
+
+        if self.trainer is not None:
+            self.trainer.close()
+        self.save_checkpoint(block)
+
+    def save_checkpoint(self, block: Optional[int]):
+        if self.checkpoint_file is None or block is None:
+            return
+        with self.metrics.timer('checkpoint'):
+            save_checkpoint(self.checkpoint_file, self.performances, block)
+        self.checkpoint_block = block
+
+    def run_cycle(self, block: int):
+        if self.profiler is not None:
+            self.profiler.poll()
+        self.metrics.set('block', block)
+        try:
+            with self.metrics.timer('cycle'):
+                self._run_cycle(block)
+            if self.checkpoint_block is None:
+                self.checkpoint_block = block
+            elif block - self.checkpoint_block >= self.checkpoint_interval:
+                self.save_checkpoint(block)
+        finally:
+            self.metrics.increment('cycles')
+            self.metrics.set('dropped_blocks', self.scheduler.dropped_blocks)
+            self.metrics.set('skipped_blocks', self.scheduler.skipped_blocks)
+            self.metrics.set('snapshot_hits', self.snapshots.hits)
+            self.metrics.set('snapshot_misses', self.snapshots.misses)
+
+    def _run_cycle(self, block: int):
+        self.scheduler.begin_cycle()
+        with self.scheduler.stage('snapshot'):
+            snapshot = self.snapshots.get(block)
+        if self.store is not None:
+            self.store.append_block(snapshot.block, snapshot.subnets)
+        if not self.scheduler.changed(snapshot.fingerprint()):
+            bt.logging.debug(f'Block {block}: pool state unchanged, skipping')
+            return
+        with self.scheduler.stage('registrations'):
+            registered_subnets = self.swap_logic.check_subnet_registrations(snapshot)
+        with self.scheduler.stage('global_dynamic'):
+            for swap_logic in self.swap_logics:
+                bt.logging.info(f'{self._label(swap_logic)}Current Global TAO: {swap_logic.global_dynamic(snapshot)}')
+        with self.scheduler.stage('performances'):
+            if self.trainer is not None:
+                trained = self.trainer.collect()
+                if trained:
+                    netuids = {performance: netuid for netuid, performance in self.performances.items()}
+                    for performance, seconds in trained:
+                        self.metrics.observe('train', seconds, netuids.get(performance))
+                self.metrics.set('training_in_flight', self.trainer.in_flight)
+            for subnet in snapshot.subnets:
+                if subnet.netuid not in self.performances:
+                    self.performances[subnet.netuid] = self.performance_factory()
+                    self.performances[subnet.netuid].trainer = self.trainer
+                performance = self.performances[subnet.netuid]
+                last_fit_time, start = performance.last_fit_time, time.perf_counter()
+                performance.update(subnet)
+                if performance.last_fit_time != last_fit_time:
+                    self.metrics.observe('train', time.perf_counter() - start, subnet.netuid)
+            predict_next_prices(self.performances)
+            self.metrics.set('dirty_subnets', sum(performance.dirty for performance in self.performances.values()))
+        with self.scheduler.stage('decision'):
+            decisions = self.decide(snapshot, registered_subnets)
+
+        swapped = False
+        claimed = {netuid for _, best in decisions if self.is_profitable(best[2], best[3]) for netuid in best[:2] if netuid != 0}
+        for swap_logic, (origin, dest, improvement, allows_negative) in decisions:
+            if self.is_profitable(improvement, allows_negative):
+                legs = [(dest, None)]
+                if swap_logic.trade_sizing:
+                    candidates = [netuid for netuid in registered_subnets if netuid == 0 or netuid not in claimed]
+                    legs = swap_logic.plan_legs(origin, dest, candidates, self.performances, snapshot)
+                    if not legs:
+                        bt.logging.info(f'{self._label(swap_logic)}Swap from subnet {origin} to subnet {dest} does not pay for its slippage at any size')
+                        continue
+                    claimed.update(netuid for netuid, _ in legs if netuid != 0)
+                with self.scheduler.stage('swap'):
+                    swap_logic.swap_split(origin, legs)
+                self.metrics.increment('swaps')
+                swapped = True
+            else:
+                bt.logging.info(f'{self._label(swap_logic)}No profitable swap found. Best improvement: {improvement}')
+        if swapped:
+            self.scheduler.reset_fingerprint()
+        bt.logging.debug(f'Snapshot cache: {self.snapshots.stats()}, dropped blocks: {self.scheduler.dropped_blocks}, skipped blocks: {self.scheduler.skipped_blocks}')
+
+    def is_profitable(self, improvement: float, allows_negative: bool) -> bool:
+        return improvement > self.profit_threshold or (allows_negative and improvement < 0)
+
+    def decide(self, snapshot, registered_subnets: List[int]) -> List[Tuple[SwapLogic, Tuple[int, int, float, bool]]]:
+        # pools one wallet trades are off limits to the others this block; first pick rotates per block
+        claimed: Set[int] = set()
+        decisions = []
+        pairs_evaluated = 0
+        first = snapshot.block % len(self.swap_logics)
+        for swap_logic in self.swap_logics[first:] + self.swap_logics[:first]:
+            submitter = swap_logic.submitter
+            substakes = snapshot.stakes_for(swap_logic.wallet.coldkeypub.ss58_address)
+            # dust below one rao cannot be named in a move, so it is not a position to trade
+            staked_subnets = [substake.netuid for substake in substakes
+                              if bt.Balance.from_tao(float(substake.stake)).rao > 0 and substake.netuid != 0 and substake.netuid not in claimed
+                              and not (submitter and submitter.is_pending(substake.netuid))]
+            destinations = [netuid for netuid in registered_subnets if netuid == 0 or netuid not in claimed]
+            best = swap_logic.find_best_swap(destinations, staked_subnets, self.performances, snapshot)
+            pairs_evaluated += swap_logic.pairs_evaluated
+            if self.is_profitable(best[2], best[3]):
+                claimed.update(netuid for netuid in best[:2] if netuid != 0)
+            decisions.append((swap_logic, best))
+        self.metrics.observe('pairs_evaluated', pairs_evaluated, bounds=COUNT_BOUNDS)
+        return decisions
+
+    def _label(self, swap_logic: SwapLogic) -> str:
+        return f'{swap_logic.wallet.coldkeypub.ss58_address}: ' if len(self.swap_logics) > 1 else ''
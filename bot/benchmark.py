@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from chain_snapshot import SnapshotCache
+from local_subtensor import LocalSubtensor, LocalWallet
+from predictors import ForestPredictor, NullPredictor, RLSPredictor
+from subnet_performance import SubnetPerformance, predict_next_prices
+from swap_logic import SwapLogic
+from utils import load_performances, save_performances
+
+PREDICTORS = {'null': NullPredictor, 'rls': RLSPredictor, 'forest': ForestPredictor}
+
+def measure(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'max_s': max(times), 'repeat': repeat, 'peak_bytes': peak}
+
+def synthetic_history(subtensor: LocalSubtensor, window: int, predictor: str = 'null', seed: int = 0) -> Dict[int, SubnetPerformance]:
+    rng = np.random.default_rng(seed)
+    performances = {}
+    for subnet in subtensor.get_all_subnet_dynamic_info():
+        perf = SubnetPerformance(window, PREDICTORS[predictor]())
+        perf.prices = float(subnet.price) * np.exp(rng.normal(0, 0.01, window - 1).cumsum())
+        perf.emission_rates = np.full(window - 1, float(subnet.emission))
+        perf.update(subnet)
+        performances[subnet.netuid] = perf
+    return performances
+
+def synthetic_bot(n_subnets: int, window: int, seed: int = 0):
+    subtensor = LocalSubtensor.synthetic(n_subnets, seed)
+    wallet = LocalWallet()
+    rng = np.random.default_rng(seed + 1)
+    for netuid in rng.choice(np.arange(1, n_subnets), size=max(1, n_subnets // 8), replace=False):
+        subtensor.stakes[(wallet.coldkeypub.ss58_address, wallet.hotkey.ss58_address, int(netuid))] = float(rng.uniform(1, 1000))
+    performances = synthetic_history(subtensor, window, seed=seed)
+    swap_logic = SwapLogic(subtensor, wallet, SnapshotCache(subtensor, [wallet.coldkeypub.ss58_address], wallet.hotkey.ss58_address))
+    snapshot = swap_logic.snapshots.get()
+    staked = [substake.netuid for substake in snapshot.stakes_for(wallet.coldkeypub.ss58_address)]
+    return swap_logic, performances, snapshot, staked
+
+def bench_swaps(n_subnets: int, window: int, repeat: int, scalar_limit: int) -> List[Dict]:
+    swap_logic, performances, snapshot, staked = synthetic_bot(n_subnets, window)
+    registered = list(snapshot.registered)
+    results = []
+    find = lambda: swap_logic.find_best_swap(registered, staked, performances, snapshot)
+    for name, pruned in (('find_best_swap', True), ('find_best_swap_full', False)):
+        swap_logic.pruned = pruned
+        # cold starts from empty caches like a block where every subnet moved; warm repeats an unchanged block
+        results.append({'name': name, 'subnets': n_subnets, 'window': window, 'pairs': len(staked) * len(registered),
+                        **measure(find, repeat, setup=swap_logic.clear_caches)})
+        results.append({'name': f'{name}_warm', 'subnets': n_subnets, 'window': window, 'pairs': len(staked) * len(registered),
+                        **measure(find, repeat, setup=find)})
+    swap_logic.pruned = True
+    if n_subnets <= scalar_limit:
+        results.append({'name': 'find_best_swap_scalar', 'subnets': n_subnets, 'window': window, 'pairs': len(staked) * len(registered),
+                        **measure(lambda: swap_logic.find_best_swap_scalar(registered, staked, performances, snapshot), repeat)})
+    a, b = staked[0], next(netuid for netuid in registered if netuid not in (0, staked[0]))
+    stake = next(substake.stake for substake in snapshot.stakes_for(swap_logic.wallet.coldkeypub.ss58_address) if substake.netuid == a)
+    results.append({'name': 'compute_swap_opportunity', 'subnets': n_subnets, 'window': window,
+                    **measure(lambda: swap_logic.compute_swap_opportunity(snapshot.subnets[a], snapshot.subnets[b], stake, performances[a], performances[b]), repeat)})
+    results.append({'name': 'predict_next_prices', 'subnets': n_subnets, 'window': window,
+                    **measure(lambda: predict_next_prices(performances), repeat, setup=lambda: [setattr(perf, '_next_price', None) for perf in performances.values()])})
+    return results
+
+def bench_performance(window: int, predictor: str, repeat: int, updates: int = 100) -> List[Dict]:
+    subtensor = LocalSubtensor.synthetic(2, seed=window)
+    subnet = subtensor.get_subnet_dynamic_info(1)
+    perf = synthetic_history(subtensor, window, predictor)[1]
+    results = [{'name': 'SubnetPerformance.update', 'window': window, 'predictor': predictor, 'per_call': True,
+                **{key: value / updates if key.endswith('_s') else value
+                   for key, value in measure(lambda: [perf.update(subnet) for _ in range(updates)], repeat).items()}}]
+    if PREDICTORS[predictor].trainable:
+        results.append({'name': 'SubnetPerformance.train_model', 'window': window, 'predictor': predictor, **measure(perf.train_model, repeat)})
+    results.append({'name': 'SubnetPerformance.predict_next_price', 'window': window, 'predictor': predictor,
+                    **measure(perf.predict_next_price, repeat, setup=lambda: setattr(perf, '_next_price', None))})
+    return results
+
+def bench_persistence(n_subnets: int, window: int, repeat: int) -> List[Dict]:
+    performances = synthetic_history(LocalSubtensor.synthetic(n_subnets), window)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'subnet_performances.json')
+        results = [{'name': 'save_performances', 'subnets': n_subnets, 'window': window, **measure(lambda: save_performances(filename, performances), repeat)}]
+        results.append({'name': 'load_performances', 'subnets': n_subnets, 'window': window, 'bytes': os.stat(filename).st_size,
+                        **measure(lambda: load_performances(filename), repeat)})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot's hot paths against a synthetic subtensor")
+    parser.add_argument('--subnets', type=int, nargs='+', default=[32, 64, 256, 1024])
+    parser.add_argument('--windows', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--predictors', nargs='+', default=list(PREDICTORS), choices=list(PREDICTORS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scalar-limit', type=int, default=256, help="largest subnet count to also time the scalar pair loop")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for n_subnets in args.subnets:
+        results += bench_swaps(n_subnets, args.windows[0], args.repeat, args.scalar_limit)
+        for window in args.windows:
+            results += bench_persistence(n_subnets, window, args.repeat)
+    for window in args.windows:
+        for predictor in args.predictors:
+            results += bench_performance(window, predictor, args.repeat)
+
+    report = {'meta': {'timestamp': time.time(), 'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                       'repeat': args.repeat}, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
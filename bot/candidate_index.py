@@ -0,0 +1,149 @@
+from typing import Callable, Optional, Sequence, Tuple
+import numpy as np
+from swap_kernel import SubnetArrays, SwapWeights, alpha_to_tao_with_slippage, evaluate_swaps, subnet_scores
+
+# bounds and exact improvements round differently, so bounds are padded by this much relative to their terms
+BOUND_SLACK = 1e-9
+
+def _reinsert(order: np.ndarray, values: np.ndarray, changed: np.ndarray) -> np.ndarray:
+    # the untouched entries keep their relative order, so only the changed ones are sorted and merged back in
+    moved = np.zeros(len(values), dtype=bool)
+    moved[changed] = True
+    kept = order[~moved[order]]
+    changed = changed[np.argsort(values[changed], kind='stable')]
+    return np.insert(kept, np.searchsorted(values[kept], values[changed], side='right'), changed)
+
+class CandidateIndex:
+    # destinations ordered by emission-minus-price spread and by subnet score; both only depend on performance features, so a
+    # refresh only touches the subnets whose SubnetPerformance version moved
+    def __init__(self):
+        self.netuids = np.empty(0, dtype=np.int64)
+        self.versions = np.empty(0)
+        self.weights: Optional[SwapWeights] = None
+        self.spread = np.empty(0)
+        self.score = np.empty(0)
+        self.order = np.empty(0, dtype=np.int64)
+        self.spreads = np.empty(0)
+        self.score_order = np.empty(0, dtype=np.int64)
+        self.scores = np.empty(0)
+        self.rebuilds = 0
+        self.updated = 0
+
+    def refresh(self, netuids: Sequence[int], destinations: SubnetArrays, versions: np.ndarray, weights: SwapWeights) -> None:
+        netuids = np.asarray(netuids, dtype=np.int64)
+        if not np.array_equal(netuids, self.netuids) or weights != self.weights:
+            self.netuids, self.versions, self.weights = netuids, np.array(versions, dtype=float), weights
+            self.spread, self.score = destinations.emission - destinations.price, subnet_scores(destinations, weights)
+            self.order, self.score_order = np.argsort(self.spread, kind='stable'), np.argsort(self.score, kind='stable')
+            self.rebuilds += 1
+        else:
+            changed = np.flatnonzero(np.asarray(versions) != self.versions)
+            if not changed.size:
+                return
+            updated = destinations.take(changed)
+            self.versions[changed] = np.asarray(versions)[changed]
+            self.spread[changed], self.score[changed] = updated.emission - updated.price, subnet_scores(updated, weights)
+            self.order, self.score_order = _reinsert(self.order, self.spread, changed), _reinsert(self.score_order, self.score, changed)
+            self.updated += len(changed)
+        self.spreads, self.scores = self.spread[self.order], self.score[self.score_order]
+
+    def above(self, spread: float) -> np.ndarray:
+        return self.order[np.searchsorted(self.spreads, spread, side='right'):]
+
+    def scoring_above(self, score: float) -> np.ndarray:
+        return self.score_order[np.searchsorted(self.scores, score, side='right'):]
+
+def _linear_terms(subnets: SubnetArrays, weights: SwapWeights) -> Tuple[np.ndarray, np.ndarray]:
+    # every origin/destination difference in adjusted_improvements is base = F_b - F_a or trend = 1 + G_b - G_a
+    return (subnets.emission * weights.emission + (subnets.emission - subnets.price) * weights.price_emission_discrepancy,
+            subnets.inflation * weights.inflation - subnets.price_drop * weights.price_drop + subnets.predicted * weights.prediction)
+
+def destination_bounds(origins: SubnetArrays, stake: np.ndarray, destinations: SubnetArrays, weights: SwapWeights, doubled: float,
+                       destination_scores: Optional[np.ndarray] = None) -> np.ndarray:
+    # adjusted = D*(D*trend*(gain + base)*(1 - u) + score_diff - u) with u = slippage*weight. Selling each origin's stake is computed
+    # exactly, buying the destination is bounded by its slippage-free output, and every origin-dependent term is replaced by its range
+    # over all origins; the result is bilinear in (trend*(gain + base), u), so the maximum sits on a corner
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        held = stake * origins.tao_in / origins.alpha_out
+        tao, sell_slippage = alpha_to_tao_with_slippage(origins, stake)
+        value = np.where(destinations.dynamic, destinations.alpha_in / destinations.tao_in, 1.0) * destinations.tao_in / destinations.alpha_out
+        f_a, g_a = _linear_terms(origins, weights)
+        f_b, g_b = _linear_terms(destinations, weights)
+        x = (f_b - f_a.max() - held.max(), f_b - f_a.min() - held.min() + tao.max() * value)
+        t = (1 + g_b - g_a.max(), 1 + g_b - g_a.min())
+        products = [x_k * t_k for x_k in x for t_k in t]
+        p = (np.minimum.reduce(products), np.maximum.reduce(products))
+        sold = sell_slippage / stake
+        bought = np.where(destinations.dynamic & (destinations.pool_price != 0), (tao / stake).max() / destinations.pool_price, 0.0)
+        u = (weights.slippage * sold.min(), weights.slippage * (sold.max() + bought))
+        u = (np.minimum(*u), np.maximum(*u))
+        if destination_scores is None:
+            destination_scores = subnet_scores(destinations, weights)
+        score = destination_scores - subnet_scores(origins, weights).min()
+        bound = doubled * np.maximum.reduce([doubled * p_k * (1 - u_k) + score - u_k for p_k in p for u_k in u])
+        scale = doubled * (doubled * np.maximum(np.abs(p[0]), np.abs(p[1])) * (1 + np.abs(u[0]) + np.abs(u[1])) + np.abs(score) + np.abs(u[0]) + np.abs(u[1]))
+        bound = bound + BOUND_SLACK * (1 + np.abs(bound) + scale)
+    return np.where(np.isnan(bound), np.inf, bound)
+
+def _exact(arrays: SubnetArrays, scores: np.ndarray, rows: np.ndarray, cols: np.ndarray, stake: np.ndarray, weights: SwapWeights,
+           tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    rows, cols, stake = rows[:, None], cols[None, :], stake[:, None]
+    return evaluate_swaps(arrays.take(rows), arrays.take(cols), stake, rows == cols, scores[rows], scores[cols], weights, tolerance)
+
+def pruned_best_swap(arrays: SubnetArrays, rows: np.ndarray, cols: np.ndarray, stake: np.ndarray, weights: SwapWeights, tolerance: float,
+                     index: CandidateIndex, batch: int = 32, exact: Optional[Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]] = None
+                     ) -> Tuple[Optional[int], float, bool, int]:
+    # undervalued origins only form allows_negative pairs and come after every other origin, so the scalar rule reduces to:
+    # the last allows_negative pair over the threshold if there is one, else the first maximum among overvalued origins.
+    # exact(i, j) scores the origin positions i against the destination positions j, PairScores.evaluate serves it from its cache
+    origins, destinations, stake = rows[:, 0], cols[0], stake[:, 0]
+    n_destinations = len(destinations)
+    scores = subnet_scores(arrays, weights)
+    if exact is None:
+        exact = lambda i, j: _exact(arrays, scores, origins[i], destinations[j], stake[i], weights, tolerance)
+    threshold = weights.min_improvement_threshold
+    emission, price = arrays.emission[origins], arrays.price[origins]
+    # evaluate_swaps rejects every pair out of an origin without stake or with an empty pool
+    held = (stake > 0) & (arrays.alpha_out[origins] != 0) & (arrays.tao_in[origins] != 0)
+    evaluated = 0
+
+    undervalued = np.flatnonzero(held & (emission > price + tolerance))
+    if undervalued.size:
+        eligible = index.above(float((emission - price)[undervalued].min()))
+        bound = destination_bounds(arrays.take(origins[undervalued]), stake[undervalued], arrays.take(destinations[eligible]), weights, 1.0,
+                                   index.score[eligible])
+        eligible = np.sort(eligible[bound > threshold])[::-1]
+        spreads = index.spread[eligible]
+        for i in undervalued[::-1]:
+            # the scalar loop skips destinations whose spread does not beat the origin's
+            js = eligible[spreads > emission[i] - price[i]]
+            for start in range(0, len(js), batch):
+                chunk = js[start:start + batch]
+                adjusted, allows_negative = exact(np.array([i]), chunk)
+                evaluated += len(chunk)
+                hits = np.flatnonzero((adjusted[0] > threshold) & (adjusted[0] > -np.inf) & allows_negative[0])
+                if hits.size:
+                    return int(i * n_destinations + chunk[hits[0]]), float(adjusted[0, hits[0]]), True, evaluated
+
+    overvalued = np.flatnonzero(held & (price > emission + tolerance))
+    eligible = index.above(tolerance - BOUND_SLACK)
+    if not overvalued.size or not eligible.size:
+        return None, float('-inf'), False, evaluated
+    bound = destination_bounds(arrays.take(origins[overvalued]), stake[overvalued], arrays.take(destinations[eligible]), weights, 2.0,
+                               index.score[eligible])
+    keep = np.flatnonzero(bound > threshold)
+    keep = keep[np.argsort(-bound[keep], kind='stable')]
+    columns, start = max(1, batch // len(overvalued)), 0
+    best, best_adjusted = None, -np.inf
+    while start < len(keep) and bound[keep[start]] >= best_adjusted:
+        chunk = keep[start:start + columns]
+        # widen each round so a loose bound costs a logarithmic number of passes rather than one per column
+        start, columns = start + columns, 2 * columns
+        adjusted, _ = exact(overvalued, eligible[chunk])
+        evaluated += adjusted.size
+        flat = overvalued[:, None] * n_destinations + eligible[chunk][None, :]
+        for k in np.flatnonzero((adjusted > threshold) & (adjusted > -np.inf)):
+            value, position = float(adjusted.flat[k]), int(flat.flat[k])
+            if value > best_adjusted or (value == best_adjusted and position < best):
+                best, best_adjusted = position, value
+    return best, best_adjusted, False, evaluated
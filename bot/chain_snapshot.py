@@ -0,0 +1,61 @@
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+import bittensor as bt
+from registrations import RegistrationCache
+
+class ChainSnapshot(NamedTuple):
+    block: int
+    subnets: Tuple
+    stakes: Mapping[str, Tuple]
+    registered: Tuple[int, ...]
+
+    def stakes_for(self, coldkey_ss58: str) -> Tuple:
+        return self.stakes.get(coldkey_ss58, ())
+
+    def fingerprint(self) -> int:
+        pools = tuple((subnet.netuid, float(subnet.tao_in), float(subnet.alpha_in), float(subnet.alpha_out), float(subnet.emission), float(subnet.price))
+                      for subnet in self.subnets)
+        stakes = tuple((coldkey, tuple((substake.netuid, float(substake.stake)) for substake in substakes)) for coldkey, substakes in self.stakes.items())
+        return hash((pools, stakes, self.registered))
+
+class SnapshotCache:
+    def __init__(self, subtensor: bt.subtensor, coldkeys: Sequence[str], hotkey_ss58: Optional[str] = None, registration_refresh_blocks: int = 100):
+        self.subtensor = subtensor
+        self.coldkeys = list(coldkeys)
+        self.registrations = RegistrationCache(subtensor, hotkey_ss58, refresh_blocks=registration_refresh_blocks) if hotkey_ss58 is not None else None
+        self.hits = 0
+        self.misses = 0
+        self.rpc_calls: Dict[str, int] = {}
+        self._snapshot: Optional[ChainSnapshot] = None
+
+    def _rpc(self, method: str, *args, **kwargs):
+        self.rpc_calls[method] = self.rpc_calls.get(method, 0) + 1
+        return getattr(self.subtensor, method)(*args, **kwargs)
+
+    def get(self, block: Optional[int] = None) -> ChainSnapshot:
+        if block is None:
+            block = self._rpc('get_current_block')
+        if self._snapshot is not None and self._snapshot.block == block:
+            self.hits += 1
+            return self._snapshot
+        self.misses += 1
+        self._snapshot = self._fetch(block)
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    def _fetch(self, block: int) -> ChainSnapshot:
+        subnets = tuple(self._rpc('get_all_subnet_dynamic_info'))
+        stakes = self._rpc('get_stake_info_for_coldkeys', coldkey_ss58_list=self.coldkeys)
+        registered = ()
+        if self.registrations is not None:
+            registered = self.registrations.get([subnet.netuid for subnet in subnets], block)
+        return ChainSnapshot(block, subnets, MappingProxyType({coldkey: tuple(stakes.get(coldkey, ())) for coldkey in self.coldkeys}), registered)
+
+    def stats(self) -> Dict[str, int]:
+        rpc_calls = dict(self.rpc_calls)
+        if self.registrations is not None:
+            for method, count in self.registrations.rpc_calls.items():
+                rpc_calls[method] = rpc_calls.get(method, 0) + count
+        return {'hits': self.hits, 'misses': self.misses, **{f'rpc.{method}': count for method, count in rpc_calls.items()}}
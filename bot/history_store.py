@@ -0,0 +1,82 @@
+import json
+import os
+from typing import Dict, Iterable, Optional
+import numpy as np
+
+MAGIC = b'RAOHIST1'
+HEADER = np.dtype([('magic', 'S8'), ('count', '<u8')])
+RECORD = np.dtype([('block', '<u8'), ('netuid', '<u2'), ('emission', '<f8'), ('price', '<f8'), ('alpha_out', '<f8'), ('tao_in', '<f8')])
+
+class HistoryStore:
+    def __init__(self, filename: str):
+        self.filename = filename
+        if not os.path.exists(filename) or os.stat(filename).st_size < HEADER.itemsize:
+            with open(filename, 'wb') as f:
+                f.write(np.array([(MAGIC, 0)], dtype=HEADER).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        header = np.fromfile(filename, dtype=HEADER, count=1)[0]
+        if header['magic'] != MAGIC:
+            raise ValueError(f"{filename} is not a subnet history store")
+        size = os.stat(filename).st_size
+        # a crash mid-append leaves a partial record past the count; a file cut short keeps its whole records
+        self.count = min(int(header['count']), (size - HEADER.itemsize) // RECORD.itemsize)
+        committed = HEADER.itemsize + self.count * RECORD.itemsize
+        if size != committed or self.count != header['count']:
+            os.truncate(filename, committed)
+            with open(filename, 'r+b') as f:
+                f.write(np.array([(MAGIC, self.count)], dtype=HEADER).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self.last_block = int(self.records()['block'][-1]) if self.count else None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, records: np.ndarray) -> None:
+        if len(records) == 0:
+            return
+        with open(self.filename, 'r+b') as f:
+            f.seek(HEADER.itemsize + self.count * RECORD.itemsize)
+            f.write(np.ascontiguousarray(records, dtype=RECORD).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+            f.write(np.array([(MAGIC, self.count + len(records))], dtype=HEADER).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.count += len(records)
+        self.last_block = int(records['block'][-1])
+
+    def append_block(self, block: int, subnets: Iterable) -> bool:
+        if self.last_block is not None and block <= self.last_block:
+            return False
+        self.append(np.array([(block, subnet.netuid, float(subnet.emission), float(subnet.price), float(subnet.alpha_out), float(subnet.tao_in))
+                              for subnet in subnets], dtype=RECORD))
+        return True
+
+    def records(self) -> np.ndarray:
+        if self.count == 0:
+            return np.empty(0, dtype=RECORD)
+        return np.memmap(self.filename, dtype=RECORD, mode='r', offset=HEADER.itemsize, shape=(self.count,))
+
+    def history(self, limit: Optional[int] = None) -> Dict[int, np.ndarray]:
+        records = self.records()
+        order = np.argsort(records['netuid'], kind='stable')
+        netuids, starts = np.unique(records['netuid'][order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        return {int(netuid): records[order[start if limit is None else max(start, end - limit):end]]
+                for netuid, start, end in zip(netuids, starts, ends)}
+
+    def import_json(self, filename: str) -> int:
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        length = max((len(perf_data.get('prices', [])) for perf_data in data.values()), default=0)
+        records = []
+        for netuid, perf_data in data.items():
+            emission_rates, prices = perf_data.get('emission_rates', []), perf_data.get('prices', [])
+            offset = length - len(prices)
+            records.extend((offset + i, int(netuid), emission, price, np.nan, np.nan) for i, (emission, price) in enumerate(zip(emission_rates, prices)))
+        records = np.array(records, dtype=RECORD)
+        self.append(records[np.argsort(records['block'], kind='stable')])
+        return len(records)
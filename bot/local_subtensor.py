@@ -0,0 +1,287 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+
+RAO_PER_TAO = 1e9
+
+class LocalBalance(float):
+    @classmethod
+    def from_tao(cls, amount: float) -> 'LocalBalance':
+        return cls(amount)
+
+    @classmethod
+    def from_rao(cls, amount: int) -> 'LocalBalance':
+        return cls(amount / RAO_PER_TAO)
+
+    @property
+    def tao(self) -> float:
+        return float(self)
+
+    @property
+    def rao(self) -> int:
+        return int(float(self) * RAO_PER_TAO)
+
+class LocalDynamicInfo:
+    __slots__ = ('netuid', 'tao_in', 'alpha_in', 'alpha_out', 'emission', 'price', 'is_dynamic')
+
+    def __init__(self, netuid: int, tao_in: float, alpha_in: float, alpha_out: float, emission: float):
+        self.netuid = netuid
+        self.is_dynamic = netuid > 0
+        self.tao_in, self.alpha_in, self.alpha_out, self.emission = map(LocalBalance, (tao_in, alpha_in, alpha_out, emission))
+        self.price = LocalBalance(tao_in / alpha_in if self.is_dynamic and alpha_in > 0 else 1.0)
+
+    @property
+    def k(self) -> float:
+        return float(self.tao_in) * float(self.alpha_in)
+
+    def tao_to_alpha(self, tao: float) -> LocalBalance:
+        return LocalBalance(float(tao) / float(self.price) if float(self.price) != 0 else 0.0)
+
+    def alpha_to_tao(self, alpha: float) -> LocalBalance:
+        return LocalBalance(float(alpha) * float(self.price))
+
+    def tao_to_alpha_with_slippage(self, tao: float) -> Tuple[LocalBalance, LocalBalance]:
+        new_tao_in = float(self.tao_in) + float(tao)
+        if not self.is_dynamic or new_tao_in == 0:
+            return LocalBalance(tao), LocalBalance(0)
+        returned = float(self.alpha_in) - self.k / new_tao_in
+        ideal = float(self.tao_to_alpha(tao))
+        return LocalBalance(returned), LocalBalance(max(ideal - returned, 0.0))
+
+    def alpha_to_tao_with_slippage(self, alpha: float) -> Tuple[LocalBalance, LocalBalance]:
+        if not self.is_dynamic:
+            return LocalBalance(alpha), LocalBalance(0)
+        returned = float(self.tao_in) - self.k / (float(self.alpha_in) + float(alpha))
+        ideal = float(self.alpha_to_tao(alpha))
+        return LocalBalance(returned), LocalBalance(max(ideal - returned, 0.0))
+
+class LocalStakeInfo(NamedTuple):
+    hotkey_ss58: str
+    coldkey_ss58: str
+    netuid: int
+    stake: LocalBalance
+
+class LocalCall(NamedTuple):
+    call_module: str
+    call_function: str
+    call_params: dict
+
+class LocalExtrinsic(NamedTuple):
+    call: LocalCall
+    signer: str
+    nonce: Optional[int]
+
+    @property
+    def extrinsic_hash(self) -> str:
+        return f'{self.signer}/{self.nonce}'
+
+class LocalReceipt(NamedTuple):
+    is_success: bool
+    error_message: Optional[str]
+    block_hash: str
+
+class LocalKeypair(NamedTuple):
+    ss58_address: str
+
+class LocalWallet:
+    def __init__(self, coldkey_ss58: str = 'local-coldkey', hotkey_ss58: str = 'Enter SS58'):
+        self.coldkey = self.coldkeypub = LocalKeypair(coldkey_ss58)
+        self.hotkey = LocalKeypair(hotkey_ss58)
+
+class LocalSubstrate:
+    def __init__(self, subtensor: 'LocalSubtensor'):
+        self.subtensor = subtensor
+        self.nonces: Dict[str, int] = {}
+        self.rejected = 0
+        self.receipts: Dict[str, LocalReceipt] = {}
+
+    def compose_call(self, call_module: str, call_function: str, call_params: dict) -> LocalCall:
+        return LocalCall(call_module, call_function, dict(call_params))
+
+    def create_signed_extrinsic(self, call: LocalCall, keypair, nonce: Optional[int] = None, **kwargs) -> LocalExtrinsic:
+        return LocalExtrinsic(call, keypair.ss58_address, nonce)
+
+    def submit_extrinsic(self, extrinsic: LocalExtrinsic, wait_for_inclusion: bool = False, wait_for_finalization: bool = False) -> LocalReceipt:
+        self.nonces[extrinsic.signer] = self.nonces.get(extrinsic.signer, 0) + 1
+        try:
+            self.subtensor.apply_call(extrinsic.signer, extrinsic.call)
+            receipt = LocalReceipt(True, None, self.get_block_hash(self.subtensor.block))
+        except ValueError as e:
+            self.rejected += 1
+            receipt = LocalReceipt(False, str(e), self.get_block_hash(self.subtensor.block))
+        self.receipts[extrinsic.extrinsic_hash] = receipt
+        return receipt
+
+    def retrieve_extrinsic_by_hash(self, block_hash: str, extrinsic_hash: str) -> LocalReceipt:
+        receipt = self.receipts.get(extrinsic_hash)
+        if receipt is None or receipt.block_hash != block_hash:
+            raise ValueError(f"Extrinsic {extrinsic_hash} not found in block {block_hash}")
+        return receipt
+
+    def get_account_next_index(self, ss58_address: str) -> int:
+        return self.nonces.get(ss58_address, 0)
+
+    def get_block_hash(self, block: int) -> str:
+        return f'0x{block:064x}'
+
+    def get_block_number(self, block_hash: str) -> int:
+        return int(block_hash, 16)
+
+    def get_chain_finalised_head(self) -> str:
+        return self.get_block_hash(self.subtensor.block)
+
+    def get_chain_head(self) -> str:
+        return self.get_block_hash(self.subtensor.block)
+
+class LocalSubtensor:
+    def __init__(self, netuids: Sequence[int], tao_in: Iterable[float], alpha_in: Iterable[float], alpha_out: Iterable[float],
+                 emission: Iterable[float], block: int = 0, registered: Optional[Set[int]] = None, alpha_emission: float = 1.0,
+                 staker_share: float = 0.41):
+        self.netuids = list(netuids)
+        self.index = {netuid: i for i, netuid in enumerate(self.netuids)}
+        self.dynamic = np.array(self.netuids) != 0
+        self.block = block
+        self.alpha_emission = alpha_emission
+        self.staker_share = staker_share
+        self.tao_in, self.alpha_in, self.alpha_out, self.emission = (np.array(values, dtype=float) for values in (tao_in, alpha_in, alpha_out, emission))
+        self.registered = set(self.netuids) if registered is None else set(registered)
+        self.stakes: Dict[Tuple[str, str, int], float] = {}
+        self.balances: Dict[str, float] = {}
+        self.substrate = LocalSubstrate(self)
+        self.applied: List[Tuple[int, str, LocalCall]] = []
+        self._subnets: Optional[List[LocalDynamicInfo]] = None
+
+    @classmethod
+    def synthetic(cls, n_subnets: int, seed: int = 0, block: int = 0) -> 'LocalSubtensor':
+        rng = np.random.default_rng(seed)
+        alpha_in = rng.uniform(1e4, 1e6, n_subnets)
+        prices = np.concatenate(([1.0], rng.lognormal(-3.0, 1.0, n_subnets - 1)))
+        alpha_out = alpha_in * rng.uniform(1.5, 4.0, n_subnets)
+        emission = prices * rng.uniform(0.5, 1.5, n_subnets)
+        return cls(range(n_subnets), prices * alpha_in, alpha_in, alpha_out, emission, block)
+
+    def set_state(self, block: int, tao_in: np.ndarray, alpha_in: np.ndarray, alpha_out: np.ndarray, emission: np.ndarray) -> None:
+        self.block = block
+        self.tao_in, self.alpha_in, self.alpha_out, self.emission = (np.array(values, dtype=float) for values in (tao_in, alpha_in, alpha_out, emission))
+        self._subnets = None
+
+    def advance(self, blocks: int = 1) -> int:
+        # each block injects `emission` TAO and up to alpha_emission alpha at the current price into every dynamic pool,
+        # and mints alpha_emission outstanding alpha of which stakers earn staker_share pro rata
+        tao_emission = np.where(self.dynamic, self.emission, 0.0)
+        alpha_emission = np.where(self.dynamic, self.alpha_emission, 0.0)
+        growth = np.zeros(len(self.netuids))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for _ in range(blocks):
+                price = self.tao_in / self.alpha_in
+                self.alpha_in += np.where(price > 0, np.minimum(tao_emission / price, alpha_emission), 0.0)
+                self.tao_in += tao_emission
+                growth += np.where(self.alpha_out > 0, np.log1p(self.staker_share * alpha_emission / self.alpha_out), 0.0)
+                self.alpha_out += alpha_emission
+        factor = np.exp(growth)
+        for key, stake in self.stakes.items():
+            self.stakes[key] = stake * factor[self.index[key[2]]]
+        self.block += blocks
+        self._subnets = None
+        return self.block
+
+    def get_current_block(self) -> int:
+        return self.block
+
+    def get_all_subnet_dynamic_info(self) -> List[LocalDynamicInfo]:
+        if self._subnets is None:
+            self._subnets = [LocalDynamicInfo(netuid, *values) for netuid, *values in
+                             zip(self.netuids, self.tao_in.tolist(), self.alpha_in.tolist(), self.alpha_out.tolist(), self.emission.tolist())]
+        return self._subnets
+
+    def get_subnet_dynamic_info(self, netuid: int) -> LocalDynamicInfo:
+        return self.get_all_subnet_dynamic_info()[self.index[netuid]]
+
+    def get_stake_info_for_coldkeys(self, coldkey_ss58_list: Sequence[str]) -> Dict[str, List[LocalStakeInfo]]:
+        result = {coldkey: [] for coldkey in coldkey_ss58_list}
+        for (coldkey, hotkey, netuid), stake in self.stakes.items():
+            if coldkey in result and stake > 0:
+                result[coldkey].append(LocalStakeInfo(hotkey, coldkey, netuid, LocalBalance(stake)))
+        return result
+
+    def get_balance(self, ss58_address: str) -> LocalBalance:
+        return LocalBalance(self.balances.get(ss58_address, 0.0))
+
+    def is_hotkey_registered(self, netuid: int, hotkey_ss58: str) -> bool:
+        return netuid in self.registered
+
+    def portfolio_value(self, coldkey_ss58: str) -> float:
+        prices = np.where(self.alpha_in > 0, self.tao_in / np.where(self.alpha_in > 0, self.alpha_in, 1), 1.0)
+        value = self.balances.get(coldkey_ss58, 0.0)
+        for (coldkey, _, netuid), stake in self.stakes.items():
+            if coldkey == coldkey_ss58:
+                value += stake * (prices[self.index[netuid]] if netuid != 0 else 1.0)
+        return value
+
+    def sell_alpha(self, netuid: int, alpha: float) -> float:
+        i = self.index[netuid]
+        if netuid == 0:
+            return alpha
+        tao = self.tao_in[i] - self.tao_in[i] * self.alpha_in[i] / (self.alpha_in[i] + alpha)
+        self.tao_in[i] -= tao
+        self.alpha_in[i] += alpha
+        self._subnets = None
+        return tao
+
+    def buy_alpha(self, netuid: int, tao: float) -> float:
+        i = self.index[netuid]
+        if netuid == 0:
+            return tao
+        alpha = self.alpha_in[i] - self.tao_in[i] * self.alpha_in[i] / (self.tao_in[i] + tao)
+        self.tao_in[i] += tao
+        self.alpha_in[i] -= alpha
+        self._subnets = None
+        return alpha
+
+    def apply_call(self, signer: str, call: LocalCall) -> None:
+        if call.call_function == 'batch_all':
+            self._apply_batch(signer, call.call_params['calls'])
+            return
+        self.applied.append((self.block, signer, call))
+        params = call.call_params
+        if call.call_function == 'add_stake':
+            amount = params['amount_staked'] / RAO_PER_TAO
+            balance = self.balances.get(signer, 0.0)
+            if amount > balance + 1e-12 or amount <= 0:
+                raise ValueError(f"Not enough balance to stake {amount} TAO")
+            self.balances[signer] = balance - amount
+            key = (signer, params['hotkey'], params['netuid'])
+            self.stakes[key] = self.stakes.get(key, 0.0) + self.buy_alpha(params['netuid'], amount)
+        elif call.call_function == 'remove_stake':
+            key = (signer, params['hotkey'], params['netuid'])
+            amount, available = params['amount_unstaked'] / RAO_PER_TAO, self.stakes.get(key, 0.0)
+            if amount > available + 1e-12 or amount <= 0:
+                raise ValueError(f"Not enough stake on subnet {params['netuid']}")
+            self.stakes[key] = available - amount
+            self.balances[signer] = self.balances.get(signer, 0.0) + self.sell_alpha(params['netuid'], amount)
+        elif call.call_function == 'move_stake':
+            origin = (signer, params['origin_hotkey'], params['origin_netuid'])
+            available = self.stakes.get(origin, 0.0)
+            # like the chain, 0 is an amount too small to move rather than "everything"
+            amount = params['amount_moved'] / RAO_PER_TAO
+            if amount <= 0:
+                raise ValueError(f"Amount too low to move from subnet {params['origin_netuid']}")
+            if amount > available + 1e-12:
+                raise ValueError(f"Not enough stake on subnet {params['origin_netuid']}")
+            self.stakes[origin] = available - amount
+            received = self.buy_alpha(params['destination_netuid'], self.sell_alpha(params['origin_netuid'], amount))
+            destination = (signer, params['destination_hotkey'], params['destination_netuid'])
+            self.stakes[destination] = self.stakes.get(destination, 0.0) + received
+        else:
+            raise ValueError(f"Unsupported call {call.call_module}.{call.call_function}")
+
+    def _apply_batch(self, signer: str, calls: Sequence[LocalCall]) -> None:
+        # batch_all is atomic: one failing call reverts the ones before it
+        state = (self.tao_in.copy(), self.alpha_in.copy(), dict(self.stakes), dict(self.balances), len(self.applied))
+        try:
+            for call in calls:
+                self.apply_call(signer, call)
+        except ValueError:
+            self.tao_in, self.alpha_in, self.stakes, self.balances = state[:4]
+            del self.applied[state[4]:]
+            self._subnets = None
+            raise
@@ -1,12 +1,35 @@
 import argparse
 import bittensor as bt
 from arbitrage_bot import ArbitrageBot
+from metrics import Metrics, Profiler
+from training import BackgroundTrainer
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="RAO Bot")
+    parser.add_argument('--wallets', nargs='+', default=None, help="coldkey wallet names to manage from one process (default: --wallet.name)")
+    parser.add_argument('--training.workers', type=int, default=None, help="processes for background model training, 0 trains inline (default: one per core)")
+    parser.add_argument('--checkpoint.file', type=str, default='subnet_models.pkl', help="fitted models and buffers restored at startup")
+    parser.add_argument('--checkpoint.interval', type=int, default=300, help="blocks between checkpoints")
+    parser.add_argument('--swap.whole_positions', action='store_true', help="move whole positions instead of the slippage-optimal amount")
+    parser.add_argument('--swap.split_destinations', type=int, default=1, help="split each move across up to this many destinations")
+    parser.add_argument('--metrics.port', type=int, default=None, help="serve JSON metrics on this local port")
+    parser.add_argument('--metrics.file', type=str, default=None, help="periodically write JSON metrics to this file")
+    parser.add_argument('--metrics.flush_interval', type=float, default=60.0)
+    parser.add_argument('--metrics.profile_dir', type=str, default='.', help="where SIGUSR1 toggled cProfile/tracemalloc dumps go")
     bt.wallet.add_args(parser)
     bt.subtensor.add_args(parser)
     bt.logging.add_args(parser)
     config = bt.config(parser)
-    bot = ArbitrageBot(config)
+    metrics = Metrics()
+    if config.metrics.port is not None:
+        metrics.serve(config.metrics.port)
+    if config.metrics.file is not None:
+        metrics.start_flusher(config.metrics.file, config.metrics.flush_interval)
+    profiler = Profiler(config.metrics.profile_dir)
+    profiler.install()
+    wallets = [bt.wallet(name=name, hotkey=config.wallet.hotkey, path=config.wallet.path) for name in config.wallets] if config.wallets else None
+    trainer = BackgroundTrainer(config.training.workers) if config.training.workers != 0 else None
+    bot = ArbitrageBot(config, metrics=metrics, profiler=profiler, wallets=wallets, trainer=trainer,
+                       checkpoint_file=config.checkpoint.file, checkpoint_interval=config.checkpoint.interval,
+                       trade_sizing=not config.swap.whole_positions, split_destinations=config.swap.split_destinations)
     bot.run()
@@ -0,0 +1,216 @@
+import bisect
+import cProfile
+import json
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence, Tuple
+import bittensor as bt
+
+LATENCY_BOUNDS = tuple(10 ** (exponent / 4) for exponent in range(-20, 9))
+COUNT_BOUNDS = tuple(2 ** exponent for exponent in range(21))
+
+class Histogram:
+    __slots__ = ('bounds', 'buckets', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BOUNDS):
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = float('-inf')
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank and bucket:
+                return min(self.bounds[i], self.maximum) if i < len(self.bounds) else self.maximum
+        return self.maximum
+
+    def summary(self) -> Dict:
+        if not self.count:
+            return {'count': 0}
+        return {'count': self.count, 'sum': self.total, 'mean': self.total / self.count, 'min': self.minimum, 'max': self.maximum,
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+                'buckets': [[bound, count] for bound, count in zip(self.bounds + (float('inf'),), self.buckets) if count]}
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[Tuple[str, Optional[str]], Histogram] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value: float) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float, label=None, bounds: Sequence[float] = LATENCY_BOUNDS) -> None:
+        key = (name, None if label is None else str(label))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(bounds)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, label=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, label)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            histograms: Dict[str, Dict] = {}
+            for (name, label), histogram in self.histograms.items():
+                if label is None:
+                    histograms[name] = histogram.summary()
+                else:
+                    histograms.setdefault(name, {})[label] = histogram.summary()
+            return {'timestamp': time.time(), 'uptime': time.time() - self.started, 'counters': dict(self.counters),
+                    'gauges': dict(self.gauges), 'histograms': histograms}
+
+    def flush(self, filename: str) -> None:
+        tmp = f'{filename}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, filename)
+
+    def start_flusher(self, filename: str, interval: float = 60.0) -> None:
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush(filename)
+                except OSError as e:
+                    bt.logging.warning(f"Could not write metrics to {filename}: {e}")
+        self._flusher = threading.Thread(target=run, daemon=True)
+        self._flusher.start()
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        bt.logging.info(f"Serving metrics on http://{host}:{self._server.server_port}/metrics")
+        return self._server
+
+class InstrumentedProxy:
+    def __init__(self, target, metrics: Metrics, prefix: str = ''):
+        self._target = target
+        self._metrics = metrics
+        self._prefix = prefix
+        self._substrate = None
+
+    def __getattr__(self, name: str):
+        value = getattr(self._target, name)
+        if name == 'substrate':
+            if self._substrate is None or self._substrate._target is not value:
+                self._substrate = InstrumentedProxy(value, self._metrics, 'substrate.')
+            return self._substrate
+        if name.startswith('_') or not callable(value):
+            return value
+        method = self._prefix + name
+        metrics = self._metrics
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            except Exception:
+                metrics.increment(f'rpc_errors.{method}')
+                raise
+            finally:
+                metrics.observe('rpc', time.perf_counter() - start, method)
+        return call
+
+class Profiler:
+    def __init__(self, directory: str = '.', top: int = 25):
+        self.directory = directory
+        self.top = top
+        self.requested = False
+        self._profile: Optional[cProfile.Profile] = None
+
+    @property
+    def active(self) -> bool:
+        return self._profile is not None
+
+    def install(self, signum: int = getattr(signal, 'SIGUSR1', 0)) -> bool:
+        if not signum or threading.current_thread() is not threading.main_thread():
+            return False
+        signal.signal(signum, self.toggle)
+        return True
+
+    def toggle(self, *args) -> None:
+        self.requested = True
+
+    def poll(self) -> None:
+        if not self.requested:
+            return
+        self.requested = False
+        if self._profile is None:
+            self.start()
+        else:
+            self.stop()
+
+    def start(self) -> None:
+        tracemalloc.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        bt.logging.info("Profiling started")
+
+    def stop(self) -> Optional[str]:
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        filename = os.path.join(self.directory, f'profile-{stamp}.prof')
+        self._profile.dump_stats(filename)
+        self._profile = None
+        allocations = tracemalloc.take_snapshot().statistics('lineno')[:self.top]
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(os.path.join(self.directory, f'tracemalloc-{stamp}.txt'), 'w') as f:
+            f.write(f'peak {peak} bytes\n')
+            f.writelines(f'{stat}\n' for stat in allocations)
+        bt.logging.info(f"Profiling stopped, wrote {filename}")
+        return filename
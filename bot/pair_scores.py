@@ -0,0 +1,116 @@
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from subnet_performance import SubnetPerformance
+from swap_kernel import SubnetArrays, SwapWeights, evaluate_swaps, subnet_scores
+
+class SubnetArrayCache:
+    def __init__(self):
+        self.versions: Dict[int, int] = {}
+        self.features: Dict[int, Tuple[float, float, float, float, float]] = {}
+        self.reloaded = 0
+
+    def load(self, subnets: Sequence, performances: Dict[int, SubnetPerformance], netuids: Sequence[int]) -> SubnetArrays:
+        # pools come straight from the snapshot, features are only recomputed for performances whose version moved
+        for netuid in netuids:
+            performance = performances[netuid]
+            if self.versions.get(netuid) != performance.version:
+                self.versions[netuid], self.features[netuid] = performance.version, performance.features()
+                self.reloaded += 1
+        pools = np.array([[float(subnets[netuid].tao_in), float(subnets[netuid].alpha_in), float(subnets[netuid].alpha_out),
+                           float(subnets[netuid].price), getattr(subnets[netuid], 'is_dynamic', True)] for netuid in netuids], dtype=float).reshape(-1, 5)
+        features = np.array([self.features[netuid] for netuid in netuids], dtype=float).reshape(-1, 5)
+        return SubnetArrays(*pools[:, :4].T, pools[:, 4].astype(bool), *features.T)
+
+    def versions_of(self, netuids: Sequence[int]) -> np.ndarray:
+        return np.array([self.versions[netuid] for netuid in netuids], dtype=float)
+
+def _state(arrays: SubnetArrays, versions: np.ndarray) -> np.ndarray:
+    return np.column_stack([versions, arrays.tao_in, arrays.alpha_in, arrays.alpha_out, arrays.pool_price, arrays.dynamic])
+
+def _positions(previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+    if np.array_equal(previous, current):
+        return np.arange(len(current))
+    lookup = {netuid: i for i, netuid in enumerate(previous.tolist())}
+    return np.array([lookup.get(netuid, -1) for netuid in current.tolist()], dtype=np.int64)
+
+def _fresh(previous: np.ndarray, current: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    return (positions >= 0) & (previous[positions] == current).all(axis=1) if len(previous) else np.zeros(len(current), dtype=bool)
+
+class PairScores:
+    def __init__(self):
+        self.origins = np.empty(0, dtype=np.int64)
+        self.destinations = np.empty(0, dtype=np.int64)
+        self.row_state = np.empty((0, 7))
+        self.col_state = np.empty((0, 6))
+        self.adjusted = np.empty((0, 0))
+        self.allows_negative = np.empty((0, 0), dtype=bool)
+        self.known = np.empty((0, 0), dtype=bool)
+        self.settings: Optional[Tuple[SwapWeights, float]] = None
+        self.inputs: Optional[Tuple[SubnetArrays, np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+        self.unchanged = False
+        self.recomputed = 0
+
+    def _realign(self, origins: Sequence[int], destinations: Sequence[int], arrays: SubnetArrays, rows: np.ndarray, cols: np.ndarray,
+                 stake: np.ndarray, versions: np.ndarray, weights: SwapWeights, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+        # a pair only depends on its two subnets and the origin's stake, so rows and columns whose inputs are unchanged keep their scores
+        origins, destinations = np.asarray(origins, dtype=np.int64), np.asarray(destinations, dtype=np.int64)
+        state = _state(arrays, versions)
+        row_state, col_state = np.column_stack([state[rows[:, 0]], stake[:, 0]]), state[cols[0]]
+        if self.settings != (weights, tolerance):
+            self.row_state, self.col_state = self.row_state[:0], self.col_state[:0]
+        row_positions, col_positions = _positions(self.origins, origins), _positions(self.destinations, destinations)
+        fresh_rows, fresh_cols = _fresh(self.row_state, row_state, row_positions), _fresh(self.col_state, col_state, col_positions)
+
+        self.unchanged = False
+        if self.adjusted.shape == (len(origins), len(destinations)) and (row_positions == np.arange(len(origins))).all() \
+                and (col_positions == np.arange(len(destinations))).all():
+            self.unchanged = bool(fresh_rows.all() and fresh_cols.all())
+            adjusted, allows_negative, known = self.adjusted, self.allows_negative, self.known & fresh_rows[:, None] & fresh_cols[None, :]
+        else:
+            adjusted = np.full((len(origins), len(destinations)), -np.inf)
+            allows_negative = np.zeros(adjusted.shape, dtype=bool)
+            known = np.zeros(adjusted.shape, dtype=bool)
+            kept = np.ix_(np.flatnonzero(fresh_rows), np.flatnonzero(fresh_cols))
+            previous = np.ix_(row_positions[kept[0][:, 0]], col_positions[kept[1][0]])
+            adjusted[kept], allows_negative[kept], known[kept] = self.adjusted[previous], self.allows_negative[previous], self.known[previous]
+
+        self.origins, self.destinations, self.row_state, self.col_state = origins, destinations, row_state, col_state
+        self.adjusted, self.allows_negative, self.known, self.settings = adjusted, allows_negative, known, (weights, tolerance)
+        self.inputs = (arrays, subnet_scores(arrays, weights), rows, cols, stake)
+        self.recomputed = 0
+        return fresh_rows, fresh_cols
+
+    def _compute(self, r: np.ndarray, c: np.ndarray) -> None:
+        arrays, scores, rows, cols, stake = self.inputs
+        weights, tolerance = self.settings
+        block = np.ix_(r, c)
+        a, b = rows[r], cols[:, c]
+        self.adjusted[block], self.allows_negative[block] = evaluate_swaps(arrays.take(a), arrays.take(b), stake[r], a == b, scores[a], scores[b],
+                                                                           weights, tolerance)
+        self.known[block] = True
+        self.recomputed += r.size * c.size
+
+    def update(self, origins: Sequence[int], destinations: Sequence[int], arrays: SubnetArrays, rows: np.ndarray, cols: np.ndarray, stake: np.ndarray,
+               versions: np.ndarray, weights: SwapWeights, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+        self._realign(origins, destinations, arrays, rows, cols, stake, versions, weights, tolerance)
+        # stale rows first, then whatever is left: stale columns and pairs the pruned search never asked for
+        stale_rows = np.flatnonzero(~self.known.any(axis=1))
+        if stale_rows.size and len(self.destinations):
+            self._compute(stale_rows, np.arange(len(self.destinations)))
+        missing_rows = np.flatnonzero(~self.known.all(axis=1))
+        if missing_rows.size:
+            self._compute(missing_rows, np.flatnonzero(~self.known[missing_rows].all(axis=0)))
+        return self.adjusted, self.allows_negative
+
+    def prepare(self, origins: Sequence[int], destinations: Sequence[int], arrays: SubnetArrays, rows: np.ndarray, cols: np.ndarray,
+                stake: np.ndarray, versions: np.ndarray, weights: SwapWeights, tolerance: float) -> bool:
+        # like update, but stale pairs are only evaluated once evaluate asks for them; True when no pair's inputs moved at all
+        self._realign(origins, destinations, arrays, rows, cols, stake, versions, weights, tolerance)
+        return self.unchanged
+
+    def evaluate(self, r: np.ndarray, c: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        block = np.ix_(r, c)
+        missing = ~self.known[block]
+        if missing.any():
+            self._compute(r[missing.any(axis=1)], c[missing.any(axis=0)])
+        return self.adjusted[block], self.allows_negative[block]
@@ -0,0 +1,113 @@
+import time
+from typing import Optional
+import numpy as np
+
+class ForestPredictor:
+    incremental = False
+    linear = False
+    trainable = True
+
+    def __init__(self, n_estimators: int = 100, trees_per_refit: int = 10, max_estimators: int = 300):
+        self.n_estimators = n_estimators
+        self.trees_per_refit = trees_per_refit
+        self.max_estimators = max_estimators
+        self.model = None
+        self.fitted = False
+
+    def _new_model(self):
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(n_estimators=self.n_estimators, warm_start=True)
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> None:
+        if self.model is None or self.model.n_estimators + self.trees_per_refit > self.max_estimators:
+            self.model = self._new_model()
+        elif self.fitted:
+            self.model.n_estimators += self.trees_per_refit
+        self.model.fit(X, y)
+        self.fitted = True
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict(X)
+
+    def mark(self):
+        return self.model, len(self.model.estimators_) if self.fitted else 0
+
+    def delta_since(self, mark):
+        # a warm-started refit only appends trees, so a copy taken at mark just needs those; a rebuilt forest goes whole
+        model, trees = mark
+        return self.model.estimators_[trees:] if self.model is model and trees else self.model
+
+    def apply_delta(self, delta) -> None:
+        if isinstance(delta, list):
+            self.model.estimators_ = self.model.estimators_ + delta
+            self.model.n_estimators = len(self.model.estimators_)
+        else:
+            self.model = delta
+        self.fitted = True
+
+class RLSPredictor:
+    incremental = True
+    linear = True
+    trainable = True
+
+    def __init__(self, forgetting: float = 0.99, delta: float = 1000.0, min_samples: int = 3):
+        self.forgetting = forgetting
+        self.delta = delta
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self) -> None:
+        self.theta = np.zeros(3)
+        self.P = np.eye(3) * self.delta
+        self.samples = 0
+
+    @property
+    def fitted(self) -> bool:
+        return self.samples >= self.min_samples
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> None:
+        self.reset()
+        for x, target in zip(X, y):
+            self.partial_fit(x, target)
+
+    def partial_fit(self, x: np.ndarray, y: float) -> None:
+        phi = np.append(x, 1.0)
+        P_phi = self.P @ phi
+        gain = P_phi / (self.forgetting + phi @ P_phi)
+        self.theta += gain * (y - phi @ self.theta)
+        self.P = (self.P - np.outer(gain, P_phi)) / self.forgetting
+        # with forgetting < 1, P grows without bound along directions the inputs do not excite (flat emission/price runs), and the
+        # first sample that moves afterwards gets a huge gain; cap the trace at its initial value
+        trace = np.trace(self.P)
+        if trace > 3 * self.delta:
+            self.P *= 3 * self.delta / trace
+        self.samples += 1
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.atleast_2d(X)
+        return X @ self.theta[:-1] + self.theta[-1]
+
+class RetrainPolicy:
+    def __init__(self, every: Optional[int] = 25, drift: Optional[float] = 0.05, time_budget: Optional[float] = None):
+        self.every = every
+        self.drift = drift
+        self.time_budget = time_budget
+
+    def should_retrain(self, samples_since_fit: int, relative_error: float, last_fit_time: float) -> bool:
+        if self.every is not None and samples_since_fit >= self.every:
+            return True
+        if self.drift is not None and relative_error > self.drift:
+            return True
+        return self.time_budget is not None and time.monotonic() - last_fit_time >= self.time_budget
+
+class NullPredictor:
+    incremental = False
+    linear = False
+    trainable = False
+    fitted = False
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> None:
+        pass
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return np.zeros(len(np.atleast_2d(X)))
@@ -0,0 +1,171 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import bittensor as bt
+from chain_snapshot import ChainSnapshot, SnapshotCache
+from submitter import ExtrinsicSubmitter, Submission
+
+class RebalanceError(Exception):
+    pass
+
+class Operation(NamedTuple):
+    call_function: str
+    netuid: int
+    amount: Optional[float]
+    destination_netuid: Optional[int] = None
+
+    @classmethod
+    def stake(cls, netuid: int, tao: float) -> 'Operation':
+        return cls('add_stake', netuid, float(tao))
+
+    @classmethod
+    def unstake(cls, netuid: int, alpha: float) -> 'Operation':
+        return cls('remove_stake', netuid, float(alpha))
+
+    @classmethod
+    def move(cls, netuid_from: int, netuid_to: int, alpha: Optional[float] = None) -> 'Operation':
+        return cls('move_stake', netuid_from, None if alpha is None else float(alpha), netuid_to)
+
+    def describe(self) -> str:
+        if self.call_function == 'add_stake':
+            return f"stake {self.amount} TAO into subnet {self.netuid}"
+        if self.call_function == 'remove_stake':
+            return f"unstake {self.amount} alpha from subnet {self.netuid}"
+        return f"move {'all' if self.amount is None else self.amount} alpha from subnet {self.netuid} to subnet {self.destination_netuid}"
+
+def _rao(amount: float) -> int:
+    return bt.Balance.from_tao(amount).rao
+
+def compose_batch(substrate, operations: Sequence[Operation], hotkey_ss58: str):
+    calls = []
+    for operation in operations:
+        if operation.call_function == 'add_stake':
+            params = {"hotkey": hotkey_ss58, "netuid": operation.netuid, "amount_staked": _rao(operation.amount)}
+        elif operation.call_function == 'remove_stake':
+            params = {"hotkey": hotkey_ss58, "netuid": operation.netuid, "amount_unstaked": _rao(operation.amount)}
+        elif operation.call_function == 'move_stake':
+            if operation.amount is None:
+                raise RebalanceError(f"Cannot {operation.describe()}: resolve the amount against a snapshot first")
+            params = {"origin_hotkey": hotkey_ss58, "origin_netuid": operation.netuid, "destination_hotkey": hotkey_ss58,
+                      "destination_netuid": operation.destination_netuid, "amount_moved": _rao(operation.amount)}
+        else:
+            raise RebalanceError(f"Unsupported operation {operation.call_function}")
+        calls.append(substrate.compose_call(call_module="SubtensorModule", call_function=operation.call_function, call_params=params))
+    # batch_all reverts every call if any of them fails, so a half-applied rebalance never lands on chain
+    return substrate.compose_call(call_module="Utility", call_function="batch_all", call_params={"calls": calls})
+
+def resolve_amounts(operations: Sequence[Operation], snapshot: ChainSnapshot, coldkey_ss58: str, hotkey_ss58: str) -> List[Operation]:
+    # move_stake has no "everything" value, so a whole-position move names what the snapshot holds after the legs before it;
+    # alpha those legs buy is only an estimate and is left out, so the amount never exceeds what the chain will have
+    held = _held(snapshot, coldkey_ss58, hotkey_ss58)
+    resolved = []
+    for operation in operations:
+        if operation.call_function != 'add_stake':
+            if operation.amount is None:
+                operation = operation._replace(amount=bt.Balance.from_rao(_rao(held.get(operation.netuid, 0.0))).tao)
+            held[operation.netuid] = held.get(operation.netuid, 0.0) - operation.amount
+        resolved.append(operation)
+    return resolved
+
+def _held(snapshot: ChainSnapshot, coldkey_ss58: str, hotkey_ss58: str) -> Dict[int, float]:
+    stakes: Dict[int, float] = {}
+    for substake in snapshot.stakes_for(coldkey_ss58):
+        if getattr(substake, 'hotkey_ss58', hotkey_ss58) == hotkey_ss58:
+            stakes[substake.netuid] = stakes.get(substake.netuid, 0.0) + float(substake.stake)
+    return stakes
+
+class _Pools:
+    def __init__(self, subnets: Sequence):
+        self.pools = {subnet.netuid: [float(subnet.tao_in), float(subnet.alpha_in), getattr(subnet, 'is_dynamic', subnet.netuid != 0)] for subnet in subnets}
+
+    def sell(self, netuid: int, alpha: float) -> float:
+        pool = self.pools[netuid]
+        if not pool[2]:
+            return alpha
+        tao = pool[0] - pool[0] * pool[1] / (pool[1] + alpha)
+        pool[0], pool[1] = pool[0] - tao, pool[1] + alpha
+        return tao
+
+    def buy(self, netuid: int, tao: float) -> float:
+        pool = self.pools[netuid]
+        if not pool[2]:
+            return tao
+        alpha = pool[1] - pool[0] * pool[1] / (pool[0] + tao)
+        pool[0], pool[1] = pool[0] + tao, pool[1] - alpha
+        return alpha
+
+def check_operations(operations: Sequence[Operation], snapshot: ChainSnapshot, coldkey_ss58: str, hotkey_ss58: str, balance: float,
+                     pending: Sequence[int] = ()) -> List[str]:
+    # replays the batch against the snapshot's pools in order, so later legs can spend what earlier legs freed up;
+    # proceeds are estimates and the chain stays the final judge, but a batch that cannot work is caught before it is signed
+    pools = _Pools(snapshot.subnets)
+    stakes = _held(snapshot, coldkey_ss58, hotkey_ss58)
+    problems = []
+    for i, operation in enumerate(operations):
+        label = f"#{i} {operation.describe()}"
+        netuids = [operation.netuid] + ([operation.destination_netuid] if operation.destination_netuid is not None else [])
+        unknown = [netuid for netuid in netuids if netuid not in pools.pools]
+        if unknown:
+            problems.append(f"{label}: subnet {unknown[0]} does not exist")
+            continue
+        if operation.amount is not None and operation.amount <= 0:
+            problems.append(f"{label}: amount must be positive")
+            continue
+        destination = operation.netuid if operation.call_function == 'add_stake' else operation.destination_netuid
+        if destination is not None and destination not in snapshot.registered:
+            problems.append(f"{label}: hotkey is not registered on subnet {destination}")
+        if operation.call_function != 'add_stake' and operation.netuid in pending:
+            problems.append(f"{label}: a transaction from subnet {operation.netuid} is still pending")
+        if operation.call_function == 'add_stake':
+            if operation.amount > balance * (1 + 1e-9):
+                problems.append(f"{label}: only {balance} TAO free")
+                continue
+            balance -= operation.amount
+            stakes[operation.netuid] = stakes.get(operation.netuid, 0.0) + pools.buy(operation.netuid, operation.amount)
+            continue
+        available = stakes.get(operation.netuid, 0.0)
+        amount = available if operation.amount is None else operation.amount
+        if amount <= 0 or amount > available * (1 + 1e-9):
+            problems.append(f"{label}: only {available} alpha staked")
+            continue
+        stakes[operation.netuid] = max(available - amount, 0.0)
+        tao = pools.sell(operation.netuid, amount)
+        if operation.call_function == 'remove_stake':
+            balance += tao
+        else:
+            stakes[operation.destination_netuid] = stakes.get(operation.destination_netuid, 0.0) + pools.buy(operation.destination_netuid, tao)
+    return problems
+
+class Rebalancer:
+    def __init__(self, subtensor: bt.subtensor, wallet: bt.wallet, hotkey_ss58: Optional[str] = None, snapshots: Optional[SnapshotCache] = None,
+                 submitter: Optional[ExtrinsicSubmitter] = None):
+        self.subtensor = subtensor
+        self.wallet = wallet
+        self.hotkey_ss58 = hotkey_ss58 or wallet.hotkey.ss58_address
+        self.snapshots = snapshots or SnapshotCache(subtensor, [wallet.coldkeypub.ss58_address], self.hotkey_ss58)
+        self.submitter = submitter
+
+    def check(self, operations: Sequence[Operation], snapshot: Optional[ChainSnapshot] = None) -> List[str]:
+        snapshot = snapshot or self.snapshots.get()
+        balance = float(self.subtensor.get_balance(self.wallet.coldkeypub.ss58_address))
+        pending = self.submitter.pending_origins if self.submitter is not None else ()
+        return check_operations(operations, snapshot, self.wallet.coldkeypub.ss58_address, self.hotkey_ss58, balance, pending)
+
+    def execute(self, operations: Sequence[Operation], snapshot: Optional[ChainSnapshot] = None) -> Optional[Submission]:
+        if not operations:
+            raise RebalanceError("Nothing to rebalance")
+        snapshot = snapshot or self.snapshots.get()
+        operations = resolve_amounts(operations, snapshot, self.wallet.coldkeypub.ss58_address, self.hotkey_ss58)
+        problems = self.check(operations, snapshot)
+        if problems:
+            raise RebalanceError("Rebalance rejected: " + "; ".join(problems))
+        call = compose_batch(self.subtensor.substrate, operations, self.hotkey_ss58)
+        bt.logging.info(f"Submitting {len(operations)} operations in one batch: {', '.join(operation.describe() for operation in operations)}")
+        if self.submitter is not None:
+            origins = [operation.netuid for operation in operations if operation.call_function != 'add_stake']
+            return self.submitter.submit(call, on_finalized=lambda future: self.snapshots.invalidate(), origin_netuids=origins)
+        extrinsic = self.subtensor.substrate.create_signed_extrinsic(call=call, keypair=self.wallet.coldkey)
+        receipt = self.subtensor.substrate.submit_extrinsic(extrinsic, wait_for_inclusion=True, wait_for_finalization=True)
+        self.snapshots.invalidate()
+        if hasattr(receipt, 'is_success') and not receipt.is_success:
+            raise RebalanceError(f"Batch failed, no operation was applied: {receipt.error_message}")
+        bt.logging.info("Rebalance completed")
+        return None
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import bittensor as bt
+
+# a registration on a full subnet replaces an existing neuron, so any of these can change whether our hotkey is registered
+REGISTRATION_EVENTS = frozenset({'NeuronRegistered', 'BulkNeuronsRegistered', 'NetworkAdded', 'NetworkRemoved'})
+
+def _event_netuid(attributes) -> Optional[int]:
+    if isinstance(attributes, dict):
+        attributes = [attributes.get('netuid')]
+    if isinstance(attributes, (list, tuple)) and attributes and isinstance(attributes[0], int):
+        return attributes[0]
+    return None
+
+class RegistrationCache:
+    def __init__(self, subtensor: bt.subtensor, hotkey_ss58: str, max_in_flight: int = 8, refresh_blocks: int = 100, batch_size: int = 128,
+                 watch_events: bool = True):
+        self.subtensor = subtensor
+        self.hotkey_ss58 = hotkey_ss58
+        self.max_in_flight = max_in_flight
+        self.refresh_blocks = refresh_blocks
+        self.batch_size = batch_size
+        self.watch_events = watch_events
+        self.rpc_calls: Dict[str, int] = {}
+        self._registered: Dict[int, bool] = {}
+        self._block: Optional[int] = None
+        self._watched_block: Optional[int] = None
+        self._stale: Set[Optional[int]] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def get(self, netuids: Sequence[int], block: int) -> Tuple[int, ...]:
+        self._drop_stale()
+        if self._block is not None and block - self._block < self.refresh_blocks and self.watch_events:
+            self._watch(block)
+            self._drop_stale()
+        if self._block is None or block - self._block >= self.refresh_blocks:
+            self._registered = self.query(netuids)
+            self._block = self._watched_block = block
+        else:
+            missing = [netuid for netuid in netuids if netuid not in self._registered]
+            if missing:
+                self._registered.update(self.query(missing))
+        return tuple(netuid for netuid in netuids if self._registered[netuid])
+
+    def invalidate(self, netuid: Optional[int] = None) -> None:
+        # may be called from the submitter's callbacks, so it only queues the netuid (None for everything) for the next get
+        self._stale.add(netuid)
+
+    def _drop_stale(self) -> None:
+        while self._stale:
+            netuid = self._stale.pop()
+            if netuid is None:
+                self._block = None
+            else:
+                self._registered.pop(netuid, None)
+
+    def observe(self, events) -> None:
+        for record in events:
+            value = getattr(record, 'value', record)
+            event = value.get('event', value) if isinstance(value, dict) else {}
+            if event.get('event_id') in REGISTRATION_EVENTS:
+                self.invalidate(_event_netuid(event.get('attributes')))
+
+    def _watch(self, block: int) -> None:
+        # blocks the bot skipped still count, the gap is bounded by refresh_blocks since a full refresh resets it
+        substrate = self.subtensor.substrate
+        if not hasattr(substrate, 'get_events'):
+            return
+        for watched in range(self._watched_block + 1, block + 1):
+            try:
+                self.rpc_calls['get_events'] = self.rpc_calls.get('get_events', 0) + 1
+                self.observe(substrate.get_events(block_hash=substrate.get_block_hash(watched)))
+            except Exception as e:
+                bt.logging.warning(f"Could not read events of block {watched}, registrations fall back to the {self.refresh_blocks} block refresh: {e}")
+                self._watched_block = block
+                return
+            self._watched_block = watched
+
+    def query(self, netuids: Sequence[int]) -> Dict[int, bool]:
+        if hasattr(self.subtensor.substrate, 'query_multi'):
+            try:
+                return self._query_multi(netuids)
+            except Exception as e:
+                bt.logging.warning(f"Multi-key registration query failed, falling back to concurrent lookups: {e}")
+        return self._query_concurrent(netuids)
+
+    def _query_multi(self, netuids: Sequence[int]) -> Dict[int, bool]:
+        substrate = self.subtensor.substrate
+        registered = {}
+        for start in range(0, len(netuids), self.batch_size):
+            batch = list(netuids[start:start + self.batch_size])
+            keys = [substrate.create_storage_key("SubtensorModule", "Uids", [netuid, self.hotkey_ss58]) for netuid in batch]
+            self.rpc_calls['query_multi'] = self.rpc_calls.get('query_multi', 0) + 1
+            values = [value for _, value in substrate.query_multi(keys)]
+            registered.update((netuid, getattr(value, 'value', value) is not None) for netuid, value in zip(batch, values))
+        return registered
+
+    def _query_concurrent(self, netuids: Sequence[int]) -> Dict[int, bool]:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        self.rpc_calls['is_hotkey_registered'] = self.rpc_calls.get('is_hotkey_registered', 0) + len(netuids)
+        results: List[bool] = list(self._executor.map(lambda netuid: self.subtensor.is_hotkey_registered(netuid=netuid, hotkey_ss58=self.hotkey_ss58), netuids))
+        return dict(zip(netuids, results))
@@ -0,0 +1,110 @@
+import argparse
+import json
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import numpy as np
+from arbitrage_bot import ArbitrageBot
+from history_store import HistoryStore
+from local_subtensor import LocalCall, LocalSubtensor, LocalWallet
+from predictors import NullPredictor
+from subnet_performance import SubnetPerformance
+
+class Recording(NamedTuple):
+    blocks: np.ndarray
+    netuids: List[int]
+    tao_in: np.ndarray
+    alpha_in: np.ndarray
+    alpha_out: np.ndarray
+    emission: np.ndarray
+
+class ReplayResult(NamedTuple):
+    blocks: np.ndarray
+    values: np.ndarray
+    swaps: List[Tuple[int, str, LocalCall]]
+    seconds: float
+
+    @property
+    def blocks_per_second(self) -> float:
+        return len(self.blocks) / self.seconds if self.seconds else float('inf')
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    present = ~np.isnan(values)
+    index = np.maximum.accumulate(np.where(present, np.arange(len(values))[:, None], 0), axis=0)
+    filled = np.take_along_axis(values, index, axis=0)
+    return np.where(np.isnan(filled), 0.0, filled)
+
+def _pools(netuids: List[int], prices: np.ndarray, pool_depth: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    prices = np.where(np.array(netuids) == 0, 1.0, prices)
+    alpha_in = np.full(prices.shape, pool_depth)
+    return prices * alpha_in, alpha_in, 2 * alpha_in
+
+def load_recording(filename: str, pool_depth: float = 1e5) -> Recording:
+    if filename.endswith('.json'):
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        netuids = sorted(int(netuid) for netuid in data)
+        length = max(len(perf_data.get('prices', [])) for perf_data in data.values())
+        prices, emission = np.full((length, len(netuids)), np.nan), np.full((length, len(netuids)), np.nan)
+        for i, netuid in enumerate(netuids):
+            perf_data = data[str(netuid)]
+            prices[length - len(perf_data['prices']):, i] = perf_data['prices']
+            emission[length - len(perf_data['emission_rates']):, i] = perf_data['emission_rates']
+        prices, emission = _forward_fill(prices), _forward_fill(emission)
+        return Recording(np.arange(length), netuids, *_pools(netuids, prices, pool_depth), emission)
+
+    records = HistoryStore(filename).records()
+    blocks, block_index = np.unique(records['block'], return_inverse=True)
+    netuids, netuid_index = np.unique(records['netuid'], return_inverse=True)
+    columns = {}
+    for column in ('price', 'emission', 'alpha_out', 'tao_in'):
+        values = np.full((len(blocks), len(netuids)), np.nan)
+        values[block_index, netuid_index] = records[column]
+        columns[column] = values
+    netuids = netuids.tolist()
+    synthetic_tao_in, synthetic_alpha_in, synthetic_alpha_out = _pools(netuids, _forward_fill(columns['price']), pool_depth)
+    recorded = ~np.isnan(columns['tao_in'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alpha_in = np.where(recorded, columns['tao_in'] / np.where(columns['price'] > 0, columns['price'], np.nan), np.nan)
+    tao_in = _forward_fill(np.where(recorded, columns['tao_in'], synthetic_tao_in))
+    alpha_in = _forward_fill(np.where(recorded, alpha_in, synthetic_alpha_in))
+    alpha_out = _forward_fill(np.where(recorded, columns['alpha_out'], synthetic_alpha_out))
+    return Recording(blocks.astype(np.int64), netuids, tao_in, alpha_in, alpha_out, _forward_fill(columns['emission']))
+
+class Replay:
+    def __init__(self, recording: Recording, initial_stakes: Dict[int, float], fast: bool = True, window_size: int = 100,
+                 registered: Optional[Set[int]] = None):
+        self.recording = recording
+        self.wallet = LocalWallet()
+        self.subtensor = LocalSubtensor(recording.netuids, recording.tao_in[0], recording.alpha_in[0], recording.alpha_out[0],
+                                        recording.emission[0], int(recording.blocks[0]), registered)
+        for netuid, amount in initial_stakes.items():
+            self.subtensor.stakes[(self.wallet.coldkeypub.ss58_address, self.wallet.hotkey.ss58_address, netuid)] = amount
+        if fast:
+            performance_factory = lambda: SubnetPerformance(window_size, NullPredictor())
+        else:
+            performance_factory = lambda: SubnetPerformance(window_size)
+        self.bot = ArbitrageBot(None, subtensor=self.subtensor, wallet=self.wallet, history_file=None, performance_factory=performance_factory)
+
+    def run(self, start: int = 0, stop: Optional[int] = None) -> ReplayResult:
+        recording = self.recording
+        blocks = recording.blocks[start:stop]
+        values = np.empty(len(blocks))
+        started = time.perf_counter()
+        for i, t in enumerate(range(start, start + len(blocks))):
+            self.subtensor.set_state(int(recording.blocks[t]), recording.tao_in[t], recording.alpha_in[t], recording.alpha_out[t], recording.emission[t])
+            self.bot.run_cycle(int(recording.blocks[t]))
+            values[i] = self.subtensor.portfolio_value(self.wallet.coldkeypub.ss58_address)
+        return ReplayResult(blocks, values, list(self.subtensor.applied), time.perf_counter() - started)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded subnet history through SwapLogic")
+    parser.add_argument('recording', help="subnet_performances.json or a HistoryStore file")
+    parser.add_argument('--stake', action='append', default=[], metavar='NETUID:ALPHA', help="initial stake, may be repeated")
+    parser.add_argument('--slow', action='store_true', help="train the price models instead of skipping them")
+    parser.add_argument('--window-size', type=int, default=100)
+    args = parser.parse_args()
+
+    stakes = {int(netuid): float(amount) for netuid, amount in (stake.split(':') for stake in args.stake)}
+    result = Replay(load_recording(args.recording), stakes, fast=not args.slow, window_size=args.window_size).run()
+    print(f"Replayed {len(result.blocks)} blocks in {result.seconds:.2f}s ({result.blocks_per_second:.0f} blocks/s)")
+    print(f"Portfolio value: {result.values[0]:.6f} -> {result.values[-1]:.6f} TAO over {len(result.swaps)} swaps")
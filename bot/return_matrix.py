@@ -0,0 +1,35 @@
+from typing import NamedTuple, Sequence, Union
+import numpy as np
+
+class PoolArrays(NamedTuple):
+    netuids: np.ndarray
+    tao_in: np.ndarray
+    alpha_in: np.ndarray
+    alpha_out: np.ndarray
+    emission: np.ndarray
+    price: np.ndarray
+
+    @classmethod
+    def from_subnets(cls, subnets: Sequence) -> 'PoolArrays':
+        pools = np.array([[subnet.netuid, float(subnet.tao_in), float(subnet.alpha_in), float(subnet.alpha_out), float(subnet.emission), float(subnet.price)]
+                          for subnet in subnets], dtype=float).reshape(-1, 6)
+        return cls(pools[:, 0].astype(int), *pools[:, 1:].T)
+
+    def take(self, index) -> 'PoolArrays':
+        return PoolArrays(*(column[index] for column in self))
+
+def subnet_returns(pools: PoolArrays, horizons: Union[float, Sequence[float]]) -> np.ndarray:
+    horizons = np.asarray(horizons, dtype=float)[..., None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        next_price = (pools.tao_in + pools.emission * horizons) / (pools.alpha_in + horizons)
+        price_drop = (pools.price - next_price) / pools.price
+        inflation = horizons / pools.alpha_out
+    return inflation - price_drop
+
+def swap_return_matrix(pools: PoolArrays, horizon: float, dtype=np.float64) -> np.ndarray:
+    returns = subnet_returns(pools, horizon).astype(dtype, copy=False)
+    return returns[None, :] - returns[:, None]
+
+def swap_return_cube(pools: PoolArrays, horizons: Sequence[float], dtype=np.float64) -> np.ndarray:
+    returns = subnet_returns(pools, horizons).astype(dtype, copy=False)
+    return returns[:, None, :] - returns[:, :, None]
@@ -0,0 +1,96 @@
+from typing import Iterable, Optional
+import numpy as np
+
+class RingBuffer:
+    __slots__ = ('capacity', '_data', '_start', '_end', '_mean', '_m2', '_weighted_sum')
+
+    def __init__(self, capacity: int, values: Iterable[float] = (), slack: Optional[int] = None):
+        self.capacity = capacity
+        self._data = np.zeros(capacity + (slack if slack is not None else max(16, capacity // 4)))
+        self.clear()
+        self.extend(values)
+
+    def clear(self) -> None:
+        self._start = self._end = 0
+        self._mean = self._m2 = self._weighted_sum = 0.0
+
+    def extend(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.append(value)
+
+    def append(self, value: float) -> Optional[float]:
+        if self._end == len(self._data):
+            size = len(self)
+            self._data[:size] = self._data[self._end - size:self._end]
+            self._start, self._end = 0, size
+            self._resync()
+        value = float(value)
+        self._data[self._end] = value
+        self._end += 1
+        n = self._end - self._start
+        self._weighted_sum += (n - 1) * value
+        delta = value - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (value - self._mean)
+        if n <= self.capacity:
+            return None
+        evicted = float(self._data[self._start])
+        self._start += 1
+        n -= 1
+        if n == 1:
+            self._mean, self._m2, self._weighted_sum = value, 0.0, 0.0
+            return evicted
+        delta = evicted - self._mean
+        self._mean -= delta / n
+        self._m2 = max(self._m2 - delta * (evicted - self._mean), 0.0)
+        self._weighted_sum -= self._mean * n
+        return evicted
+
+    def _resync(self) -> None:
+        view = self.view()
+        self._mean = float(view.mean()) if len(view) else 0.0
+        self._m2 = float(((view - self._mean) ** 2).sum()) if len(view) else 0.0
+        self._weighted_sum = float(np.arange(len(view)) @ view)
+
+    def view(self) -> np.ndarray:
+        return self._data[self._start:self._end]
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def tolist(self) -> list:
+        return self.view().tolist()
+
+    @property
+    def first(self) -> float:
+        return float(self._data[self._start]) if self._end > self._start else 0.0
+
+    @property
+    def last(self) -> float:
+        return float(self._data[self._end - 1]) if self._end > self._start else 0.0
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / len(self) if len(self) else 0.0
+
+    @property
+    def std(self) -> float:
+        return self.variance ** 0.5
+
+    @property
+    def slope(self) -> float:
+        n = len(self)
+        if n < 2:
+            return 0.0
+        index_mean = (n - 1) / 2
+        return (self._weighted_sum - n * index_mean * self._mean) / (n * (n * n - 1) / 12)
@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+import bittensor as bt
+from metrics import Metrics
+
+class StageTimeout(Exception):
+    pass
+
+class Backoff:
+    def __init__(self, base: float = 1.0, factor: float = 2.0, maximum: float = 60.0):
+        self.base = base
+        self.factor = factor
+        self.maximum = maximum
+        self.failures = 0
+
+    def failure(self) -> float:
+        self.failures += 1
+        return min(self.base * self.factor ** (self.failures - 1), self.maximum)
+
+    def reset(self) -> None:
+        self.failures = 0
+
+class BlockScheduler:
+    def __init__(self, block_source: Callable[[], int], poll_interval: float = 1.0, stage_deadlines: Optional[Dict[str, float]] = None,
+                 subscribe: Optional[Callable[[Callable], None]] = None, header_timeout: float = 60.0, sleep: Callable[[float], None] = time.sleep,
+                 metrics: Optional[Metrics] = None):
+        self.block_source = block_source
+        self.poll_interval = poll_interval
+        self.header_timeout = header_timeout
+        self.stage_deadlines = stage_deadlines or {}
+        self.sleep = sleep
+        self.metrics = metrics
+        self.dropped_blocks = 0
+        self.skipped_blocks = 0
+        self._fingerprint = None
+        self._overrun: Optional[str] = None
+        self._headers: Optional[queue.Queue] = None
+        if subscribe is not None:
+            self._headers = queue.Queue()
+            threading.Thread(target=subscribe, args=(self._on_header,), daemon=True).start()
+
+    @classmethod
+    def for_subtensor(cls, subtensor: bt.subtensor, header_subtensor: Optional[bt.subtensor] = None, **kwargs) -> 'BlockScheduler':
+        subscribe_headers = None
+        if header_subtensor is not None and hasattr(header_subtensor.substrate, 'subscribe_block_headers'):
+            subscribe_headers = lambda handler: header_subtensor.substrate.subscribe_block_headers(handler)
+        return cls(subtensor.get_current_block, subscribe=subscribe_headers, **kwargs)
+
+    def _on_header(self, header, *args):
+        self._headers.put(int(header['header']['number']))
+
+    def wait_for_block(self, last_block: Optional[int] = None) -> int:
+        while self._headers is not None:
+            try:
+                block = self._headers.get(timeout=self.header_timeout)
+            except queue.Empty:
+                bt.logging.warning("No block header received, falling back to polling")
+                break
+            while not self._headers.empty():
+                block = self._headers.get_nowait()
+                self.dropped_blocks += 1
+            if last_block is None or block > last_block:
+                return block
+        while True:
+            block = self.block_source()
+            if last_block is None or block > last_block:
+                if last_block is not None and block > last_block + 1:
+                    self.dropped_blocks += block - last_block - 1
+                return block
+            self.sleep(self.poll_interval)
+
+    def changed(self, fingerprint) -> bool:
+        if fingerprint == self._fingerprint:
+            self.skipped_blocks += 1
+            return False
+        self._fingerprint = fingerprint
+        return True
+
+    def reset_fingerprint(self) -> None:
+        self._fingerprint = None
+
+    def begin_cycle(self) -> None:
+        self._overrun = None
+
+    @contextmanager
+    def stage(self, name: str):
+        # a stage cannot be interrupted, so an overrun stops the cycle before the next stage (in particular before a swap
+        # built on stale data) instead of after work that may already have reached the chain
+        if self._overrun is not None:
+            overrun, self._overrun = self._overrun, None
+            self.dropped_blocks += 1
+            raise StageTimeout(f"{overrun}, not starting stage '{name}'")
+        start = time.monotonic()
+        yield
+        elapsed = time.monotonic() - start
+        if self.metrics is not None:
+            self.metrics.observe('stage', elapsed, name)
+        deadline = self.stage_deadlines.get(name)
+        if deadline is not None and elapsed > deadline:
+            self._overrun = f"stage '{name}' took {elapsed:.2f}s (deadline {deadline:.2f}s)"
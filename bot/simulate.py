@@ -0,0 +1,95 @@
+import argparse
+import time
+from typing import List, NamedTuple
+import numpy as np
+from arbitrage_bot import ArbitrageBot
+from local_subtensor import LocalBalance, LocalSubtensor, LocalWallet
+from metrics import Metrics
+from predictors import NullPredictor
+from subnet_performance import SubnetPerformance
+
+class SimulationResult(NamedTuple):
+    blocks: int
+    initial: np.ndarray
+    final: np.ndarray
+    swaps: np.ndarray
+    rejected: int
+    chain_seconds: float
+    bot_seconds: float
+
+def submit(subtensor: LocalSubtensor, wallet: LocalWallet, call_function: str, call_params: dict):
+    call = subtensor.substrate.compose_call(call_module="SubtensorModule", call_function=call_function, call_params=call_params)
+    extrinsic = subtensor.substrate.create_signed_extrinsic(call=call, keypair=wallet.coldkey)
+    return subtensor.substrate.submit_extrinsic(extrinsic, wait_for_inclusion=True, wait_for_finalization=True)
+
+def stake(subtensor: LocalSubtensor, wallet: LocalWallet, netuid: int, tao: float):
+    return submit(subtensor, wallet, 'add_stake', {'hotkey': wallet.hotkey.ss58_address, 'netuid': netuid, 'amount_staked': LocalBalance(tao).rao})
+
+def unstake(subtensor: LocalSubtensor, wallet: LocalWallet, netuid: int, alpha: float):
+    return submit(subtensor, wallet, 'remove_stake', {'hotkey': wallet.hotkey.ss58_address, 'netuid': netuid, 'amount_unstaked': LocalBalance(alpha).rao})
+
+def noise_trade(subtensor: LocalSubtensor, wallet: LocalWallet, rng: np.random.Generator, size: float) -> None:
+    netuid = int(rng.integers(1, len(subtensor.netuids)))
+    held = subtensor.stakes.get((wallet.coldkeypub.ss58_address, wallet.hotkey.ss58_address, netuid), 0.0)
+    if held > 0 and rng.random() < 0.5:
+        unstake(subtensor, wallet, netuid, held * rng.uniform(0.1, 1.0))
+    else:
+        stake(subtensor, wallet, netuid, min(size * rng.lognormal(0.0, 1.0), float(subtensor.get_balance(wallet.coldkeypub.ss58_address))))
+
+def simulate(n_subnets: int = 256, n_agents: int = 8, blocks: int = 1000, agent_stake: float = 100.0, every: int = 1, noise_traders: int = 4,
+             noise_size: float = 10.0, window_size: int = 100, seed: int = 0, trade_sizing: bool = True, split_destinations: int = 1) -> SimulationResult:
+    rng = np.random.default_rng(seed)
+    subtensor = LocalSubtensor.synthetic(n_subnets, seed)
+    agents: List[LocalWallet] = [LocalWallet(f'agent-{i}') for i in range(n_agents)]
+    traders: List[LocalWallet] = [LocalWallet(f'noise-{i}') for i in range(noise_traders)]
+    for wallet in agents:
+        subtensor.balances[wallet.coldkeypub.ss58_address] = agent_stake
+        stake(subtensor, wallet, int(rng.integers(1, n_subnets)), agent_stake)
+    for wallet in traders:
+        subtensor.balances[wallet.coldkeypub.ss58_address] = 1e6
+    performance_factory = lambda: SubnetPerformance(window_size, NullPredictor())
+    bots = [ArbitrageBot(None, subtensor=subtensor, wallet=wallet, history_file=None, performance_factory=performance_factory, metrics=Metrics(),
+                         trade_sizing=trade_sizing, split_destinations=split_destinations) for wallet in agents]
+    initial = np.array([subtensor.portfolio_value(wallet.coldkeypub.ss58_address) for wallet in agents])
+
+    chain_seconds = bot_seconds = 0.0
+    for step in range(blocks):
+        started = time.perf_counter()
+        subtensor.advance(1)
+        for wallet in traders:
+            noise_trade(subtensor, wallet, rng, noise_size)
+        chain_seconds += time.perf_counter() - started
+        if step % every:
+            continue
+        started = time.perf_counter()
+        # agents compete for the same pools, so nobody gets to move first every block
+        for i in rng.permutation(n_agents):
+            bots[i].run_cycle(subtensor.block)
+        bot_seconds += time.perf_counter() - started
+
+    final = np.array([subtensor.portfolio_value(wallet.coldkeypub.ss58_address) for wallet in agents])
+    swaps = np.array([sum(1 for _, signer, call in subtensor.applied if signer == wallet.coldkeypub.ss58_address and call.call_function == 'move_stake')
+                      for wallet in agents])
+    return SimulationResult(blocks, initial, final, swaps, subtensor.substrate.rejected, chain_seconds, bot_seconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run competing bots against an in-process constant-product chain")
+    parser.add_argument('--subnets', type=int, default=256)
+    parser.add_argument('--agents', type=int, default=8)
+    parser.add_argument('--blocks', type=int, default=1000)
+    parser.add_argument('--stake', type=float, default=100.0, help="TAO each agent starts with, staked into one random subnet")
+    parser.add_argument('--every', type=int, default=1, help="agents run a cycle every Nth block")
+    parser.add_argument('--noise-traders', type=int, default=4, help="wallets staking and unstaking at random every block")
+    parser.add_argument('--noise-size', type=float, default=10.0, help="median TAO per noise trade")
+    parser.add_argument('--window-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--whole-positions', action='store_true', help="agents move whole positions instead of the slippage-optimal amount")
+    parser.add_argument('--split-destinations', type=int, default=1, help="agents split each move across up to this many destinations")
+    args = parser.parse_args()
+
+    result = simulate(args.subnets, args.agents, args.blocks, args.stake, args.every, args.noise_traders, args.noise_size, args.window_size, args.seed,
+                      not args.whole_positions, args.split_destinations)
+    print(f"Simulated {result.blocks} blocks: chain {result.blocks / result.chain_seconds:.0f} blocks/s, "
+          f"bots {result.bot_seconds:.2f}s, {result.rejected} rejected extrinsics")
+    for i, (initial, final, swaps) in enumerate(zip(result.initial, result.final, result.swaps)):
+        print(f"agent-{i:<4} {initial:12.4f} -> {final:12.4f} TAO ({final / initial - 1:+.2%}) over {swaps} swaps")
@@ -0,0 +1,212 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Callable, FrozenSet, NamedTuple, Optional, Sequence, Set
+import bittensor as bt
+
+class SubmissionError(Exception):
+    pass
+
+class SubmissionUnknown(SubmissionError):
+    pass
+
+class Submission(NamedTuple):
+    call: object
+    origin_netuids: FrozenSet[int]
+    included: Future
+    finalized: Future
+
+class ExtrinsicSubmitter:
+    def __init__(self, substrate, keypair, wait_for_finalization: bool = True, timeout: float = 120.0, max_retries: int = 2,
+                 finalization_poll_interval: float = 2.0, max_in_flight: int = 8, lookback_blocks: int = 16):
+        self.substrate = substrate
+        self.keypair = keypair
+        self.wait_for_finalization = wait_for_finalization
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.finalization_poll_interval = finalization_poll_interval
+        self.lookback_blocks = lookback_blocks
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending_origins: Set[int] = set()
+        self._nonce: Optional[int] = None
+        self._rpc = ThreadPoolExecutor(max_workers=1)
+        self._rpc_lock = threading.Lock()
+        # the worker only signs and sends, inclusion and finalization are followed here so the next nonce goes out straight away
+        self._tracker = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def is_pending(self, netuid: int) -> bool:
+        with self._lock:
+            return netuid in self._pending_origins
+
+    @property
+    def pending_origins(self) -> Set[int]:
+        with self._lock:
+            return set(self._pending_origins)
+
+    def submit(self, call, origin_netuid: Optional[int] = None, on_included: Optional[Callable] = None,
+               on_finalized: Optional[Callable] = None, origin_netuids: Sequence[int] = ()) -> Submission:
+        # a batch spends from every subnet it unstakes or moves out of, so all of them stay locked until it lands
+        origins = frozenset(origin_netuids) | ({origin_netuid} if origin_netuid is not None else set())
+        with self._lock:
+            busy = sorted(origins & self._pending_origins)
+            if busy:
+                raise SubmissionError(f"A transaction from subnet {busy[0]} is already pending")
+            self._pending_origins |= origins
+        submission = Submission(call, origins, Future(), Future())
+        if on_included is not None:
+            submission.included.add_done_callback(on_included)
+        if on_finalized is not None:
+            submission.finalized.add_done_callback(on_finalized)
+        self._queue.put(submission)
+        return submission
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._worker.join()
+        self._tracker.shutdown(wait=True)
+        self._rpc.shutdown(wait=False)
+
+    def _run(self):
+        while True:
+            submission = self._queue.get()
+            if submission is None:
+                break
+            try:
+                nonce, extrinsic, receipt = self._send(submission)
+            except Exception as e:
+                self._finish(submission, e)
+                continue
+            self._tracker.submit(self._track, submission, nonce, extrinsic, receipt)
+
+    def _finish(self, submission: Submission, error: Optional[Exception] = None):
+        if error is not None:
+            for future in (submission.included, submission.finalized):
+                if not future.done():
+                    future.set_exception(error)
+        with self._lock:
+            self._pending_origins -= submission.origin_netuids
+
+    def _next_nonce(self) -> int:
+        with self._lock:
+            nonce = self._nonce
+        if nonce is None:
+            nonce = self._call(self.substrate.get_account_next_index, self.keypair.ss58_address)
+        with self._lock:
+            self._nonce = nonce + 1
+        return nonce
+
+    def _reset_nonce(self):
+        with self._lock:
+            self._nonce = None
+
+    def _call(self, fn, *args, **kwargs):
+        with self._rpc_lock:
+            rpc = self._rpc
+            future = rpc.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # the hung call keeps its thread, later calls get a fresh one and the old pool exits once the call returns
+            with self._rpc_lock:
+                if self._rpc is rpc:
+                    self._rpc = ThreadPoolExecutor(max_workers=1)
+                    rpc.shutdown(wait=False)
+            raise SubmissionError(f"{getattr(fn, '__name__', fn)} timed out after {self.timeout}s")
+
+    def _send(self, submission: Submission):
+        nonce = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                if nonce is None:
+                    nonce = self._next_nonce()
+                extrinsic = self.substrate.create_signed_extrinsic(call=submission.call, keypair=self.keypair, nonce=nonce)
+                return nonce, extrinsic, self._call(self.substrate.submit_extrinsic, extrinsic, wait_for_inclusion=False, wait_for_finalization=False)
+            except Exception as e:
+                # once signed, a timeout or dropped connection says nothing about whether the extrinsic reached the chain; a fresh
+                # nonce could then execute the same call twice, so retries reuse the nonce and at most one of them can land
+                if nonce is not None and self._nonce_used(nonce):
+                    bt.logging.warning(f"Submission with nonce {nonce} failed ({e}) but the nonce is already used, looking up its outcome")
+                    return nonce, extrinsic, None
+                if attempt < self.max_retries:
+                    bt.logging.warning(f"Submission attempt {attempt + 1} failed, retrying{'' if nonce is None else f' with nonce {nonce}'}: {e}")
+                    continue
+                if nonce is not None and self._await_nonce(nonce):
+                    return nonce, extrinsic, None
+                self._reset_nonce()
+                raise
+
+    def _track(self, submission: Submission, nonce: int, extrinsic, receipt):
+        try:
+            if getattr(receipt, 'block_hash', None) is None:
+                receipt = self._await_inclusion(nonce, extrinsic, receipt)
+            if hasattr(receipt, 'is_success') and not receipt.is_success:
+                # the extrinsic was included and spent its nonce, the chain rejected the call itself
+                raise SubmissionError(f"Extrinsic failed: {receipt.error_message}")
+            submission.included.set_result(receipt)
+            if self.wait_for_finalization:
+                self._wait_for_finalization(receipt)
+            submission.finalized.set_result(receipt)
+        except Exception as e:
+            self._finish(submission, e)
+        else:
+            self._finish(submission)
+
+    def _await_inclusion(self, nonce: int, extrinsic, receipt):
+        if not self._await_nonce(nonce):
+            # later nonces queue behind the missing one, so the next submission starts again from the chain
+            self._reset_nonce()
+            raise SubmissionError(f"Extrinsic with nonce {nonce} not included within {self.timeout}s")
+        extrinsic_hash = getattr(receipt, 'extrinsic_hash', None) or getattr(extrinsic, 'extrinsic_hash', None)
+        found = self._locate(extrinsic_hash) if extrinsic_hash is not None else None
+        if found is None:
+            # the nonce may have gone to another transaction from this coldkey, so the call might not have run at all
+            raise SubmissionUnknown(f"Nonce {nonce} is used but its extrinsic was not found in the last {self.lookback_blocks} blocks")
+        return found
+
+    def _locate(self, extrinsic_hash):
+        if isinstance(extrinsic_hash, bytes):
+            extrinsic_hash = '0x' + extrinsic_hash.hex()
+        head = self._call(self.substrate.get_block_number, self._call(self.substrate.get_chain_head))
+        for block in range(head, max(head - self.lookback_blocks, -1), -1):
+            block_hash = self._call(self.substrate.get_block_hash, block)
+            try:
+                receipt = self._call(self.substrate.retrieve_extrinsic_by_hash, block_hash, extrinsic_hash)
+                # receipts are read lazily, the outcome is only fetched (and the extrinsic only looked for) here
+                receipt.is_success
+                return receipt
+            except SubmissionError:
+                raise
+            except Exception:
+                continue
+        return None
+    def _nonce_used(self, nonce: int) -> bool:
+        try:
+            return self._call(self.substrate.get_account_next_index, self.keypair.ss58_address) > nonce
+        except Exception as e:
+            bt.logging.warning(f"Could not read the account nonce: {e}")
+            return False
+
+    def _await_nonce(self, nonce: int) -> bool:
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self._nonce_used(nonce):
+                return True
+            time.sleep(self.finalization_poll_interval)
+        return False
+
+    def _wait_for_finalization(self, receipt):
+        block_hash = getattr(receipt, 'block_hash', None)
+        if block_hash is None:
+            return
+        included_block = self._call(self.substrate.get_block_number, block_hash)
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            finalized_block = self._call(self.substrate.get_block_number, self._call(self.substrate.get_chain_finalised_head))
+            if finalized_block >= included_block:
+                return
+            time.sleep(self.finalization_poll_interval)
+        raise SubmissionError(f"Block {included_block} not finalized within {self.timeout}s")
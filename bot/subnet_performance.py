@@ -1,66 +1,154 @@
+import itertools
+import time
+from typing import Dict, Optional, Tuple
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error
 import bittensor as bt
+from predictors import ForestPredictor, RetrainPolicy
+from ring_buffer import RingBuffer
+
+# versions are unique across instances, so a cache keyed on them survives a performance being replaced
+_versions = itertools.count(1)
 
 class SubnetPerformance:
-    def __init__(self, window_size: int = 100):
-        self.emission_rates = []
-        self.prices = []
+    __slots__ = ('window_size', '_emission_rates', '_prices', 'alpha_out', 'tao_in', 'emission', 'price', 'predictor',
+                 'retrain_policy', 'log_mse', 'samples_since_fit', 'last_fit_time', '_next_price', 'trainer', 'dirty', 'version', '_updated_version')
+
+    def __init__(self, window_size: int = 100, predictor=None, retrain_policy: RetrainPolicy = None, log_mse: bool = False):
         self.window_size = window_size
+        self._emission_rates = RingBuffer(window_size)
+        self._prices = RingBuffer(window_size)
         self.alpha_out = self.tao_in = self.emission = self.price = None
-        self.model = RandomForestRegressor(n_estimators=100)
-        self.model_fitted = False
+        self.predictor = predictor if predictor is not None else ForestPredictor()
+        self.retrain_policy = retrain_policy if retrain_policy is not None else RetrainPolicy()
+        self.log_mse = log_mse
+        self.samples_since_fit = 0
+        self.last_fit_time = 0.0
+        self._next_price = None
+        self.trainer = None
+        self.dirty = True
+        self.version = next(_versions)
+        self._updated_version = None
+
+    def _touch(self) -> None:
+        self.version = next(_versions)
+
+    def _mark_updated(self) -> None:
+        # dirty covers everything since the previous update, including models trained in between
+        self.dirty = self.version != self._updated_version
+        self._updated_version = self.version
+
+    @property
+    def model_fitted(self) -> bool:
+        return self.predictor.fitted
+
+    @property
+    def emission_rates(self) -> np.ndarray:
+        return self._emission_rates.view()
+
+    @emission_rates.setter
+    def emission_rates(self, values) -> None:
+        self._emission_rates.clear()
+        self._emission_rates.extend(values[-self.window_size:])
+        self._touch()
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self._prices.view()
+
+    @prices.setter
+    def prices(self, values) -> None:
+        self._prices.clear()
+        self._prices.extend(values[-self.window_size:])
+        self._next_price = None
+        self._touch()
 
     def update(self, subnet_info):
         if isinstance(subnet_info, dict):
             self.emission_rates = subnet_info.get('emission_rates', [])
             self.prices = subnet_info.get('prices', [])
-        else:
-            self.alpha_out, self.tao_in, self.emission, self.price = map(float, (subnet_info.alpha_out, subnet_info.tao_in, subnet_info.emission, subnet_info.price))
-            self.emission_rates.append(self.emission)
-            self.prices.append(self.price)
-            if len(self.emission_rates) > self.window_size:
-                self.emission_rates.pop(0)
-                self.prices.pop(0)
-        self.train_model()
+            self.train_model()
+            self._mark_updated()
+            return self
+        state = tuple(map(float, (subnet_info.alpha_out, subnet_info.tao_in, subnet_info.emission, subnet_info.price)))
+        changed = state != (self.alpha_out, self.tao_in, self.emission, self.price)
+        predicted = self.predict_next_price()
+        first, length = self._prices.first, len(self._prices)
+        self.alpha_out, self.tao_in, self.emission, self.price = state
+        # a repeated sample carries no new information, so it neither moves the model nor counts towards a retrain
+        if changed:
+            self._next_price = None
+            if self.predictor.incremental and length:
+                self.predictor.partial_fit(np.array([self._emission_rates.last, self._prices.last]), self.price)
+            self.samples_since_fit += 1
+        self._emission_rates.append(self.emission)
+        self._prices.append(self.price)
+        if changed or length < 2 or self._prices.first != first:
+            self._touch()
+        relative_error = abs(predicted - self.price) / self.price if self.model_fitted and self.price else 0.0
+        if self.predictor.trainable and (not self.model_fitted or
+                                         (changed and self.retrain_policy.should_retrain(self.samples_since_fit, relative_error, self.last_fit_time))):
+            if self.trainer is not None and not self.predictor.incremental:
+                self.trainer.submit(self)
+            else:
+                self.train_model()
+        self._mark_updated()
         return self
 
     def train_model(self):
         if len(self.prices) > 20:
-            X = np.array([self.emission_rates[:-1], self.prices[:-1]]).T
-            y = np.array(self.prices[1:])
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            self.model.fit(X_train, y_train)
-            y_pred = self.model.predict(X_test)
-            mse = mean_squared_error(y_test, y_pred)
-            bt.logging.info(f"Model MSE: {mse}")
-            self.model_fitted = True
+            mse = fit_predictor(self.predictor, self.emission_rates, self.prices, self.log_mse)
+            if mse is not None:
+                bt.logging.info(f"Model MSE: {mse}")
+            self.model_trained()
+
+    def model_trained(self, predictor=None):
+        if predictor is not None:
+            self.predictor = predictor
+        self.samples_since_fit = 0
+        self.last_fit_time = time.monotonic()
+        self._next_price = None
+        self._touch()
 
     def predict_next_price(self):
+        if self._next_price is None:
+            self._next_price = self._predict_next_price()
+        return self._next_price
+
+    def _predict_next_price(self):
         if not self.model_fitted:
             return 0
         if len(self.prices) > 0:
-            X = np.array([[self.emission_rates[-1], self.prices[-1]]])
-            return self.model.predict(X)[0]
+            X = np.array([[self._emission_rates.last, self._prices.last]])
+            return self.predictor.predict(X)[0]
         return 0
 
     @property
     def current_emission_rate(self) -> float:
-        return self.emission_rates[-1] if self.emission_rates else 0
+        return self._emission_rates.last
 
     @property
     def current_price(self) -> float:
-        return self.prices[-1] if self.prices else 0
+        return self._prices.last
 
     @property
     def trend(self) -> float:
         return self.current_price - self.current_emission_rate
 
+    @property
+    def price_slope(self) -> float:
+        return self._prices.slope
+
+    @property
+    def mean_price(self) -> float:
+        return self._prices.mean
+
+    @property
+    def price_variance(self) -> float:
+        return self._prices.variance
+
     @property
     def volatility(self) -> float:
-        return np.std(self.prices) if len(self.prices) > 1 else 0
+        return self._prices.std if len(self._prices) > 1 else 0
 
     @property
     def inflation_rate(self) -> float:
@@ -68,6 +156,31 @@ class SubnetPerformance:
 
     @property
     def price_drop_percentage(self) -> float:
-        if len(self.prices) > 1:
-            return (self.prices[0] - self.prices[-1]) / self.prices[0]
+        if len(self._prices) > 1 and self._prices.first != 0:
+            return (self._prices.first - self._prices.last) / self._prices.first
         return 0
+
+    def features(self) -> Tuple[float, float, float, float, float]:
+        return self.current_emission_rate, self.current_price, self.inflation_rate, self.price_drop_percentage, self.predict_next_price()
+
+def fit_predictor(predictor, emission_rates: np.ndarray, prices: np.ndarray, log_mse: bool = False) -> Optional[float]:
+    X = np.column_stack((emission_rates[:-1], prices[:-1]))
+    y = prices[1:]
+    if not log_mse:
+        predictor.fit(X, y)
+        return None
+    from sklearn.metrics import mean_squared_error
+    from sklearn.model_selection import train_test_split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    predictor.fit(X_train, y_train)
+    return mean_squared_error(y_test, predictor.predict(X_test))
+
+def predict_next_prices(performances: Dict[int, SubnetPerformance]) -> Dict[int, float]:
+    linear = [perf for perf in performances.values()
+              if perf._next_price is None and perf.predictor.linear and perf.model_fitted and len(perf.prices)]
+    if linear:
+        X = np.array([[perf.current_emission_rate, perf.current_price] for perf in linear])
+        theta = np.array([perf.predictor.theta for perf in linear])
+        for perf, prediction in zip(linear, np.einsum('ij,ij->i', X, theta[:, :-1]) + theta[:, -1]):
+            perf._next_price = float(prediction)
+    return {netuid: perf.predict_next_price() for netuid, perf in performances.items()}
@@ -0,0 +1,158 @@
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from subnet_performance import SubnetPerformance
+
+class SwapWeights(NamedTuple):
+    emission: float
+    price_emission_discrepancy: float
+    inflation: float
+    price_drop: float
+    prediction: float
+    slippage: float
+    min_improvement_threshold: float
+
+    @classmethod
+    def stack(cls, configs: Sequence['SwapWeights']) -> 'SwapWeights':
+        return cls.from_matrix(np.array(configs, dtype=float))
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray) -> 'SwapWeights':
+        return cls(*np.asarray(matrix, dtype=float).reshape(-1, len(cls._fields)).T)
+
+    def as_matrix(self) -> np.ndarray:
+        return np.column_stack([np.atleast_1d(field) for field in self])
+
+    @property
+    def configurations(self) -> int:
+        return np.size(self.emission)
+
+    def expand(self, ndim: int) -> 'SwapWeights':
+        return SwapWeights(*(np.reshape(field, (-1,) + (1,) * ndim) for field in self))
+
+class Features(NamedTuple):
+    emission: np.ndarray
+    price: np.ndarray
+    inflation: np.ndarray
+    price_drop: np.ndarray
+    predicted: np.ndarray
+
+    @classmethod
+    def from_performances(cls, performances: Sequence[SubnetPerformance]) -> 'Features':
+        return cls(*np.array([performance.features() for performance in performances], dtype=float).reshape(-1, 5).T)
+
+class SubnetArrays(NamedTuple):
+    tao_in: np.ndarray
+    alpha_in: np.ndarray
+    alpha_out: np.ndarray
+    pool_price: np.ndarray
+    dynamic: np.ndarray
+    emission: np.ndarray
+    price: np.ndarray
+    inflation: np.ndarray
+    price_drop: np.ndarray
+    predicted: np.ndarray
+
+    @classmethod
+    def load(cls, subnets: Sequence, performances: Dict[int, SubnetPerformance], netuids: Sequence[int]) -> 'SubnetArrays':
+        pools = np.array([[float(subnets[netuid].tao_in), float(subnets[netuid].alpha_in), float(subnets[netuid].alpha_out),
+                           float(subnets[netuid].price), getattr(subnets[netuid], 'is_dynamic', True)] for netuid in netuids], dtype=float).reshape(-1, 5)
+        features = np.array([performances[netuid].features() for netuid in netuids], dtype=float).reshape(-1, 5)
+        return cls(*pools[:, :4].T, pools[:, 4].astype(bool), *features.T)
+
+    def take(self, index: np.ndarray) -> 'SubnetArrays':
+        return SubnetArrays(*(column[index] for column in self))
+
+def alpha_to_tao_with_slippage(pools: SubnetArrays, alpha: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returned = pools.tao_in - pools.tao_in * pools.alpha_in / (pools.alpha_in + alpha)
+    ideal = alpha * pools.pool_price
+    returned = np.where(pools.dynamic, returned, alpha)
+    return returned, np.where(pools.dynamic, np.maximum(ideal - returned, 0), 0)
+
+def tao_to_alpha_with_slippage(pools: SubnetArrays, tao: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    new_tao_in = pools.tao_in + tao
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returned = pools.alpha_in - pools.tao_in * pools.alpha_in / new_tao_in
+        ideal = np.where(pools.pool_price != 0, tao / pools.pool_price, 0)
+    dynamic = pools.dynamic & (new_tao_in != 0)
+    returned = np.where(dynamic, returned, tao)
+    return returned, np.where(dynamic, np.maximum(ideal - returned, 0), 0)
+
+def subnet_scores(subnets: SubnetArrays, weights: SwapWeights) -> np.ndarray:
+    return (subnets.emission * weights.emission
+            + (subnets.emission - subnets.price) * weights.price_emission_discrepancy
+            + subnets.inflation * weights.inflation
+            + (1 - subnets.price_drop) * weights.price_drop
+            + subnets.predicted * weights.prediction)
+
+def adjusted_improvements(global_tao_dif: np.ndarray, a: SubnetArrays, b: SubnetArrays, slippage: np.ndarray, weights: SwapWeights) -> np.ndarray:
+    emission_diff = (b.emission - a.emission) * weights.emission
+    price_emission_discrepancy_diff = ((b.emission - b.price) - (a.emission - a.price)) * weights.price_emission_discrepancy
+    inflation_diff = (b.inflation - a.inflation) * weights.inflation
+    price_drop_diff = (a.price_drop - b.price_drop) * weights.price_drop
+    predicted_price_change_diff = (b.predicted - a.predicted) * weights.prediction
+    slippage_factor = 1 - (slippage * weights.slippage)
+    doubled = np.where((a.price > a.emission) & (b.emission > b.price), 2, 1)
+    return (global_tao_dif + emission_diff + price_emission_discrepancy_diff) * doubled * (1 + inflation_diff + price_drop_diff + predicted_price_change_diff) * slippage_factor
+
+def evaluate_swaps(a: SubnetArrays, b: SubnetArrays, stake: np.ndarray, same: np.ndarray, scores_a: np.ndarray, scores_b: np.ndarray,
+                   weights: SwapWeights, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    undervalued_a = a.emission > a.price + tolerance
+    undervalued_b = b.emission > b.price + tolerance
+    skipped = same | (b.price >= b.emission - tolerance) | (undervalued_a & undervalued_b & ((b.emission - b.price) <= (a.emission - a.price)))
+    allows_negative = undervalued_a & undervalued_b
+    valid = ~(b.emission <= b.price + tolerance) & ((a.price > a.emission + tolerance) | allows_negative)
+    valid &= (a.alpha_out != 0) & (b.alpha_out != 0) & (a.tao_in != 0) & (b.tao_in != 0) & (stake > 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        global_tao_before = a.tao_in * stake / a.alpha_out
+        received_amount_tao, slippage_a = alpha_to_tao_with_slippage(a, stake)
+        received_amount_destination, slippage_b = tao_to_alpha_with_slippage(b, received_amount_tao)
+        global_tao_after = b.tao_in * received_amount_destination / b.alpha_out
+        total_slippage = (slippage_a + slippage_b) / stake
+        improvement = adjusted_improvements(global_tao_after - global_tao_before, a, b, total_slippage, weights)
+        adjusted = improvement + (scores_b - scores_a) - (total_slippage * weights.slippage)
+    adjusted = np.where((a.price > a.emission) & (b.emission > b.price), adjusted * 2, adjusted)
+    adjusted = np.where(valid & ~skipped & ~np.isnan(adjusted), adjusted, -np.inf)
+    return adjusted, allows_negative & valid & ~skipped
+
+def select_best_swap(adjusted: np.ndarray, allows_negative: np.ndarray, threshold: float) -> Optional[int]:
+    adjusted, allows_negative = adjusted.ravel(), allows_negative.ravel()
+    candidates = (adjusted > threshold) & (adjusted > -np.inf)
+    best, start, floor = None, 0, -np.inf
+    negative = np.flatnonzero(candidates & allows_negative)
+    if negative.size:
+        best = int(negative[-1])
+        start, floor = best + 1, adjusted[best]
+    tail = np.where(candidates[start:] & (adjusted[start:] > floor), adjusted[start:], -np.inf)
+    if tail.size and tail.max() > -np.inf:
+        best = start + int(np.argmax(tail))
+    return best
+
+def select_best_swaps(adjusted: np.ndarray, allows_negative: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    adjusted = adjusted.reshape(len(adjusted), -1)
+    allows_negative = np.broadcast_to(allows_negative.reshape(-1, adjusted.shape[1]), adjusted.shape)
+    candidates = (adjusted > np.reshape(thresholds, (-1, 1))) & (adjusted > -np.inf)
+    positions = np.arange(adjusted.shape[1])
+    negative = candidates & allows_negative
+    last_negative = np.where(negative.any(axis=1), adjusted.shape[1] - 1 - np.argmax(negative[:, ::-1], axis=1), -1)
+    floor = np.where(last_negative >= 0, adjusted[np.arange(len(adjusted)), np.maximum(last_negative, 0)], -np.inf)
+    tail = np.where(candidates & (positions > last_negative[:, None]) & (adjusted > floor[:, None]), adjusted, -np.inf)
+    best = np.argmax(tail, axis=1)
+    return np.where(tail[np.arange(len(adjusted)), best] > -np.inf, best, last_negative)
+
+def evaluate_weight_grid(arrays: SubnetArrays, rows: np.ndarray, cols: np.ndarray, stake: np.ndarray, weights: SwapWeights,
+                         tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    scores = subnet_scores(arrays, weights.expand(1))
+    adjusted, allows_negative = evaluate_swaps(arrays.take(rows), arrays.take(cols), stake, rows == cols, scores[:, rows[:, 0]][:, :, None],
+                                               scores[:, cols[0]][:, None, :], weights.expand(2), tolerance)
+    return adjusted, np.broadcast_to(allows_negative, adjusted.shape)
+
+def best_swaps_for_weights(arrays: SubnetArrays, rows: np.ndarray, cols: np.ndarray, stake: np.ndarray, weights: SwapWeights,
+                           tolerance: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    adjusted, allows_negative = evaluate_weight_grid(arrays, rows, cols, stake, weights, tolerance)
+    best = select_best_swaps(adjusted, allows_negative, weights.min_improvement_threshold)
+    flat = np.maximum(best, 0)
+    configs = np.arange(len(best))
+    adjusted, allows_negative = adjusted.reshape(len(best), -1)[configs, flat], allows_negative.reshape(len(best), -1)[configs, flat]
+    return best, np.where(best >= 0, adjusted, -np.inf), np.where(best >= 0, allows_negative, False)
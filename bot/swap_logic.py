@@ -1,12 +1,23 @@
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional, Sequence
 import bittensor as bt
 from subnet_performance import SubnetPerformance
+from chain_snapshot import ChainSnapshot, SnapshotCache
+from submitter import ExtrinsicSubmitter, Submission, SubmissionUnknown
+from swap_kernel import (Features, SubnetArrays, SwapWeights, adjusted_improvements, best_swaps_for_weights, evaluate_weight_grid,
+                         evaluate_swaps, select_best_swap, subnet_scores)
+from candidate_index import CandidateIndex, pruned_best_swap
+from pair_scores import PairScores, SubnetArrayCache
+from rebalance import Operation, compose_batch
+from trade_size import optimal_move_amounts, split_stake
 import numpy as np
 
 class SwapLogic:
-    def __init__(self, subtensor: bt.subtensor, wallet: bt.wallet):
+    def __init__(self, subtensor: bt.subtensor, wallet: bt.wallet, snapshots: Optional[SnapshotCache] = None, submitter: Optional[ExtrinsicSubmitter] = None):
         self.subtensor = subtensor
         self.wallet = wallet
+        self.submitter = submitter
+        self.hotkey_ss58 = "Enter SS58"
+        self.snapshots = snapshots or SnapshotCache(subtensor, [wallet.coldkeypub.ss58_address], self.hotkey_ss58)
         self.tolerance = 1e-6
         self.long_term_factor = 1.0
         self.emission_weight = 2.0
@@ -16,32 +27,138 @@ class SwapLogic:
         self.prediction_weight = 0.8
         self.slippage_weight = 1.5
         self.min_improvement_threshold = 0.001
+        self.vectorized = True
+        self.pruned = True
+        self.pruning_batch = 32
+        self.candidate_index = CandidateIndex()
+        self.subnet_arrays = SubnetArrayCache()
+        self.pair_scores = PairScores()
+        self.pruned_result: Optional[Tuple[Optional[int], float, bool]] = None
+        self.pairs_evaluated = 0
+        self.trade_sizing = True
+        self.split_destinations = 1
 
-    def swap(self, netuid_from: int, netuid_to: int) -> None:
-        bt.logging.info(f"Swapping stake from subnet {netuid_from} to subnet {netuid_to}")
+    def clear_caches(self) -> None:
+        self.candidate_index = CandidateIndex()
+        self.subnet_arrays = SubnetArrayCache()
+        self.pair_scores = PairScores()
+        self.pruned_result = None
+
+    @property
+    def weights(self) -> SwapWeights:
+        return SwapWeights(self.emission_weight, self.price_emission_discrepancy_weight, self.inflation_weight, self.price_drop_weight,
+                           self.prediction_weight, self.slippage_weight, self.min_improvement_threshold)
+
+    def swap(self, netuid_from: int, netuid_to: int, amount: Optional[float] = None) -> Optional[Submission]:
+        # move_stake has no "everything" value, a whole move has to name the position itself
+        amount = self.staked_on(netuid_from) if amount is None else amount
+        amount_moved = bt.Balance.from_tao(amount).rao
+        if amount_moved <= 0:
+            raise ValueError(f"Nothing to move from subnet {netuid_from}, amount must be at least one rao")
+        bt.logging.info(f"Swapping {amount} stake from subnet {netuid_from} to subnet {netuid_to}")
         call = self.subtensor.substrate.compose_call(
             call_module="SubtensorModule",
             call_function="move_stake",
             call_params={
-                "origin_hotkey": "Enter SS58",
+                "origin_hotkey": self.hotkey_ss58,
                 "origin_netuid": netuid_from,
-                "destination_hotkey": "Enter SS58",
+                "destination_hotkey": self.hotkey_ss58,
                 "destination_netuid": netuid_to,
-                "amount_moved": 0,
+                "amount_moved": amount_moved,
             },
         )
+        return self._submit(call, netuid_from, [netuid_to])
+
+    def swap_split(self, netuid_from: int, legs: Sequence[Tuple[int, Optional[float]]]) -> Optional[Submission]:
+        if len(legs) == 1:
+            return self.swap(netuid_from, *legs[0])
+        # the submitter holds one transaction per origin, so every leg of the split goes out in a single batch
+        operations = [Operation.move(netuid_from, netuid_to, self.staked_on(netuid_from) if amount is None else amount) for netuid_to, amount in legs]
+        bt.logging.info(f"Splitting stake from subnet {netuid_from}: {', '.join(operation.describe() for operation in operations)}")
+        return self._submit(compose_batch(self.subtensor.substrate, operations, self.hotkey_ss58), netuid_from, [netuid_to for netuid_to, _ in legs])
+
+    def _submit(self, call, netuid_from: int, netuids_to: List[int]) -> Optional[Submission]:
+        label = f"Swap from subnet {netuid_from} to subnet {', '.join(map(str, netuids_to))}"
+        if self.submitter is not None:
+            submission = self.submitter.submit(call, netuid_from, on_finalized=lambda future: self._swap_finalized(label, [netuid_from] + netuids_to, future))
+            bt.logging.info(f"{label} submitted")
+            return submission
         extrinsic = self.subtensor.substrate.create_signed_extrinsic(call=call, keypair=self.wallet.coldkey)
-        self.subtensor.substrate.submit_extrinsic(extrinsic, wait_for_inclusion=False, wait_for_finalization=True)
+        receipt = self.subtensor.substrate.submit_extrinsic(extrinsic, wait_for_inclusion=False, wait_for_finalization=True)
+        self.snapshots.invalidate()
+        if hasattr(receipt, 'is_success') and not receipt.is_success:
+            bt.logging.error(f"{label} failed: {receipt.error_message}")
+            self._forget_registrations(netuid_from, *netuids_to)
+            return None
         bt.logging.info("Swap completed")
+        return None
+
+    def _forget_registrations(self, *netuids: int) -> None:
+        # a rejected move is the first sign that the hotkey was deregistered from one of its subnets
+        if self.snapshots.registrations is not None:
+            for netuid in netuids:
+                self.snapshots.registrations.invalidate(netuid)
+
+    def _swap_finalized(self, label: str, netuids: List[int], future) -> None:
+        self.snapshots.invalidate()
+        if isinstance(future.exception(), SubmissionUnknown):
+            bt.logging.warning(f"{label} outcome unknown, stakes are re-read from the chain: {future.exception()}")
+        elif future.exception() is not None:
+            bt.logging.error(f"{label} failed: {future.exception()}")
+            self._forget_registrations(*netuids)
+        else:
+            bt.logging.info(f"{label} finalized")
+
+    def staked_on(self, netuid: int, snapshot: Optional[ChainSnapshot] = None) -> float:
+        snapshot = snapshot or self.snapshots.get()
+        return sum(float(substake.stake) for substake in snapshot.stakes_for(self.wallet.coldkeypub.ss58_address) if substake.netuid == netuid)
+
+    def size_swap(self, netuid_from: int, netuid_to: int, performances: Dict[int, SubnetPerformance], snapshot: Optional[ChainSnapshot] = None) -> float:
+        snapshot = snapshot or self.snapshots.get()
+        stake = self.staked_on(netuid_from, snapshot)
+        arrays = SubnetArrays.load(snapshot.subnets, performances, [netuid_from, netuid_to])
+        amount, _ = optimal_move_amounts(arrays.take(0), arrays.take(1), stake)
+        return bt.Balance.from_rao(bt.Balance.from_tao(float(amount)).rao).tao
+
+    def plan_split(self, netuid_from: int, destinations: List[int], performances: Dict[int, SubnetPerformance],
+                   snapshot: Optional[ChainSnapshot] = None) -> List[Tuple[int, float]]:
+        snapshot = snapshot or self.snapshots.get()
+        stake = self.staked_on(netuid_from, snapshot)
+        arrays = SubnetArrays.load(snapshot.subnets, performances, [netuid_from] + list(destinations))
+        split = split_stake(arrays.take(0), arrays.take(slice(1, None)), stake)
+        amounts = [(netuid, bt.Balance.from_rao(bt.Balance.from_tao(float(amount)).rao).tao) for netuid, amount in zip(destinations, split.amounts)]
+        return [(netuid, amount) for netuid, amount in amounts if amount > 0]
+
+    def plan_legs(self, netuid_from: int, netuid_to: int, candidates: List[int], performances: Dict[int, SubnetPerformance],
+                  snapshot: Optional[ChainSnapshot] = None) -> List[Tuple[int, float]]:
+        snapshot = snapshot or self.snapshots.get()
+        if self.split_destinations > 1:
+            ranked = [netuid for netuid in self.rank_destinations(netuid_from, candidates, performances, snapshot) if netuid != netuid_to]
+            legs = self.plan_split(netuid_from, [netuid_to] + ranked[:self.split_destinations - 1], performances, snapshot)
+            # the split values alpha at its global price only, a plan that skips the chosen destination would just be swapped back
+            if any(netuid == netuid_to for netuid, _ in legs):
+                return legs
+        amount = self.size_swap(netuid_from, netuid_to, performances, snapshot)
+        return [(netuid_to, amount)] if amount > 0 else []
 
-    def global_dynamic(self) -> bt.Balance:
-        subnets = self.subtensor.get_all_subnet_dynamic_info()
-        substakes = self.subtensor.get_stake_info_for_coldkeys(coldkey_ss58_list=[self.wallet.coldkeypub.ss58_address])[self.wallet.coldkeypub.ss58_address]
+    def rank_destinations(self, netuid_from: int, candidates: List[int], performances: Dict[int, SubnetPerformance], snapshot: ChainSnapshot) -> List[int]:
+        # the origin's row of the decision matrix, best first, so a split only spreads over destinations the bot would pick anyway
+        found = self.swap_candidates(candidates, [netuid_from], performances, snapshot)
+        if found is None:
+            return []
+        _, destinations, arrays, rows, cols, stake = found
+        scores = subnet_scores(arrays, self.weights)
+        adjusted, _ = evaluate_swaps(arrays.take(rows), arrays.take(cols), stake, rows == cols, scores[rows], scores[cols], self.weights, self.tolerance)
+        return [destinations[j] for j in np.argsort(-adjusted[0], kind='stable') if adjusted[0, j] > self.min_improvement_threshold]
+
+    def global_dynamic(self, snapshot: Optional[ChainSnapshot] = None) -> bt.Balance:
+        snapshot = snapshot or self.snapshots.get()
+        subnets = snapshot.subnets
+        substakes = snapshot.stakes_for(self.wallet.coldkeypub.ss58_address)
         return sum(subnets[substake.netuid].tao_in * substake.stake / subnets[substake.netuid].alpha_out for substake in substakes)
 
-    def check_subnet_registrations(self) -> List[int]:
-        return [subnet.netuid for subnet in self.subtensor.get_all_subnet_dynamic_info()
-                if self.subtensor.is_hotkey_registered(netuid=subnet.netuid, hotkey_ss58="Enter SS58")]
+    def check_subnet_registrations(self, snapshot: Optional[ChainSnapshot] = None) -> List[int]:
+        return list((snapshot or self.snapshots.get()).registered)
 
     def compute_swap_opportunity(self, subnet_a, subnet_b, stake_amount: bt.Balance, performance_a: SubnetPerformance, performance_b: SubnetPerformance) -> Tuple[float, bool, float]:
         if any(float(x) == 0 for x in [subnet_a.alpha_out, subnet_b.alpha_out, subnet_a.tao_in, subnet_b.tao_in]):
@@ -76,7 +193,11 @@ class SwapLogic:
 
         return False, False
 
-    def calculate_adjusted_improvement(self, global_tao_dif: float, performance_a: SubnetPerformance, performance_b: SubnetPerformance, slippage: float) -> float:
+    def calculate_adjusted_improvement(self, global_tao_dif: float, performance_a: SubnetPerformance, performance_b: SubnetPerformance, slippage: float,
+                                       weights: Optional[SwapWeights] = None):
+        if weights is not None:
+            a, b = Features.from_performances([performance_a]), Features.from_performances([performance_b])
+            return adjusted_improvements(global_tao_dif, a, b, slippage, weights.expand(1))[:, 0]
         emission_diff = (performance_b.current_emission_rate - performance_a.current_emission_rate) * self.emission_weight
         price_emission_discrepancy_diff = ((performance_b.current_emission_rate - performance_b.current_price) -
                                            (performance_a.current_emission_rate - performance_a.current_price)) * self.price_emission_discrepancy_weight
@@ -91,7 +212,9 @@ class SwapLogic:
 
         return (global_tao_dif + emission_diff + price_emission_discrepancy_diff) * (1 + inflation_diff + price_drop_diff + predicted_price_change_diff) * slippage_factor
 
-    def calculate_subnet_score(self, performance: SubnetPerformance) -> float:
+    def calculate_subnet_score(self, performance: SubnetPerformance, weights: Optional[SwapWeights] = None):
+        if weights is not None:
+            return self.score_subnets([performance], weights)[:, 0]
         emission_score = performance.current_emission_rate * self.emission_weight
         price_emission_discrepancy = (performance.current_emission_rate - performance.current_price) * self.price_emission_discrepancy_weight
         inflation_score = performance.inflation_rate * self.inflation_weight
@@ -100,11 +223,91 @@ class SwapLogic:
 
         return emission_score + price_emission_discrepancy + inflation_score + price_drop_score + prediction_score
 
-    def find_best_swap(self, registered_subnets: List[int], staked_subnets: List[int], performances: Dict[int, SubnetPerformance]) -> Tuple[int, int, float, bool]:
-        subnets = self.subtensor.get_all_subnet_dynamic_info()
-        substakes = self.subtensor.get_stake_info_for_coldkeys(coldkey_ss58_list=[self.wallet.coldkeypub.ss58_address])[self.wallet.coldkeypub.ss58_address]
+    def score_subnets(self, performances: List[SubnetPerformance], weights: Optional[SwapWeights] = None) -> np.ndarray:
+        return subnet_scores(Features.from_performances(performances), (weights or self.weights).expand(1))
+
+    def swap_candidates(self, registered_subnets: List[int], staked_subnets: List[int], performances: Dict[int, SubnetPerformance], snapshot: ChainSnapshot):
+        stake_for_subnet = {substake.netuid: float(substake.stake) for substake in snapshot.stakes_for(self.wallet.coldkeypub.ss58_address)}
+        price_gt_emission_subnets = [a for a in staked_subnets if performances[a].current_price > performances[a].current_emission_rate]
+        origins = [a for a in price_gt_emission_subnets + [a for a in staked_subnets if a not in price_gt_emission_subnets] if a != 0]
+        destinations = list(registered_subnets)
+        self.pairs_evaluated = len(origins) * len(destinations)
+        if not origins or not destinations:
+            return None
+
+        netuids = sorted(set(origins) | set(destinations))
+        index = {netuid: i for i, netuid in enumerate(netuids)}
+        arrays = self.subnet_arrays.load(snapshot.subnets, performances, netuids)
+        rows = np.array([index[a] for a in origins])[:, None]
+        cols = np.array([index[b] for b in destinations])[None, :]
+        stake = np.array([stake_for_subnet.get(a, 0.0) for a in origins])[:, None]
+        return origins, destinations, arrays, rows, cols, stake
+
+    def evaluate_weights(self, registered_subnets: List[int], staked_subnets: List[int], performances: Dict[int, SubnetPerformance], weights: SwapWeights,
+                         snapshot: Optional[ChainSnapshot] = None):
+        candidates = self.swap_candidates(registered_subnets, staked_subnets, performances, snapshot or self.snapshots.get())
+        if candidates is None:
+            return None
+        origins, destinations, arrays, rows, cols, stake = candidates
+        return (origins, destinations) + evaluate_weight_grid(arrays, rows, cols, stake, weights, self.tolerance)
+
+    def find_best_swaps(self, registered_subnets: List[int], staked_subnets: List[int], performances: Dict[int, SubnetPerformance], weights: SwapWeights,
+                        snapshot: Optional[ChainSnapshot] = None) -> List[Tuple[int, int, float, bool]]:
+        candidates = self.swap_candidates(registered_subnets, staked_subnets, performances, snapshot or self.snapshots.get())
+        if candidates is None:
+            return [(0, 0, float('-inf'), False)] * weights.configurations
+        origins, destinations, arrays, rows, cols, stake = candidates
+        best, adjusted, allows_negative = best_swaps_for_weights(arrays, rows, cols, stake, weights, self.tolerance)
+        return [(origins[i // len(destinations)], destinations[i % len(destinations)], float(improvement), bool(negative)) if i >= 0 else (0, 0, float('-inf'), False)
+                for i, improvement, negative in zip(best.tolist(), adjusted, allows_negative)]
+
+    def find_best_swap(self, registered_subnets: List[int], staked_subnets: List[int], performances: Dict[int, SubnetPerformance], snapshot: Optional[ChainSnapshot] = None) -> Tuple[int, int, float, bool]:
+        if not self.vectorized:
+            return self.find_best_swap_scalar(registered_subnets, staked_subnets, performances, snapshot)
+        if self.pruned:
+            return self.find_best_swap_pruned(registered_subnets, staked_subnets, performances, snapshot)
+        candidates = self.swap_candidates(registered_subnets, staked_subnets, performances, snapshot or self.snapshots.get())
+        if candidates is None:
+            return (0, 0, float('-inf'), False)
+        origins, destinations, arrays, rows, cols, stake = candidates
+        versions = self.subnet_arrays.versions_of(sorted(set(origins) | set(destinations)))
+        adjusted, allows_negative = self.pair_scores.update(origins, destinations, arrays, rows, cols, stake, versions, self.weights, self.tolerance)
+        self.pairs_evaluated = self.pair_scores.recomputed
+        self.pruned_result = None
+
+        best = select_best_swap(adjusted, allows_negative, self.min_improvement_threshold)
+        if best is None:
+            return (0, 0, float('-inf'), False)
+        i, j = divmod(best, len(destinations))
+        return (origins[i], destinations[j], float(adjusted[i, j]), bool(allows_negative[i, j]))
+
+    def find_best_swap_pruned(self, registered_subnets: List[int], staked_subnets: List[int], performances: Dict[int, SubnetPerformance],
+                              snapshot: Optional[ChainSnapshot] = None) -> Tuple[int, int, float, bool]:
+        candidates = self.swap_candidates(registered_subnets, staked_subnets, performances, snapshot or self.snapshots.get())
+        if candidates is None:
+            return (0, 0, float('-inf'), False)
+        origins, destinations, arrays, rows, cols, stake = candidates
+        self.candidate_index.refresh(destinations, arrays.take(cols[0]), self.subnet_arrays.versions_of(destinations), self.weights)
+        versions = self.subnet_arrays.versions_of(sorted(set(origins) | set(destinations)))
+        # the same inputs as last time pick the same pair, so the search itself can be skipped
+        if not self.pair_scores.prepare(origins, destinations, arrays, rows, cols, stake, versions, self.weights, self.tolerance) \
+                or self.pruned_result is None:
+            self.pruned_result = pruned_best_swap(arrays, rows, cols, stake, self.weights, self.tolerance, self.candidate_index, self.pruning_batch,
+                                                  self.pair_scores.evaluate)[:3]
+        best, adjusted, allows_negative = self.pruned_result
+        self.pairs_evaluated = self.pair_scores.recomputed
+        if best is None:
+            return (0, 0, float('-inf'), False)
+        i, j = divmod(best, len(destinations))
+        return (origins[i], destinations[j], adjusted, allows_negative)
+
+    def find_best_swap_scalar(self, registered_subnets: List[int], staked_subnets: List[int], performances: Dict[int, SubnetPerformance], snapshot: Optional[ChainSnapshot] = None) -> Tuple[int, int, float, bool]:
+        snapshot = snapshot or self.snapshots.get()
+        subnets = snapshot.subnets
+        substakes = snapshot.stakes_for(self.wallet.coldkeypub.ss58_address)
         stake_for_subnet = {substake.netuid: substake.stake for substake in substakes}
         best_swap = (0, 0, float('-inf'), False)
+        self.pairs_evaluated = 0
 
         subnet_scores = {netuid: self.calculate_subnet_score(performance) for netuid, performance in performances.items()}
 
@@ -115,6 +318,7 @@ class SwapLogic:
             if a != 0:
                 for b in registered_subnets:
                     if a != b:
+                        self.pairs_evaluated += 1
                         performance_a, performance_b = performances[a], performances[b]
                         emission_a, price_a = performance_a.current_emission_rate, performance_a.current_price
                         emission_b, price_b = performance_b.current_emission_rate, performance_b.current_price
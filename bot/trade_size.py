@@ -0,0 +1,89 @@
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
+from swap_kernel import SubnetArrays
+
+# non-dynamic subnets trade 1:1, which is a constant-product pool with unbounded reserves
+ROOT_DEPTH = 1e15
+
+class Split(NamedTuple):
+    amounts: np.ndarray
+    received: np.ndarray
+    gain: float
+
+def reserves(pools: SubnetArrays) -> Tuple[np.ndarray, np.ndarray]:
+    return np.where(pools.dynamic, pools.tao_in, ROOT_DEPTH), np.where(pools.dynamic, pools.alpha_in, ROOT_DEPTH)
+
+def global_values(pools: SubnetArrays) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(pools.alpha_out > 0, pools.tao_in / pools.alpha_out, 0.0)
+
+def move_coefficients(a: SubnetArrays, b: SubnetArrays) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    tao_a, alpha_a = reserves(a)
+    tao_b, alpha_b = reserves(b)
+    return alpha_b * tao_a, tao_b * alpha_a, tao_a + tao_b
+
+def move_output(a: SubnetArrays, b: SubnetArrays, amount: np.ndarray) -> np.ndarray:
+    c, d, e = move_coefficients(a, b)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(amount > 0, c * amount / (d + e * amount), 0.0)
+
+def optimal_move_amounts(a: SubnetArrays, b: SubnetArrays, stake: np.ndarray, value_a: Optional[np.ndarray] = None,
+                         value_b: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    # moving x alpha from a to b yields c*x/(d + e*x) alpha on b; valuing each side's alpha at value_a/value_b
+    # (global TAO per alpha by default) the gain is concave in x and peaks where d + e*x = sqrt(value_b*c*d/value_a)
+    value_a = global_values(a) if value_a is None else value_a
+    value_b = global_values(b) if value_b is None else value_b
+    c, d, e = move_coefficients(a, b)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        amount = (np.sqrt(value_b * c * d / value_a) - d) / e
+    amount = np.clip(np.nan_to_num(amount, nan=0.0, posinf=np.inf, neginf=0.0), 0, stake)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain = np.where(amount > 0, value_b * c * amount / (d + e * amount) - value_a * amount, 0.0)
+    return amount, gain
+
+def _allocate_tao(tao: float, tao_in: np.ndarray, weight: np.ndarray, marginal: np.ndarray) -> Tuple[np.ndarray, float]:
+    # destinations come sorted by marginal value at zero; the active set is the prefix whose marginal beats the water level
+    levels = np.cumsum(weight) / (tao + np.cumsum(tao_in))
+    below = marginal <= levels ** 2
+    active = int(np.argmax(below)) if below.any() else len(levels)
+    active = max(active, 1)
+    level = levels[active - 1]
+    allocation = np.zeros_like(tao_in)
+    allocation[:active] = np.maximum(weight[:active] / level - tao_in[:active], 0)
+    return allocation, level ** 2
+
+def split_stake(origin: SubnetArrays, destinations: SubnetArrays, stake: float, value_origin: Optional[float] = None,
+                value_destinations: Optional[np.ndarray] = None, iterations: int = 60) -> Split:
+    tao_a, alpha_a = (float(x) for x in reserves(origin))
+    value_origin = float(global_values(origin)) if value_origin is None else value_origin
+    values = global_values(destinations) if value_destinations is None else np.asarray(value_destinations, dtype=float)
+    tao_b, alpha_b = reserves(destinations)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        marginal = np.where(tao_b > 0, values * alpha_b / tao_b, 0.0)
+    order = np.argsort(-marginal, kind='stable')
+    tao_b, alpha_b, values, marginal = tao_b[order], alpha_b[order], values[order], marginal[order]
+    weight = np.sqrt(values * alpha_b * tao_b)
+
+    sold_tao = lambda x: tao_a * x / (alpha_a + x)
+    # d/dx of the split's value is (tao marginal value) * dtao/dx - value_origin, which decreases in x
+    slope = lambda x: _allocate_tao(sold_tao(x), tao_b, weight, marginal)[1] * tao_a * alpha_a / (alpha_a + x) ** 2 - value_origin
+    if stake <= 0 or not weight.any() or slope(0.0) <= 0:
+        return Split(np.zeros(len(order)), np.zeros(len(order)), 0.0)
+    total = float(stake)
+    if slope(total) < 0:
+        low, high = 0.0, total
+        for _ in range(iterations):
+            middle = (low + high) / 2
+            low, high = (middle, high) if slope(middle) > 0 else (low, middle)
+        total = (low + high) / 2
+    allocation, _ = _allocate_tao(sold_tao(total), tao_b, weight, marginal)
+    tao = np.empty_like(allocation)
+    tao[order] = allocation
+    received = np.empty_like(allocation)
+    received[order] = np.where(allocation > 0, alpha_b * allocation / (tao_b + allocation), 0.0)
+
+    # move_stake legs sell into the origin pool one after another in destination order, so leg k sells
+    # the alpha between the cumulative tao marks of the legs before it
+    cumulative = alpha_a * np.cumsum(tao) / (tao_a - np.cumsum(tao))
+    amounts = np.diff(cumulative, prepend=0.0)
+    return Split(amounts, received, float(np.dot(values, received[order]) - value_origin * amounts.sum()))
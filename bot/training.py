@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import bittensor as bt
+from subnet_performance import SubnetPerformance, fit_predictor
+
+_attached: Dict[str, SharedMemory] = {}
+_resident: Dict[int, object] = {}
+
+def _fit_shared(key: int, predictor, name: str, window_size: int, length: int, log_mse: bool):
+    # the worker keeps each subnet's predictor between fits; the parent only ships it when this worker does not hold it yet
+    if predictor is not None:
+        _resident[key] = predictor
+    predictor = _resident[key]
+    segment = _attached.get(name)
+    if segment is None:
+        segment = _attached[name] = SharedMemory(name=name)
+    history = np.ndarray((2, window_size), dtype=np.float64, buffer=segment.buf)
+    start = time.perf_counter()
+    mark = predictor.mark() if hasattr(predictor, 'mark') else None
+    mse = fit_predictor(predictor, history[0, :length], history[1, :length], log_mse)
+    return predictor.delta_since(mark) if mark is not None else predictor, mse, time.perf_counter() - start
+
+class BackgroundTrainer:
+    def __init__(self, max_workers: Optional[int] = None):
+        # one single-process pool per worker, so a subnet always trains where its predictor already lives
+        self._executors = [self._new_executor() for _ in range(max_workers or os.cpu_count() or 1)]
+        self._segments: Dict[SubnetPerformance, SharedMemory] = {}
+        self._pending: Dict[SubnetPerformance, Future] = {}
+        self._keys: Dict[SubnetPerformance, int] = {}
+        self._resident: Dict[SubnetPerformance, object] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    @staticmethod
+    def _new_executor() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def _segment(self, performance: SubnetPerformance) -> SharedMemory:
+        segment = self._segments.get(performance)
+        if segment is None:
+            segment = self._segments[performance] = SharedMemory(create=True, size=2 * performance.window_size * np.dtype(np.float64).itemsize)
+        return segment
+
+    def _executor(self, performance: SubnetPerformance) -> ProcessPoolExecutor:
+        key = self._keys.setdefault(performance, len(self._keys))
+        return self._executors[key % len(self._executors)]
+
+    def submit(self, performance: SubnetPerformance) -> bool:
+        length = len(performance.prices)
+        if performance in self._pending or length <= 20:
+            return False
+        segment = self._segment(performance)
+        # a subnet has at most one job in flight, so its segment is never rewritten while a worker reads it
+        history = np.ndarray((2, performance.window_size), dtype=np.float64, buffer=segment.buf)
+        history[0, :length] = performance.emission_rates
+        history[1, :length] = performance.prices
+        executor = self._executor(performance)
+        # the worker's copy tracks ours fit for fit; a predictor swapped in since (checkpoint restore, reset) has to be sent again
+        predictor = None if self._resident.get(performance) is performance.predictor else performance.predictor
+        self._pending[performance] = executor.submit(_fit_shared, self._keys[performance], predictor, segment.name, performance.window_size,
+                                                     length, performance.log_mse)
+        self._resident[performance] = performance.predictor
+        self.submitted += 1
+        return True
+
+    def collect(self) -> List[Tuple[SubnetPerformance, float]]:
+        trained = []
+        for performance in [performance for performance, future in self._pending.items() if future.done()]:
+            try:
+                delta, mse, seconds = self._pending.pop(performance).result()
+            except Exception as e:
+                self.failed += 1
+                self._forget(performance, e)
+                bt.logging.warning(f"Background model training failed: {e}")
+                continue
+            if self._resident.get(performance) is not performance.predictor:
+                # the predictor was replaced while its fit ran; the result belongs to the old one
+                continue
+            if hasattr(performance.predictor, 'apply_delta'):
+                performance.predictor.apply_delta(delta)
+                performance.model_trained()
+            else:
+                performance.model_trained(delta)
+                self._resident[performance] = performance.predictor
+            if mse is not None:
+                bt.logging.info(f"Model MSE: {mse}")
+            trained.append((performance, seconds))
+        self.completed += len(trained)
+        return trained
+
+    def _forget(self, performance: SubnetPerformance, error: Exception) -> None:
+        # the worker may or may not have fitted before failing, so its copy can no longer be trusted
+        self._resident.pop(performance, None)
+        if isinstance(error, BrokenProcessPool):
+            broken = self._executors.index(self._executor(performance))
+            self._executors[broken] = self._new_executor()
+            for other in [other for other, key in self._keys.items() if key % len(self._executors) == broken]:
+                self._resident.pop(other, None)
+
+    def close(self) -> None:
+        for executor in self._executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._pending.clear()
+        self._resident.clear()
+        for segment in self._segments.values():
+            segment.close()
+            segment.unlink()
+        self._segments.clear()
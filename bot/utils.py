@@ -1,10 +1,15 @@
 import json
 import os
-from typing import Dict
+import pickle
+import time
+from typing import Callable, Dict, Optional
+import numpy as np
+import bittensor as bt
 from subnet_performance import SubnetPerformance
+from history_store import HistoryStore
 
 def save_performances(filename: str, performances: Dict[int, SubnetPerformance]):
-    data = {netuid: {attr: getattr(perf, attr) for attr in ['emission_rates', 'prices']}
+    data = {netuid: {attr: getattr(perf, attr).tolist() for attr in ['emission_rates', 'prices']}
             for netuid, perf in performances.items()}
     with open(filename, 'w') as f:
         json.dump(data, f)
@@ -21,3 +26,68 @@ def load_performances(filename: str) -> Dict[int, SubnetPerformance]:
         perf.prices = perf_data.get('prices', [])
         performances[int(netuid)] = perf
     return performances
+
+def open_history_store(filename: str, legacy_filename: str = None) -> HistoryStore:
+    store = HistoryStore(filename)
+    if len(store) == 0 and legacy_filename and os.path.exists(legacy_filename) and os.stat(legacy_filename).st_size > 0:
+        store.import_json(legacy_filename)
+    return store
+
+def load_performances_from_store(store: HistoryStore, performance_factory: Callable[[], SubnetPerformance] = SubnetPerformance) -> Dict[int, SubnetPerformance]:
+    performances = {}
+    for netuid, records in store.history(performance_factory().window_size).items():
+        perf = performance_factory()
+        perf.emission_rates = records['emission']
+        perf.prices = records['price']
+        last = records[-1]
+        if not np.isnan(last['alpha_out']):
+            perf.alpha_out, perf.tao_in, perf.emission, perf.price = map(float, (last['alpha_out'], last['tao_in'], last['emission'], last['price']))
+        performances[netuid] = perf
+    return performances
+
+CHECKPOINT_VERSION = 1
+
+def save_checkpoint(filename: str, performances: Dict[int, SubnetPerformance], block: Optional[int] = None):
+    state = {netuid: {'predictor': perf.predictor, 'emission_rates': perf.emission_rates.copy(), 'prices': perf.prices.copy(),
+                      'alpha_out': perf.alpha_out, 'tao_in': perf.tao_in, 'emission': perf.emission, 'price': perf.price,
+                      'samples_since_fit': perf.samples_since_fit}
+             for netuid, perf in performances.items()}
+    tmp = f'{filename}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump({'version': CHECKPOINT_VERSION, 'block': block, 'performances': state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+def load_checkpoint(filename: str) -> Optional[dict]:
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename, 'rb') as f:
+            checkpoint = pickle.load(f)
+    except Exception as e:
+        bt.logging.warning(f"Ignoring unreadable checkpoint {filename}: {e}")
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        bt.logging.warning(f"Ignoring checkpoint {filename} with version {checkpoint.get('version')}")
+        return None
+    return checkpoint
+
+def restore_checkpoint(performances: Dict[int, SubnetPerformance], checkpoint: dict,
+                       performance_factory: Callable[[], SubnetPerformance] = SubnetPerformance) -> int:
+    restored = 0
+    for netuid, state in checkpoint['performances'].items():
+        perf = performances.get(netuid)
+        if perf is None:
+            perf = performances[netuid] = performance_factory()
+            perf.emission_rates = state['emission_rates']
+            perf.prices = state['prices']
+            perf.alpha_out, perf.tao_in, perf.emission, perf.price = state['alpha_out'], state['tao_in'], state['emission'], state['price']
+        if type(perf.predictor) is not type(state['predictor']) or not state['predictor'].fitted:
+            continue
+        perf.predictor = state['predictor']
+        perf.samples_since_fit = state['samples_since_fit']
+        perf.last_fit_time = time.monotonic()
+        perf._next_price = None
+        restored += 1
+    return restored
@@ -0,0 +1,118 @@
+import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple, Optional
+import numpy as np
+from chain_snapshot import SnapshotCache
+from local_subtensor import LocalSubtensor, LocalWallet
+from predictors import NullPredictor
+from replay import Recording, load_recording
+from subnet_performance import SubnetPerformance
+from swap_kernel import SwapWeights, best_swaps_for_weights
+from swap_logic import SwapLogic
+
+class SweepResult(NamedTuple):
+    weights: SwapWeights
+    gain: np.ndarray
+    swaps: np.ndarray
+    blocks: int
+    seconds: float
+
+def random_weights(base: SwapWeights, samples: int, spread: float = 0.7, seed: int = 0) -> SwapWeights:
+    rng = np.random.default_rng(seed)
+    matrix = np.array(base, dtype=float) * rng.lognormal(0.0, spread, (samples, len(SwapWeights._fields)))
+    matrix[0] = np.array(base, dtype=float)
+    return SwapWeights.from_matrix(matrix)
+
+def _best_swaps_chunk(arrays, rows, cols, stake, matrix, tolerance):
+    return best_swaps_for_weights(arrays, rows, cols, stake, SwapWeights.from_matrix(matrix), tolerance)[0]
+
+def _realized_returns(recording: Recording, horizon: int) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prices = np.where(recording.alpha_in > 0, recording.tao_in / recording.alpha_in, 0.0)
+        prices[:, np.array(recording.netuids) == 0] = 1.0
+        returns = np.where(prices[:-horizon] > 0, prices[horizon:] / prices[:-horizon] - 1.0, 0.0)
+    return returns
+
+def sweep(recording: Recording, initial_stakes: Dict[int, float], weights: Optional[SwapWeights] = None, samples: int = 1000, spread: float = 0.7,
+          seed: int = 0, horizon: int = 100, every: int = 1, workers: int = 1, chunk_size: int = 512, window_size: int = 100,
+          executor: Optional[ProcessPoolExecutor] = None) -> SweepResult:
+    wallet = LocalWallet()
+    subtensor = LocalSubtensor(recording.netuids, recording.tao_in[0], recording.alpha_in[0], recording.alpha_out[0], recording.emission[0], int(recording.blocks[0]))
+    for netuid, amount in initial_stakes.items():
+        subtensor.stakes[(wallet.coldkeypub.ss58_address, wallet.hotkey.ss58_address, netuid)] = amount
+    swap_logic = SwapLogic(subtensor, wallet, SnapshotCache(subtensor, [wallet.coldkeypub.ss58_address], wallet.hotkey.ss58_address))
+    weights = random_weights(swap_logic.weights, samples, spread, seed) if weights is None else weights
+    performances: Dict[int, SubnetPerformance] = {}
+    returns = _realized_returns(recording, horizon)
+    column = {netuid: i for i, netuid in enumerate(recording.netuids)}
+    matrix = weights.as_matrix()
+    chunks = [matrix[start:start + chunk_size] for start in range(0, len(matrix), chunk_size)]
+    gain, swaps = np.zeros(len(matrix)), np.zeros(len(matrix), dtype=np.int64)
+    own_executor = executor is None and workers > 1
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    started, evaluated = time.perf_counter(), 0
+    try:
+        for t in range(len(returns)):
+            subtensor.set_state(int(recording.blocks[t]), recording.tao_in[t], recording.alpha_in[t], recording.alpha_out[t], recording.emission[t])
+            snapshot = swap_logic.snapshots.get(int(recording.blocks[t]))
+            for subnet in snapshot.subnets:
+                if subnet.netuid not in performances:
+                    performances[subnet.netuid] = SubnetPerformance(window_size, NullPredictor())
+                performances[subnet.netuid].update(subnet)
+            if t % every:
+                continue
+            staked = [substake.netuid for substake in snapshot.stakes_for(wallet.coldkeypub.ss58_address) if float(substake.stake) > 0 and substake.netuid != 0]
+            candidates = swap_logic.swap_candidates(list(snapshot.registered), staked, performances, snapshot)
+            if candidates is None:
+                continue
+            origins, destinations, arrays, rows, cols, stake = candidates
+            arguments = (arrays, rows, cols, stake)
+            if executor is not None:
+                best = np.concatenate(list(executor.map(_best_swaps_chunk, *zip(*[arguments + (chunk, swap_logic.tolerance) for chunk in chunks]))))
+            else:
+                best = np.concatenate([_best_swaps_chunk(*arguments, chunk, swap_logic.tolerance) for chunk in chunks])
+            chosen = best >= 0
+            origin_columns = np.array([column[netuid] for netuid in origins])[np.maximum(best, 0) // len(destinations)]
+            destination_columns = np.array([column[netuid] for netuid in destinations])[np.maximum(best, 0) % len(destinations)]
+            gain += np.where(chosen, returns[t, destination_columns] - returns[t, origin_columns], 0.0)
+            swaps += chosen
+            evaluated += 1
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return SweepResult(weights, gain, swaps, evaluated, time.perf_counter() - started)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score many SwapLogic weight settings against recorded subnet history")
+    parser.add_argument('recording', help="subnet_performances.json or a HistoryStore file")
+    parser.add_argument('--stake', action='append', default=[], metavar='NETUID:ALPHA', help="stake held throughout, may be repeated")
+    parser.add_argument('--samples', type=int, default=1000, help="weight settings to try, the first is the current default")
+    parser.add_argument('--spread', type=float, default=0.7, help="log-normal spread of each weight around its default")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--horizon', type=int, default=100, help="blocks over which a chosen swap's realized return is measured")
+    parser.add_argument('--every', type=int, default=1, help="evaluate every Nth block")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=512)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help="write the ranked settings as JSON")
+    args = parser.parse_args()
+
+    stakes = {int(netuid): float(amount) for netuid, amount in (stake.split(':') for stake in args.stake)}
+    result = sweep(load_recording(args.recording), stakes, samples=args.samples, spread=args.spread, seed=args.seed, horizon=args.horizon,
+                   every=args.every, workers=args.workers, chunk_size=args.chunk_size)
+    print(f"Scored {args.samples} weight settings over {result.blocks} blocks in {result.seconds:.2f}s "
+          f"({args.samples * result.blocks / result.seconds:.0f} settings x blocks/s)")
+    ranking = np.argsort(-result.gain)
+    rows = [{'rank': rank, 'index': int(i), 'gain': float(result.gain[i]), 'swaps': int(result.swaps[i]),
+             'weights': dict(zip(SwapWeights._fields, result.weights.as_matrix()[i].tolist()))} for rank, i in enumerate(ranking)]
+    print(f"Default settings: gain {result.gain[0]:.6f} over {result.swaps[0]} swaps (rank {int(np.flatnonzero(ranking == 0)[0])})")
+    for row in rows[:args.top]:
+        print(f"#{row['rank']:<4} gain {row['gain']:.6f} swaps {row['swaps']:<5} " + ' '.join(f"{k}={v:.4g}" for k, v in row['weights'].items()))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
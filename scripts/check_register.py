@@ -1,5 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
 import bittensor as bt
 
+MAX_IN_FLIGHT = 8
+
+def query_registrations(subtensor, netuids, hotkey_ss58):
+    substrate = subtensor.substrate
+    if hasattr(substrate, 'query_multi'):
+        try:
+            keys = [substrate.create_storage_key("SubtensorModule", "Uids", [netuid, hotkey_ss58]) for netuid in netuids]
+            return {netuid: getattr(value, 'value', value) is not None for netuid, (_, value) in zip(netuids, substrate.query_multi(keys))}
+        except Exception as e:
+            print(f"Multi-key query failed ({e}), falling back to concurrent lookups")
+    with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT) as executor:
+        results = executor.map(lambda netuid: subtensor.is_hotkey_registered(netuid=netuid, hotkey_ss58=hotkey_ss58), netuids)
+        return dict(zip(netuids, results))
+
 def check_subnet_registrations(wallet):
     subtensor = bt.subtensor()
 
@@ -8,11 +23,9 @@ def check_subnet_registrations(wallet):
     print(f"Checking registrations for hotkey: {wallet.hotkey.ss58_address}")
     print("---------------------------------------------------")
 
-    for subnet in subnets:
-        netuid = subnet.netuid
-
-        is_registered = subtensor.is_hotkey_registered(netuid=netuid, hotkey_ss58=wallet.hotkey.ss58_address)
+    registrations = query_registrations(subtensor, [subnet.netuid for subnet in subnets], wallet.hotkey.ss58_address)
 
+    for netuid, is_registered in registrations.items():
         status = "Registered" if is_registered else "Not registered"
         print(f"Subnet {netuid}: {status}")
 
@@ -0,0 +1,41 @@
+import os
+from types import SimpleNamespace
+import pytest
+from history_store import HEADER, RECORD, HistoryStore
+from predictors import NullPredictor
+from subnet_performance import SubnetPerformance
+from utils import load_performances_from_store
+
+def fill(filename, blocks=3, subnets=4):
+    store = HistoryStore(filename)
+    for block in range(1, blocks + 1):
+        store.append_block(block, [SimpleNamespace(netuid=netuid, emission=0.1 * netuid, price=1.0 + block, alpha_out=100.0, tao_in=10.0)
+                                   for netuid in range(subnets)])
+    return store
+
+@pytest.mark.parametrize('cut', [1, RECORD.itemsize // 2, RECORD.itemsize + 3])
+def test_truncated_file_keeps_its_whole_records(tmp_path, cut):
+    filename = str(tmp_path / 'history.bin')
+    fill(filename)
+    os.truncate(filename, os.stat(filename).st_size - cut)
+    store = HistoryStore(filename)
+    assert len(store) == 12 - -(-cut // RECORD.itemsize)
+    assert os.stat(filename).st_size == HEADER.itemsize + len(store) * RECORD.itemsize
+    assert store.append_block(4, [SimpleNamespace(netuid=0, emission=0.0, price=5.0, alpha_out=100.0, tao_in=10.0)])
+    assert len(HistoryStore(filename)) == len(store) == 12 - -(-cut // RECORD.itemsize) + 1
+
+def test_partial_append_is_dropped(tmp_path):
+    filename = str(tmp_path / 'history.bin')
+    fill(filename)
+    with open(filename, 'ab') as f:
+        f.write(b'\0' * (RECORD.itemsize // 2))
+    store = HistoryStore(filename)
+    assert len(store) == 12 and store.last_block == 3
+    assert os.stat(filename).st_size == HEADER.itemsize + 12 * RECORD.itemsize
+
+def test_performances_come_from_the_factory(tmp_path):
+    store = fill(str(tmp_path / 'history.bin'), blocks=5)
+    performances = load_performances_from_store(store, lambda: SubnetPerformance(3, NullPredictor()))
+    assert sorted(performances) == [0, 1, 2, 3]
+    assert all(isinstance(performance.predictor, NullPredictor) and performance.window_size == 3 for performance in performances.values())
+    assert list(performances[2].prices) == [4.0, 5.0, 6.0]
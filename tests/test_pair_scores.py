@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from benchmark import synthetic_bot
+from predictors import NullPredictor
+from subnet_performance import SubnetPerformance
+from swap_kernel import SubnetArrays, evaluate_swaps, select_best_swap, subnet_scores
+
+def uncached_best_swap(swap_logic, registered, staked, performances, snapshot):
+    origins, destinations, _, rows, cols, stake = swap_logic.swap_candidates(registered, staked, performances, snapshot)
+    arrays = SubnetArrays.load(snapshot.subnets, performances, sorted(set(origins) | set(destinations)))
+    weights = swap_logic.weights
+    scores = subnet_scores(arrays, weights)
+    adjusted, allows_negative = evaluate_swaps(arrays.take(rows), arrays.take(cols), stake, rows == cols, scores[rows], scores[cols], weights,
+                                               swap_logic.tolerance)
+    best = select_best_swap(adjusted, allows_negative, swap_logic.min_improvement_threshold)
+    if best is None:
+        return (0, 0, float('-inf'), False), adjusted
+    i, j = divmod(best, len(destinations))
+    return (origins[i], destinations[j], float(adjusted[i, j]), bool(allows_negative[i, j])), adjusted
+
+def with_room(performances, window: int = 200):
+    # a full window rolls its first price on every sample, which moves every subnet; leave room so only changed pools do
+    roomy = {}
+    for netuid, performance in performances.items():
+        roomy[netuid] = SubnetPerformance(window, NullPredictor())
+        roomy[netuid].prices, roomy[netuid].emission_rates = performance.prices, performance.emission_rates
+    return roomy
+
+@pytest.mark.parametrize('pruned', [True, False, None])
+def test_cached_scores_match_uncached_as_subnets_change(pruned):
+    swap_logic, performances, snapshot, _ = synthetic_bot(64, 30, 1)
+    performances = with_room(performances)
+    subtensor, coldkey, hotkey = swap_logic.subtensor, swap_logic.wallet.coldkeypub.ss58_address, swap_logic.wallet.hotkey.ss58_address
+    rng = np.random.default_rng(1)
+    reused = 0
+    for step in range(60):
+        # blocks advance on some steps only, so stretches of unchanged subnets alternate with moving ones
+        if step % 3:
+            subtensor.advance(1)
+        for netuid in rng.choice(np.arange(1, 64), size=rng.integers(0, 4)):
+            subtensor.stakes[(coldkey, hotkey, int(netuid))] = subtensor.stakes.get((coldkey, hotkey, int(netuid)), 0.0) + float(rng.uniform(1, 10))
+        if step == 30:
+            swap_logic.emission_weight = 2.5
+        swap_logic.snapshots.invalidate()
+        snapshot = swap_logic.snapshots.get()
+        for subnet in snapshot.subnets:
+            performances[subnet.netuid].update(subnet)
+        staked = [substake.netuid for substake in snapshot.stakes_for(coldkey) if substake.netuid]
+        registered = [netuid for netuid in snapshot.registered if step % 7 or rng.random() < 0.9]
+        # None alternates both paths over one cache, so each sees the pairs the other left behind
+        swap_logic.pruned = bool(step % 2) if pruned is None else pruned
+        actual = swap_logic.find_best_swap(registered, staked, performances, snapshot)
+        evaluated = swap_logic.pairs_evaluated
+        expected, adjusted = uncached_best_swap(swap_logic, registered, staked, performances, snapshot)
+        assert actual[:2] == expected[:2] and actual[3] == expected[3], step
+        assert actual[2] == pytest.approx(expected[2], rel=1e-9, abs=1e-12), step
+        known = swap_logic.pair_scores.known
+        assert np.array_equal(swap_logic.pair_scores.adjusted[known], adjusted[known]), step
+        reused += evaluated < known.sum()
+        # nothing moved since the last decision, so the cache answers it whichever path asks; only a full grid
+        # after a pruned search still has to fill in the pairs the search skipped
+        swap_logic.pruned = not swap_logic.pruned if pruned is None else pruned
+        assert swap_logic.find_best_swap(registered, staked, performances, snapshot) == actual, step
+        assert swap_logic.pairs_evaluated == 0 or not swap_logic.pruned and pruned is None, step
+    assert reused
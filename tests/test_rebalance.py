@@ -0,0 +1,29 @@
+import pytest
+from local_subtensor import LocalSubtensor, LocalWallet, RAO_PER_TAO
+from rebalance import Operation, RebalanceError, Rebalancer, compose_batch
+
+@pytest.fixture
+def chain():
+    subtensor = LocalSubtensor.synthetic(8)
+    wallet = LocalWallet()
+    subtensor.stakes[(wallet.coldkeypub.ss58_address, wallet.hotkey.ss58_address, 1)] = 100.0
+    return subtensor, wallet, Rebalancer(subtensor, wallet, wallet.hotkey.ss58_address)
+
+def moved(subtensor):
+    return [call.call_params['amount_moved'] for _, _, call in subtensor.applied if call.call_function == 'move_stake']
+
+def test_whole_move_names_the_snapshot_stake(chain):
+    subtensor, wallet, rebalancer = chain
+    rebalancer.execute([Operation.move(1, 3)])
+    assert moved(subtensor) == [100 * RAO_PER_TAO]
+    assert subtensor.stakes[(wallet.coldkeypub.ss58_address, wallet.hotkey.ss58_address, 1)] == pytest.approx(0.0, abs=1e-9)
+
+def test_whole_move_takes_what_earlier_legs_leave(chain):
+    subtensor, _, rebalancer = chain
+    rebalancer.execute([Operation.unstake(1, 40.0), Operation.move(1, 3)])
+    assert moved(subtensor) == [pytest.approx(60 * RAO_PER_TAO, abs=1)]
+
+def test_unresolved_move_is_not_composed(chain):
+    subtensor, wallet, _ = chain
+    with pytest.raises(RebalanceError):
+        compose_batch(subtensor.substrate, [Operation.move(1, 3)], wallet.hotkey.ss58_address)
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+from ring_buffer import RingBuffer
+
+@pytest.mark.parametrize('capacity,slack', [(1, 1), (2, 3), (7, 16), (50, 16), (100, 1)])
+def test_running_stats_match_the_window(capacity, slack):
+    rng = np.random.default_rng(capacity)
+    # a random walk far from zero, so the incremental updates have to survive cancellation between large terms
+    values = 1000.0 + np.cumsum(rng.normal(0.0, 1.0, 5000))
+    buffer = RingBuffer(capacity, slack=slack)
+    for step, value in enumerate(values):
+        evicted = buffer.append(value)
+        window = values[max(0, step + 1 - capacity):step + 1]
+        assert evicted == (values[step - capacity] if step >= capacity else None)
+        np.testing.assert_array_equal(buffer.view(), window)
+        assert buffer.mean == pytest.approx(window.mean(), rel=1e-12)
+        assert buffer.variance == pytest.approx(window.var(), rel=1e-6, abs=1e-9)
+        assert buffer._weighted_sum == pytest.approx(np.arange(len(window)) @ window, rel=1e-12, abs=1e-9)
+        if len(window) > 1:
+            assert buffer.slope == pytest.approx(np.polyfit(np.arange(len(window)), window, 1)[0], rel=1e-6, abs=1e-9)
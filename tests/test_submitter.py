@@ -0,0 +1,176 @@
+import threading
+import time
+import pytest
+from local_subtensor import LocalSubtensor, LocalWallet, RAO_PER_TAO
+from rebalance import Operation, Rebalancer, RebalanceError
+from submitter import ExtrinsicSubmitter, SubmissionError, SubmissionUnknown
+
+class NodeSubstrate:
+    # LocalSubstrate plus the nonce checks of a real node and scripted network failures
+    def __init__(self, subtensor: LocalSubtensor, behaviours=()):
+        self.inner = subtensor.substrate
+        self.behaviours = list(behaviours)
+        self.submitted = []
+        self.release = threading.Event()
+        self.finality = threading.Event()
+        self.finality.set()
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def submit_extrinsic(self, extrinsic, wait_for_inclusion=False, wait_for_finalization=False):
+        behaviour = self.behaviours.pop(0) if self.behaviours else None
+        if behaviour == 'drop':
+            raise ConnectionError("connection reset before the extrinsic was sent")
+        if behaviour == 'block':
+            self.release.wait()
+        if behaviour == 'lost':
+            # another transaction from the coldkey took the nonce while the connection dropped
+            self.inner.nonces[extrinsic.signer] = self.inner.get_account_next_index(extrinsic.signer) + 1
+            raise ConnectionError("connection reset after the extrinsic was sent")
+        expected = self.inner.get_account_next_index(extrinsic.signer)
+        if extrinsic.nonce != expected:
+            raise ValueError(f"Invalid Transaction: nonce {extrinsic.nonce}, expected {expected}")
+        receipt = self.inner.submit_extrinsic(extrinsic, wait_for_inclusion, wait_for_finalization)
+        self.submitted.append(extrinsic.nonce)
+        if behaviour == 'hang':
+            # included on chain, but the response never makes it back in time
+            time.sleep(0.5)
+        return receipt
+
+    def get_chain_finalised_head(self):
+        if not self.finality.is_set():
+            return self.inner.get_block_hash(self.inner.subtensor.block - 1)
+        return self.inner.get_chain_finalised_head()
+
+@pytest.fixture
+def chain():
+    subtensor = LocalSubtensor.synthetic(8)
+    wallet = LocalWallet()
+    for netuid in (1, 2):
+        subtensor.stakes[(wallet.coldkeypub.ss58_address, wallet.hotkey.ss58_address, netuid)] = 100.0
+    return subtensor, wallet
+
+def make_submitter(subtensor, wallet, behaviours=(), **kwargs):
+    substrate = NodeSubstrate(subtensor, behaviours)
+    kwargs = {'timeout': 0.2, 'max_retries': 2, 'finalization_poll_interval': 0.01, **kwargs}
+    return substrate, ExtrinsicSubmitter(substrate, wallet.coldkey, **kwargs)
+
+def move(substrate, wallet, origin=1, destination=2, alpha=1.0):
+    return substrate.compose_call(call_module="SubtensorModule", call_function="move_stake",
+                                  call_params={"origin_hotkey": wallet.hotkey.ss58_address, "origin_netuid": origin,
+                                               "destination_hotkey": wallet.hotkey.ss58_address, "destination_netuid": destination,
+                                               "amount_moved": int(alpha * RAO_PER_TAO)})
+
+def moves_applied(subtensor):
+    return sum(1 for _, _, call in subtensor.applied if call.call_function == 'move_stake')
+
+def test_nonces_continue_from_the_chain(chain):
+    subtensor, wallet = chain
+    subtensor.substrate.nonces[wallet.coldkeypub.ss58_address] = 5
+    substrate, submitter = make_submitter(subtensor, wallet)
+    submissions = [submitter.submit(move(substrate, wallet)) for _ in range(3)]
+    for submission in submissions:
+        assert submission.finalized.result(timeout=5).is_success
+    submitter.close()
+    assert substrate.submitted == [5, 6, 7]
+    assert moves_applied(subtensor) == 3
+
+def test_timeout_after_inclusion_is_not_submitted_again(chain):
+    subtensor, wallet = chain
+    substrate, submitter = make_submitter(subtensor, wallet, ['hang'])
+    first = submitter.submit(move(substrate, wallet))
+    first.finalized.result(timeout=5)
+    second = submitter.submit(move(substrate, wallet))
+    assert second.finalized.result(timeout=5).is_success
+    submitter.close()
+    assert substrate.submitted == [0, 1]
+    assert moves_applied(subtensor) == 2
+    assert subtensor.stakes[(wallet.coldkeypub.ss58_address, wallet.hotkey.ss58_address, 1)] == pytest.approx(98.0)
+
+def test_outcome_of_a_taken_nonce_is_unknown(chain):
+    subtensor, wallet = chain
+    substrate, submitter = make_submitter(subtensor, wallet, ['lost'])
+    with pytest.raises(SubmissionUnknown):
+        submitter.submit(move(substrate, wallet)).finalized.result(timeout=5)
+    assert submitter.submit(move(substrate, wallet)).finalized.result(timeout=5).is_success
+    submitter.close()
+    assert substrate.submitted == [1]
+    assert moves_applied(subtensor) == 1
+
+def test_next_submission_goes_out_before_finalization(chain):
+    subtensor, wallet = chain
+    subtensor.advance(1)
+    substrate, submitter = make_submitter(subtensor, wallet, timeout=5.0)
+    substrate.finality.clear()
+    first = submitter.submit(move(substrate, wallet), origin_netuid=1)
+    assert first.included.result(timeout=5).is_success
+    second = submitter.submit(move(substrate, wallet, origin=2, destination=3), origin_netuid=2)
+    assert second.included.result(timeout=5).is_success
+    assert not first.finalized.done() and submitter.pending_origins == {1, 2}
+    substrate.finality.set()
+    first.finalized.result(timeout=5)
+    second.finalized.result(timeout=5)
+    submitter.close()
+    assert substrate.submitted == [0, 1]
+    assert submitter.pending_origins == set()
+
+def test_dropped_submission_is_retried_with_the_same_nonce(chain):
+    subtensor, wallet = chain
+    substrate, submitter = make_submitter(subtensor, wallet, ['drop', 'drop'])
+    assert submitter.submit(move(substrate, wallet)).finalized.result(timeout=5).is_success
+    submitter.close()
+    assert substrate.submitted == [0]
+    assert moves_applied(subtensor) == 1
+
+def test_unreachable_node_gives_up_without_consuming_a_nonce(chain):
+    subtensor, wallet = chain
+    substrate, submitter = make_submitter(subtensor, wallet, ['drop'] * 3, timeout=0.05)
+    failed = submitter.submit(move(substrate, wallet))
+    with pytest.raises(ConnectionError):
+        failed.finalized.result(timeout=5)
+    assert submitter.submit(move(substrate, wallet)).finalized.result(timeout=5).is_success
+    submitter.close()
+    assert substrate.submitted == [0]
+
+def test_rejected_call_is_not_retried(chain):
+    subtensor, wallet = chain
+    substrate, submitter = make_submitter(subtensor, wallet)
+    rejected = submitter.submit(move(substrate, wallet, alpha=1000.0))
+    with pytest.raises(SubmissionError):
+        rejected.finalized.result(timeout=5)
+    assert submitter.submit(move(substrate, wallet)).finalized.result(timeout=5).is_success
+    submitter.close()
+    assert substrate.submitted == [0, 1]
+    assert subtensor.substrate.rejected == 1
+
+def test_origin_stays_locked_until_its_submission_finishes(chain):
+    subtensor, wallet = chain
+    substrate, submitter = make_submitter(subtensor, wallet, ['block'], timeout=5.0)
+    first = submitter.submit(move(substrate, wallet), origin_netuid=1)
+    assert submitter.is_pending(1)
+    with pytest.raises(SubmissionError):
+        submitter.submit(move(substrate, wallet), origin_netuid=1)
+    other = submitter.submit(move(substrate, wallet, origin=2, destination=3), origin_netuid=2)
+    assert submitter.pending_origins == {1, 2}
+    substrate.release.set()
+    first.finalized.result(timeout=5)
+    other.finalized.result(timeout=5)
+    submitter.close()
+    assert not submitter.is_pending(1) and not submitter.is_pending(2)
+    assert substrate.submitted == [0, 1]
+
+def test_batch_locks_every_origin_it_spends_from(chain):
+    subtensor, wallet = chain
+    substrate, submitter = make_submitter(subtensor, wallet, ['block'], timeout=5.0)
+    rebalancer = Rebalancer(subtensor, wallet, wallet.hotkey.ss58_address, submitter=submitter)
+    batch = rebalancer.execute([Operation.move(1, 3, 1.0), Operation.unstake(2, 1.0), Operation.stake(4, 0.001)])
+    assert submitter.pending_origins == {1, 2}
+    with pytest.raises(SubmissionError):
+        submitter.submit(move(substrate, wallet, origin=2, destination=3), origin_netuid=2)
+    with pytest.raises(RebalanceError):
+        rebalancer.execute([Operation.move(1, 5, 1.0)])
+    substrate.release.set()
+    assert batch.finalized.result(timeout=5).is_success
+    submitter.close()
+    assert submitter.pending_origins == set()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from benchmark import synthetic_bot
+from candidate_index import CandidateIndex
+from swap_kernel import SubnetArrays
+
+def random_case(seed: int, n_subnets: int = 24):
+    swap_logic, performances, snapshot, staked = synthetic_bot(n_subnets, 30, seed)
+    rng = np.random.default_rng(seed)
+    registered = [netuid for netuid in snapshot.registered if rng.random() < 0.9]
+    # a high threshold leaves some cases without any qualifying swap
+    swap_logic.min_improvement_threshold = float(rng.choice([0.001, 0.5, 50.0]))
+    return swap_logic, performances, snapshot, list(rng.permutation(staked)), registered
+
+def assert_same_swap(actual, expected):
+    assert actual[:2] == expected[:2]
+    assert actual[2] == pytest.approx(expected[2], rel=1e-9, abs=1e-12)
+    assert actual[3] == expected[3]
+
+@pytest.mark.parametrize('seed', range(40))
+def test_full_grid_matches_scalar(seed):
+    swap_logic, performances, snapshot, staked, registered = random_case(seed)
+    swap_logic.pruned = False
+    assert_same_swap(swap_logic.find_best_swap(registered, staked, performances, snapshot),
+                     swap_logic.find_best_swap_scalar(registered, staked, performances, snapshot))
+
+@pytest.mark.parametrize('seed', range(40))
+def test_pruned_matches_full_grid_and_scalar(seed):
+    swap_logic, performances, snapshot, staked, registered = random_case(seed, n_subnets=64)
+    # small batches make the search stop on its bounds instead of running through every destination
+    swap_logic.pruning_batch = int(np.random.default_rng(seed).choice([1, 4, 32]))
+    pruned = swap_logic.find_best_swap(registered, staked, performances, snapshot)
+    swap_logic.pruned = False
+    assert_same_swap(pruned, swap_logic.find_best_swap(registered, staked, performances, snapshot))
+    assert_same_swap(pruned, swap_logic.find_best_swap_scalar(registered, staked, performances, snapshot))
+
+def test_index_updates_only_changed_subnets():
+    weights = synthetic_bot(8, 30, 0)[0].weights
+    rng = np.random.default_rng(0)
+    n = 50
+    columns = [rng.uniform(0.1, 2.0, n) for _ in SubnetArrays._fields]
+    columns[SubnetArrays._fields.index('dynamic')] = np.ones(n, dtype=bool)
+    netuids, versions = np.arange(n), np.zeros(n)
+    index = CandidateIndex()
+    index.refresh(netuids, SubnetArrays(*columns), versions, weights)
+    for _ in range(20):
+        changed = rng.choice(n, 5, replace=False)
+        for field in ('emission', 'price', 'inflation', 'predicted'):
+            columns[SubnetArrays._fields.index(field)][changed] = rng.uniform(0.1, 2.0, 5)
+        versions[changed] += 1
+        index.refresh(netuids, SubnetArrays(*columns), versions, weights)
+        rebuilt = CandidateIndex()
+        rebuilt.refresh(netuids, SubnetArrays(*columns), versions, weights)
+        np.testing.assert_array_equal(index.order, rebuilt.order)
+        np.testing.assert_array_equal(index.score_order, rebuilt.score_order)
+    assert index.rebuilds == 1 and index.updated == 100
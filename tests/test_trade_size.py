@@ -0,0 +1,54 @@
+import pytest
+from benchmark import synthetic_bot
+from local_subtensor import RAO_PER_TAO
+
+@pytest.fixture
+def whale():
+    # positions large enough against the synthetic pools that one destination is not the best use of the whole stake
+    swap_logic, performances, _, staked = synthetic_bot(32, 30, 0)
+    swap_logic.hotkey_ss58 = swap_logic.wallet.hotkey.ss58_address
+    for key in list(swap_logic.subtensor.stakes):
+        swap_logic.subtensor.stakes[key] *= 200
+    swap_logic.snapshots.invalidate()
+    snapshot = swap_logic.snapshots.get()
+    origin, destination, _, _ = swap_logic.find_best_swap(list(snapshot.registered), staked, performances, snapshot)
+    return swap_logic, performances, snapshot, origin, destination
+
+def stake_on(swap_logic, netuid):
+    return swap_logic.subtensor.stakes.get((swap_logic.wallet.coldkeypub.ss58_address, swap_logic.hotkey_ss58, netuid), 0.0)
+
+def test_single_destination_moves_the_sized_amount(whale):
+    swap_logic, performances, snapshot, origin, destination = whale
+    legs = swap_logic.plan_legs(origin, destination, list(snapshot.registered), performances, snapshot)
+    assert legs == [(destination, swap_logic.size_swap(origin, destination, performances, snapshot))]
+
+def test_split_goes_out_as_one_batch(whale):
+    swap_logic, performances, snapshot, origin, destination = whale
+    swap_logic.split_destinations = 4
+    legs = swap_logic.plan_legs(origin, destination, list(snapshot.registered), performances, snapshot)
+    assert 1 < len(legs) <= 4 and legs[0][0] == destination
+    held = {netuid: stake_on(swap_logic, netuid) for netuid in [origin] + [netuid for netuid, _ in legs]}
+    swap_logic.swap_split(origin, legs)
+    moves = [call for _, _, call in swap_logic.subtensor.applied if call.call_function == 'move_stake']
+    assert len(moves) == len(legs)
+    assert stake_on(swap_logic, origin) == pytest.approx(held[origin] - sum(amount for _, amount in legs))
+    assert all(stake_on(swap_logic, netuid) > held[netuid] for netuid, _ in legs)
+
+def test_whole_move_names_the_position(whale):
+    swap_logic, _, _, origin, destination = whale
+    held = stake_on(swap_logic, origin)
+    swap_logic.swap(origin, destination)
+    call = swap_logic.subtensor.applied[-1][2]
+    assert call.call_params['amount_moved'] == int(held * RAO_PER_TAO)
+    assert stake_on(swap_logic, origin) == pytest.approx(0.0, abs=1e-9)
+
+def test_zero_amount_moves_nothing(whale):
+    swap_logic, _, _, origin, destination = whale
+    held = stake_on(swap_logic, origin)
+    call = swap_logic.subtensor.substrate.compose_call(call_module="SubtensorModule", call_function="move_stake",
+                                                       call_params={"origin_hotkey": swap_logic.hotkey_ss58, "origin_netuid": origin,
+                                                                    "destination_hotkey": swap_logic.hotkey_ss58, "destination_netuid": destination,
+                                                                    "amount_moved": 0})
+    with pytest.raises(ValueError):
+        swap_logic.subtensor.apply_call(swap_logic.wallet.coldkeypub.ss58_address, call)
+    assert stake_on(swap_logic, origin) == held
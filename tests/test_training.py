@@ -0,0 +1,43 @@
+import time
+import numpy as np
+import pytest
+from predictors import ForestPredictor
+from subnet_performance import SubnetPerformance
+from training import BackgroundTrainer
+
+@pytest.fixture
+def trainer():
+    trainer = BackgroundTrainer(2)
+    yield trainer
+    trainer.close()
+
+def history(performance: SubnetPerformance, seed: int) -> SubnetPerformance:
+    rng = np.random.default_rng(seed)
+    performance.emission_rates = rng.uniform(0.5, 1.5, 40)
+    performance.prices = np.exp(rng.normal(0, 0.01, 40).cumsum())
+    return performance
+
+def train(trainer: BackgroundTrainer, performance: SubnetPerformance, seed: int) -> int:
+    assert trainer.submit(history(performance, seed))
+    deadline = time.monotonic() + 60
+    while trainer.in_flight and time.monotonic() < deadline:
+        trainer.collect()
+        time.sleep(0.01)
+    assert trainer.failed == 0 and performance.model_fitted
+    model = performance.predictor.model
+    assert model.n_estimators == len(model.estimators_)
+    assert np.isfinite(performance.predict_next_price())
+    return len(model.estimators_)
+
+def test_refits_only_bring_back_new_trees(trainer):
+    predictor = ForestPredictor(n_estimators=5, trees_per_refit=2, max_estimators=9)
+    performance = SubnetPerformance(40, predictor)
+    assert [train(trainer, performance, seed) for seed in range(4)] == [5, 7, 9, 5]
+    assert performance.predictor is predictor
+
+def test_replaced_predictor_is_sent_again(trainer):
+    performance = SubnetPerformance(40, ForestPredictor(n_estimators=5, trees_per_refit=2))
+    assert train(trainer, performance, 0) == 5
+    performance.predictor = ForestPredictor(n_estimators=3, trees_per_refit=2)
+    assert train(trainer, performance, 1) == 3
+    assert train(trainer, performance, 2) == 5
@@ -1,22 +1,107 @@
+import argparse
+import hashlib
 import json
+import os
 import re
+import sqlite3
 
-def extract_wallets(data):
-    pattern = r'(.*?)\s*—.*?\n(5[A-Za-z0-9]{47,48})'
-    matches = re.findall(pattern, data, re.MULTILINE)
-    return {name.strip(): wallet.strip() for name, wallet in matches}
+DASH = '—'.encode()
+ADDRESS = re.compile(rb'5[A-Za-z0-9]{47,48}')
+BASE58 = b'123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+BASE58_DIGITS = {char: digit for digit, char in enumerate(BASE58)}
+SS58_PREFIX = b'SS58PRE'
 
-with open('wallets.json', 'r') as f:
-    existing_wallets = json.load(f)
+def iter_wallets(f):
+    # a line containing an em dash names the address that starts the following line
+    previous = b''
+    for line in f:
+        match = ADDRESS.match(line)
+        if match and DASH in previous:
+            yield previous.split(DASH, 1)[0].decode('utf-8', errors='replace').strip(), match.group().decode()
+            previous = line[match.end():]
+        else:
+            previous = line
 
-with open('data.txt', 'r', encoding='utf-8') as f:
-    data = f.read()
+def base58_decode(address):
+    value = 0
+    for char in address.encode():
+        digit = BASE58_DIGITS.get(char)
+        if digit is None:
+            return None
+        value = value * 58 + digit
+    raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return b'\0' * (len(address) - len(address.lstrip('1'))) + raw
 
-new_wallets = extract_wallets(data)
+def is_valid_ss58(address):
+    raw = base58_decode(address)
+    if raw is None or len(raw) != 35 or raw[0] >= 64:
+        return False
+    return hashlib.blake2b(SS58_PREFIX + raw[:33]).digest()[:2] == raw[33:]
 
-merged_wallets = {**new_wallets, **existing_wallets}
+def validate_batch(addresses, known):
+    for address in set(addresses) - known.keys():
+        known[address] = is_valid_ss58(address)
+    return [known[address] for address in addresses]
 
-with open('wallets.json', 'w') as f:
-    json.dump(merged_wallets, f, indent=4)
+def open_store(filename, legacy_filename=None):
+    connection = sqlite3.connect(filename)
+    connection.execute("CREATE TABLE IF NOT EXISTS wallets (name TEXT PRIMARY KEY, address TEXT NOT NULL)")
+    connection.execute("CREATE INDEX IF NOT EXISTS wallets_address ON wallets (address)")
+    empty = connection.execute("SELECT NOT EXISTS (SELECT 1 FROM wallets)").fetchone()[0]
+    if empty and legacy_filename and os.path.exists(legacy_filename):
+        with open(legacy_filename, 'r') as f:
+            connection.executemany("INSERT OR IGNORE INTO wallets VALUES (?, ?)", json.load(f).items())
+    connection.commit()
+    return connection
 
-print(f"Updated wallets.json with {len(merged_wallets)} entries.")
+def merge_wallets(connection, pairs, batch_size=10000):
+    known = {}
+    seen = rejected = 0
+    connection.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (name TEXT PRIMARY KEY, address TEXT NOT NULL)")
+    connection.execute("DELETE FROM incoming")
+
+    def flush(batch):
+        nonlocal rejected
+        valid = validate_batch([address for _, address in batch], known)
+        rejected += valid.count(False)
+        # within one dump the last mention of a name wins, stored entries always win over the dump
+        connection.executemany("INSERT INTO incoming VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET address = excluded.address",
+                               [pair for pair, ok in zip(batch, valid) if ok])
+
+    batch = []
+    for pair in pairs:
+        batch.append(pair)
+        seen += 1
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    flush(batch)
+    added = connection.execute("INSERT OR IGNORE INTO wallets SELECT name, address FROM incoming").rowcount
+    connection.execute("DELETE FROM incoming")
+    connection.commit()
+    return seen, rejected, added
+
+def export_json(connection, filename):
+    tmp = f'{filename}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(dict(connection.execute("SELECT name, address FROM wallets")), f, indent=4)
+    os.replace(tmp, filename)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract name/SS58 pairs from a chat dump into the wallet store")
+    parser.add_argument('input', nargs='?', default='data.txt')
+    parser.add_argument('--store', default='wallets.db')
+    parser.add_argument('--legacy', default='wallets.json', help="JSON wallets imported when the store is empty")
+    parser.add_argument('--export', help="also write the whole store as JSON")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    connection = open_store(args.store, args.legacy)
+    with open(args.input, 'rb') as f:
+        seen, rejected, added = merge_wallets(connection, iter_wallets(f), args.batch_size)
+    total = connection.execute("SELECT COUNT(*) FROM wallets").fetchone()[0]
+    if args.export:
+        export_json(connection, args.export)
+    connection.close()
+
+    print(f"Found {seen} wallets, {rejected} with invalid SS58 checksums. Added {added} new entries to {args.store} ({total} total).")
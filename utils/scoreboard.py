@@ -1,35 +1,118 @@
+import argparse
 import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 import bittensor as bt
 from tabulate import tabulate
 
 subtensor = None
 
 def load_wallets(filename):
+    if filename.endswith('.db'):
+        connection = sqlite3.connect(filename)
+        try:
+            return dict(connection.execute("SELECT name, address FROM wallets"))
+        finally:
+            connection.close()
     with open(filename, 'r') as file:
         return json.load(file)
 
-def get_wallet_info(coldkey_ss58):
-    subnets = subtensor.get_all_subnet_dynamic_info()
+def load_cache(filename):
+    if not os.path.exists(filename):
+        return {'block': None, 'wallets': {}}
+    with open(filename, 'r') as file:
+        cache = json.load(file)
+    if 'wallets' not in cache:
+        return {'block': None, 'wallets': {}}
+    wallets = {coldkey: {'balance': entry['balance'], 'block': entry['block'], 'failed': entry.get('failed', False),
+                         'stakes': {int(netuid): stake for netuid, stake in entry['stakes'].items()}}
+               for coldkey, entry in cache['wallets'].items()}
+    return {'block': cache['block'], 'wallets': wallets}
+
+def save_cache(filename, cache):
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w') as file:
+        json.dump(cache, file)
+    os.replace(tmp, filename)
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _strings(item)
+
+def _stake_events_at(block, coldkeys):
+    substrate = subtensor.substrate
+    touched = set()
+    for record in substrate.get_events(block_hash=substrate.get_block_hash(block)):
+        value = getattr(record, 'value', record)
+        event = value.get('event', value) if isinstance(value, dict) else {}
+        if str(event.get('event_id', '')).startswith('Stake'):
+            touched.update(address for address in _strings(event.get('attributes')) if address in coldkeys)
+    return touched
+
+def stake_events(first_block, last_block, coldkeys, max_in_flight):
+    # StakeAdded/Removed/Moved/Transferred/Swapped all name the coldkey, whatever the attribute layout of the runtime version
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        return set().union(*executor.map(lambda block: _stake_events_at(block, coldkeys), range(first_block, last_block + 1)))
+
+def scan_pays(blocks, wallets, batch_size, max_in_flight):
+    # each block costs a hash and an events call, run max_in_flight at a time, while a full refresh is one sequential call per batch
+    return 2 * -(-blocks // max_in_flight) < -(-wallets // batch_size)
+
+def get_balance(coldkey_ss58):
     try:
-        substakes = subtensor.get_stake_info_for_coldkeys(coldkey_ss58_list=[coldkey_ss58])[coldkey_ss58]
-        free_balance = subtensor.get_balance(coldkey_ss58)
+        return float(subtensor.get_balance(coldkey_ss58))
     except Exception as e:
-        print(f"Error processing coldkey: {coldkey_ss58}")
+        print(f"Error fetching balance for coldkey: {coldkey_ss58}")
         print(f"Error message: {str(e)}")
         return None
 
-    total_tao = float(free_balance)
+def fetch_balances(coldkeys, max_in_flight):
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        return dict(zip(coldkeys, executor.map(get_balance, coldkeys)))
+
+def fetch_stakes(coldkeys, batch_size, retries=2):
+    # a failing batch is retried, then split in halves, so one bad coldkey or an oversized response only costs itself
+    stakes, failed = {}, []
+    pending = [coldkeys[start:start + batch_size] for start in range(0, len(coldkeys), batch_size)]
+    while pending:
+        batch = pending.pop()
+        for attempt in range(retries + 1):
+            try:
+                substakes = subtensor.get_stake_info_for_coldkeys(coldkey_ss58_list=batch)
+                break
+            except Exception as e:
+                error = e
+        else:
+            if len(batch) > 1:
+                pending += [batch[:len(batch) // 2], batch[len(batch) // 2:]]
+            else:
+                print(f"Error fetching stakes for coldkey: {batch[0]}")
+                print(f"Error message: {str(error)}")
+                failed.append(batch[0])
+            continue
+        for coldkey_ss58 in batch:
+            stakes[coldkey_ss58] = {}
+            for substake in substakes.get(coldkey_ss58, []):
+                stakes[coldkey_ss58][substake.netuid] = stakes[coldkey_ss58].get(substake.netuid, 0.0) + float(substake.stake)
+    return stakes, failed
+
+def get_wallet_info(prices, free_balance, stakes):
+    total_tao = free_balance
     subnet_stakes = {}
 
-    for substake in substakes:
-        subnet = subnets[substake.netuid]
-        stake_float = float(substake.stake)
-        price_float = float(subnet.price)
-        stake_in_tao = stake_float * price_float
+    for netuid, stake in stakes.items():
+        stake_in_tao = stake * prices.get(netuid, 0.0)
         total_tao += stake_in_tao
-        subnet_stakes[substake.netuid] = stake_in_tao
+        subnet_stakes[netuid] = stake_in_tao
 
-    if subnet_stakes:
+    if subnet_stakes and total_tao > 0:
         most_stake_subnet = max(subnet_stakes, key=subnet_stakes.get)
         most_stake_percentage = (subnet_stakes[most_stake_subnet] / total_tao) * 100
         most_stake = f"Subnet {most_stake_subnet} ({most_stake_percentage:.2f}%)"
@@ -38,16 +121,52 @@ def get_wallet_info(coldkey_ss58):
 
     return total_tao, most_stake
 
-def main():
-    wallets = load_wallets('wallets.json')
-    results = []
+def main(args):
+    wallets = load_wallets(args.wallets)
+    coldkeys = list(dict.fromkeys(wallets.values()))
+    prices = {subnet.netuid: float(subnet.price) for subnet in subtensor.get_all_subnet_dynamic_info()}
+    balances = fetch_balances(coldkeys, args.max_in_flight)
+
+    block = subtensor.get_current_block()
+
+    # in incremental mode a wallet keeps its cached positions, revalued at current prices, unless its free balance changed, a stake
+    # event named it since the last run, or the positions are old enough for emissions to have grown them
+    cache = load_cache(args.cache) if args.incremental else {'block': None, 'wallets': {}}
+    entries = cache['wallets']
+    touched = set()
+    if cache['block'] is not None and block - cache['block'] < args.max_age:
+        if not scan_pays(block - cache['block'], len(coldkeys), args.batch_size, args.max_in_flight):
+            print(f"{block - cache['block']} blocks since the last run, re-querying every wallet is cheaper than reading their events")
+            touched = set(coldkeys)
+        else:
+            try:
+                touched = stake_events(cache['block'] + 1, block, set(coldkeys), args.max_in_flight)
+            except Exception as e:
+                print(f"Error reading stake events, re-querying every wallet: {str(e)}")
+                touched = set(coldkeys)
+    stale = [coldkey for coldkey in coldkeys if balances[coldkey] is not None and
+             (coldkey not in entries or coldkey in touched or entries[coldkey]['failed'] or entries[coldkey]['balance'] != balances[coldkey]
+              or block - entries[coldkey]['block'] >= args.max_age)]
+    stakes, failed = fetch_stakes(stale, args.batch_size)
+    for coldkey_ss58, positions in stakes.items():
+        entries[coldkey_ss58] = {'balance': balances[coldkey_ss58], 'block': block, 'failed': False, 'stakes': positions}
+    for coldkey_ss58 in failed:
+        # keep showing the old positions, but re-query next run even if nothing else marks the wallet
+        if coldkey_ss58 in entries:
+            entries[coldkey_ss58]['failed'] = True
+    if args.incremental:
+        save_cache(args.cache, {'block': block, 'wallets': entries})
+    print(f"Queried stakes for {len(stale)} of {len(coldkeys)} wallets")
 
+    results, missing = [], []
     for name, coldkey_ss58 in wallets.items():
-        print(f"\nProcessing wallet: {name}")
-        wallet_info = get_wallet_info(coldkey_ss58)
-        if wallet_info is not None:
-            total_tao, most_stake = wallet_info
-            results.append([name, coldkey_ss58, total_tao, most_stake])
+        if balances[coldkey_ss58] is None or coldkey_ss58 not in entries:
+            missing.append(name)
+            continue
+        total_tao, most_stake = get_wallet_info(prices, balances[coldkey_ss58], entries[coldkey_ss58]['stakes'])
+        if coldkey_ss58 in failed:
+            most_stake += f" (cached at block {entries[coldkey_ss58]['block']})"
+        results.append([name, coldkey_ss58, total_tao, most_stake])
 
     results.sort(key=lambda x: x[2], reverse=True)
 
@@ -56,7 +175,19 @@ def main():
 
     print("\nWallet Balances (Sorted by Total TAO):")
     print(table)
+    if missing:
+        print(f"\nCould not score {len(missing)} wallets: {', '.join(missing)}")
 
 if __name__ == "__main__":
-    subtensor = bt.subtensor('rao')
-    main()
+    parser = argparse.ArgumentParser(description="Rank wallets by total TAO value")
+    parser.add_argument('--wallets', default='wallets.json', help="wallets JSON or the wallets.db store written by extract.py")
+    parser.add_argument('--network', default='rao')
+    parser.add_argument('--incremental', action='store_true',
+                        help="only re-query stakes for wallets whose free balance changed or that staked, unstaked or moved stake since the last run")
+    parser.add_argument('--max-age', type=int, default=360, help="blocks before cached positions are re-queried anyway (emissions grow stake)")
+    parser.add_argument('--cache', default='scoreboard_cache.json')
+    parser.add_argument('--batch-size', type=int, default=64, help="coldkeys per get_stake_info_for_coldkeys call")
+    parser.add_argument('--max-in-flight', type=int, default=8, help="concurrent balance and event queries")
+    args = parser.parse_args()
+    subtensor = bt.subtensor(args.network)
+    main(args)
@@ -1,11 +1,19 @@
+import argparse
+import os
+import sys
 import bittensor as bt
 
-def confirm_action(message: str) -> bool:
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bot'))
+
+def confirm_action(message: str, assume_yes: bool = False) -> bool:
+    if assume_yes:
+        bt.logging.info(f"{message} (assumed yes)")
+        return True
     response = input(f"{message} (y/n): ").strip().lower()
     return response == 'y'
 
-def stake_tao(wallet, subtensor, netuid, amount):
-    if confirm_action(f"Do you want to stake {amount} TAO into subnet {netuid}?"):
+def stake_tao(wallet, subtensor, netuid, amount, assume_yes=False):
+    if confirm_action(f"Do you want to stake {amount} TAO into subnet {netuid}?", assume_yes):
         call = subtensor.substrate.compose_call(
             call_module="SubtensorModule",
             call_function="add_stake",
@@ -19,8 +27,8 @@ def stake_tao(wallet, subtensor, netuid, amount):
         subtensor.substrate.submit_extrinsic(extrinsic, wait_for_inclusion=True, wait_for_finalization=True)
         bt.logging.info(f"Staked {amount} TAO into subnet {netuid}")
 
-def unstake_alpha(wallet, subtensor, netuid, alpha_amount):
-    if confirm_action(f"Do you want to unstake {alpha_amount} alpha from subnet {netuid}?"):
+def unstake_alpha(wallet, subtensor, netuid, alpha_amount, assume_yes=False):
+    if confirm_action(f"Do you want to unstake {alpha_amount} alpha from subnet {netuid}?", assume_yes):
         call = subtensor.substrate.compose_call(
             call_module="SubtensorModule",
             call_function="remove_stake",
@@ -34,6 +42,14 @@ def unstake_alpha(wallet, subtensor, netuid, alpha_amount):
         subtensor.substrate.submit_extrinsic(extrinsic, wait_for_inclusion=True, wait_for_finalization=True)
         bt.logging.info(f"Unstaked {alpha_amount} alpha from subnet {netuid}")
 
+def rebalance(wallet, subtensor, operations, assume_yes=False):
+    from rebalance import Rebalancer
+    # one prompt, one signature and one inclusion wait for the whole list instead of one per leg
+    summary = "\n".join(f"  {operation.describe()}" for operation in operations)
+    if confirm_action(f"Do you want to submit these operations as one batch?\n{summary}\n", assume_yes):
+        Rebalancer(subtensor, wallet).execute(operations)
+        bt.logging.info(f"Rebalanced with {len(operations)} operations in one extrinsic")
+
 def get_stake_for_subnet(wallet, subtensor, netuid):
     stakes = subtensor.get_stake_info_for_coldkeys(coldkey_ss58_list=[wallet.coldkeypub.ss58_address])[wallet.coldkeypub.ss58_address]
     for stake in stakes:
@@ -59,20 +75,30 @@ def convert_alpha_to_tao(subtensor, netuid, alpha_amount):
     return bt.Balance.from_tao(tao_amount)
 
 def main():
+    parser = argparse.ArgumentParser(description="Stake into subnet 5, then move half of it to subnet 18")
+    parser.add_argument('--yes', action='store_true', help="do not prompt before submitting")
+    parser.add_argument('--sequential', action='store_true', help="submit each leg as its own extrinsic instead of one batch")
+    args = parser.parse_args()
+
     wallet = bt.wallet()
     subtensor = bt.subtensor()
 
-    stake_tao(wallet, subtensor, netuid=5, amount=bt.Balance.from_tao(1))
+    stake_tao(wallet, subtensor, netuid=5, amount=bt.Balance.from_tao(1), assume_yes=args.yes)
 
     current_stake_alpha = get_stake_for_subnet(wallet, subtensor, netuid=5)
     bt.logging.info(f"Current stake in subnet 5: {current_stake_alpha}")
 
     alpha_to_unstake = current_stake_alpha / 2
-    unstake_alpha(wallet, subtensor, netuid=5, alpha_amount=alpha_to_unstake)
 
-    tao_to_stake = convert_alpha_to_tao(subtensor, netuid=5, alpha_amount=alpha_to_unstake)
+    if args.sequential:
+        unstake_alpha(wallet, subtensor, netuid=5, alpha_amount=alpha_to_unstake, assume_yes=args.yes)
+        tao_to_stake = convert_alpha_to_tao(subtensor, netuid=5, alpha_amount=alpha_to_unstake)
+        stake_tao(wallet, subtensor, netuid=18, amount=tao_to_stake, assume_yes=args.yes)
+        return
 
-    stake_tao(wallet, subtensor, netuid=18, amount=tao_to_stake)
+    from rebalance import Operation
+    # a single move leg restakes whatever the unstake actually yields, a separate stake leg would have to guess it up front
+    rebalance(wallet, subtensor, [Operation.move(5, 18, float(alpha_to_unstake))], assume_yes=args.yes)
 
 if __name__ == "__main__":
     main()
@@ -1,105 +1,199 @@
-import bittensor as bt
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
+import hashlib
 import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import bittensor as bt
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bot'))
+
 def load_subnet_performances(filename='subnet_performances.json'):
     with open(filename, 'r') as f:
         return json.load(f)
 
 def get_subnet_data():
+    import pandas as pd
     subtensor = bt.subtensor()
     subnets = subtensor.get_all_subnet_dynamic_info()
 
-    data = []
-    for subnet in subnets[1:]:
-        emission_rate = float(subnet.emission)
-        inflation_rate = (float(subnet.alpha_out) + 1000) / float(subnet.alpha_out) - 1 if float(subnet.alpha_out) != 0 else 0
-
-        data.append({
-            'Netuid': int(subnet.netuid),
-            'TAO in pool': float(subnet.tao_in),
-            'Alpha in pool': float(subnet.alpha_in),
-            'Alpha outstanding': float(subnet.alpha_out),
-            'Emission rate': emission_rate,
-            'Inflation rate': inflation_rate,
-            'Price': float(subnet.price)
-        })
-
-    return pd.DataFrame(data)
-
-def plot_relative_difference(df):
+    pools = np.array([[subnet.netuid, float(subnet.tao_in), float(subnet.alpha_in), float(subnet.alpha_out), float(subnet.emission), float(subnet.price)]
+                      for subnet in subnets[1:]], dtype=float).reshape(-1, 6)
+    return pd.DataFrame({
+        'Netuid': pools[:, 0].astype(int),
+        'TAO in pool': pools[:, 1],
+        'Alpha in pool': pools[:, 2],
+        'Alpha outstanding': pools[:, 3],
+        'Emission rate': pools[:, 4],
+        'Inflation rate': np.divide(1000, pools[:, 3], out=np.zeros(len(pools)), where=pools[:, 3] != 0),
+        'Price': pools[:, 5],
+    })
+
+def summarize_history(filename):
+    # the charts only need each subnet's first price, last price and sample count
+    if filename.endswith('.json'):
+        performances = load_subnet_performances(filename)
+        netuids = [int(netuid) for netuid in performances]
+        prices = [performances[str(netuid)]['prices'] for netuid in netuids]
+        return {'netuid': netuids, 'first': [p[0] if p else np.nan for p in prices], 'last': [p[-1] if p else np.nan for p in prices],
+                'samples': [len(p) for p in prices]}
+
+    from history_store import HistoryStore
+    records = HistoryStore(filename).records()
+    netuids = records['netuid']
+    order = np.argsort(netuids, kind='stable')
+    unique, first, samples = np.unique(netuids[order], return_index=True, return_counts=True)
+    return {'netuid': unique.tolist(), 'first': records['price'][order[first]].tolist(), 'last': records['price'][order[first + samples - 1]].tolist(),
+            'samples': samples.tolist()}
+
+def load_history(filename, cache):
+    stat = os.stat(filename)
+    key = [os.path.abspath(filename), stat.st_mtime_ns, stat.st_size]
+    if cache.get('history', {}).get('key') != key:
+        cache['history'] = {'key': key, 'summary': summarize_history(filename)}
+    import pandas as pd
+    return pd.DataFrame(cache['history']['summary'])
+
+def compute_metrics(df, history):
+    metrics = df.merge(history.rename(columns={'netuid': 'Netuid'}), on='Netuid', how='outer').sort_values('Netuid', ignore_index=True)
+    emission, price = metrics['Emission rate'].to_numpy(), metrics['Price'].to_numpy()
+    first, last, samples = metrics['first'].to_numpy(), metrics['last'].to_numpy(), metrics['samples'].fillna(0).to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics['Relative difference'] = (price - emission) / emission
+        change = (last - first) / samples
+        metrics['Price change per block'] = np.where(change != 0, np.log(np.abs(change)), 0.0)
+        metrics['Price drop'] = (last - first) / first
+    metrics['Live'] = metrics['Price'].notna()
+    metrics['History'] = samples > 1
+    return metrics
+
+def plot_relative_difference(metrics, filename):
+    import matplotlib.pyplot as plt
+    live = metrics[metrics['Live']]
     plt.figure(figsize=(12, 6))
-    relative_diff = (df['Price'] - df['Emission rate']) / df['Emission rate']
-    plt.bar(df['Netuid'], relative_diff)
+    plt.bar(live['Netuid'], live['Relative difference'])
     plt.title('Relative Difference between Emission and Price for Each Subnet')
     plt.xlabel('Subnet Netuid')
     plt.ylabel('Relative Difference')
-    plt.savefig('relative_difference.png')
+    plt.savefig(filename)
     plt.close()
 
-def plot_price_difference_per_block(performances):
+def plot_price_difference_per_block(metrics, filename):
+    import matplotlib.pyplot as plt
+    history = metrics[metrics['History']]
     plt.figure(figsize=(12, 6))
-    price_diff = {}
-    for netuid, data in performances.items():
-        if len(data['prices']) > 1:
-            diff = (data['prices'][-1] - data['prices'][0]) / len(data['prices'])
-            price_diff[int(netuid)] = np.log(abs(diff)) if diff != 0 else 0
-
-    plt.bar(price_diff.keys(), price_diff.values())
+    plt.bar(history['Netuid'], history['Price change per block'])
     plt.title('Price Difference per Block for Each Subnet')
     plt.xlabel('Subnet Netuid')
     plt.ylabel('Log of Price Difference per Block')
-    plt.savefig('price_difference_per_block.png')
+    plt.savefig(filename)
     plt.close()
 
-def plot_price_drop_percentage(performances):
+def plot_price_drop_percentage(metrics, filename):
+    import matplotlib.pyplot as plt
+    history = metrics[metrics['History']]
     plt.figure(figsize=(12, 6))
-    price_drop = {}
-    for netuid, data in performances.items():
-        if len(data['prices']) > 1:
-            drop = (data['prices'][-1] - data['prices'][0]) / data['prices'][0]
-            price_drop[int(netuid)] = drop
-
-    plt.bar(price_drop.keys(), price_drop.values())
-    plt.title(f'Price Drop Percentage')
+    plt.bar(history['Netuid'], history['Price drop'])
+    plt.title('Price Drop Percentage')
     plt.xlabel('Subnet Netuid')
     plt.ylabel('Price Drop Percentage')
-    plt.savefig('price_drop_percentage.png')
+    plt.savefig(filename)
     plt.close()
 
-def plot_price_drop_and_inflation(df, performances):
-    plt.figure(figsize=(12, 6))
-    price_drop = {}
-    for netuid, data in performances.items():
-        if len(data['prices']) > 1:
-            drop = (data['prices'][-1] - data['prices'][0]) / data['prices'][0]
-            price_drop[int(netuid)] = drop
-
-    x = df['Netuid']
+def plot_price_drop_and_inflation(metrics, filename):
+    import matplotlib.pyplot as plt
+    live = metrics[metrics['Live']]
+    x = live['Netuid']
     width = 0.35
 
-    plt.bar(x - width/2, [price_drop.get(netuid, 0) for netuid in x], width, label='Price Drop Percentage', color='r')
-    plt.bar(x + width/2, df['Inflation rate'], width, label='Inflation', color='b')
-
-    plt.title(f'Price Drop Percentage and Inflation')
+    plt.figure(figsize=(12, 6))
+    plt.bar(x - width/2, live['Price drop'].where(live['History'], 0), width, label='Price Drop Percentage', color='r')
+    plt.bar(x + width/2, live['Inflation rate'], width, label='Inflation', color='b')
+    plt.title('Price Drop Percentage and Inflation')
     plt.xlabel('Subnet Netuid')
     plt.ylabel('Percentage')
     plt.legend()
-    plt.savefig('price_drop_and_inflation.png')
+    plt.savefig(filename)
     plt.close()
 
+FIGURES = {
+    'relative_difference.png': (plot_relative_difference, ['Netuid', 'Live', 'Relative difference']),
+    'price_difference_per_block.png': (plot_price_difference_per_block, ['Netuid', 'History', 'Price change per block']),
+    'price_drop_percentage.png': (plot_price_drop_percentage, ['Netuid', 'History', 'Price drop']),
+    'price_drop_and_inflation.png': (plot_price_drop_and_inflation, ['Netuid', 'Live', 'History', 'Price drop', 'Inflation rate']),
+}
+
+def figure_hash(name, data):
+    import pandas as pd
+    digest = hashlib.sha256(name.encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _render(name, data, filename):
+    import matplotlib
+    matplotlib.use('Agg')
+    FIGURES[name][0](data, filename)
+    return name
+
+def render_figures(metrics, output_dir='.', cache=None, workers=None, force=False):
+    cache = {} if cache is None else cache
+    hashes = cache.setdefault('figures', {})
+    jobs = []
+    for name, (_, columns) in FIGURES.items():
+        data = metrics[columns]
+        filename = os.path.join(output_dir, name)
+        digest = figure_hash(name, data)
+        if not force and hashes.get(name) == digest and os.path.exists(filename):
+            continue
+        jobs.append((name, data, filename, digest))
+    if not jobs:
+        return []
+    if workers == 0 or len(jobs) == 1:
+        rendered = [_render(name, data, filename) for name, data, filename, _ in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(jobs)), mp_context=multiprocessing.get_context('spawn')) as executor:
+            rendered = list(executor.map(_render, *zip(*[(name, data, filename) for name, data, filename, _ in jobs])))
+    hashes.update({name: digest for name, _, _, digest in jobs})
+    return rendered
+
+def load_cache(filename):
+    if filename is None or not os.path.exists(filename):
+        return {}
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        bt.logging.warning(f"Ignoring unreadable cache {filename}: {e}")
+        return {}
+
+def save_cache(filename, cache):
+    if filename is None:
+        return
+    tmp = f'{filename}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp, filename)
+
 def main():
+    parser = argparse.ArgumentParser(description="Render subnet price and emission dashboards")
+    parser.add_argument('--history', default='subnet_performances.json', help="subnet_performances.json or a HistoryStore file")
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--cache', default='subnet_info_cache.json', help="history summary and figure hashes from the previous run")
+    parser.add_argument('--workers', type=int, default=None, help="render processes (default: one per core, 0 renders inline)")
+    parser.add_argument('--force', action='store_true', help="render every figure even if its data is unchanged")
+    args = parser.parse_args()
+
+    cache = load_cache(args.cache)
     df = get_subnet_data()
-    performances = load_subnet_performances()
+    metrics = compute_metrics(df, load_history(args.history, cache))
 
     print(df)
 
-    plot_relative_difference(df)
-    plot_price_difference_per_block(performances)
-    plot_price_drop_percentage(performances)
-    plot_price_drop_and_inflation(df, performances)
+    rendered = render_figures(metrics, args.output_dir, cache, args.workers, args.force)
+    print(f"Rendered {len(rendered)} of {len(FIGURES)} figures" + (f": {', '.join(rendered)}" if rendered else ""))
+    save_cache(args.cache, cache)
 
 if __name__ == "__main__":
     main()